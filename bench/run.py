@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import edge_tts
+import typer
+
+from anki_vocab.commands import import_file, session, update
+from anki_vocab.integrations import ankiconnect, openai_client
+from anki_vocab.integrations import edge_tts as tts
+from tests.fakes import (
+    NOTE_MODEL,
+    FakeAnkiConnectServer,
+    FakeCommunicate,
+    FakeOpenAIServer,
+    Faults,
+    isolated_environment,
+)
+
+SCENARIOS = ("session", "update", "update-query", "import")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
+
+
+class StageRecorder:
+    def __init__(self) -> None:
+        self._samples: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, []).append(seconds * 1000)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 50), 2),
+                "p95_ms": round(percentile(values, 95), 2),
+                "mean_ms": round(sum(values) / len(values), 2),
+            }
+            for stage, values in sorted(samples.items())
+        }
+
+
+def _timed(recorder: StageRecorder, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.record(stage, time.perf_counter() - started)
+
+    return wrapper
+
+
+def _atimed(recorder: StageRecorder, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            recorder.record(stage, time.perf_counter() - started)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def _patched(target: Any, name: str, value: Any) -> Iterator[None]:
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+@contextlib.contextmanager
+def instrument(recorder: StageRecorder) -> Iterator[None]:
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(_patched(openai_client, "_complete", _timed(recorder, "openai", openai_client._complete)))
+        stack.enter_context(
+            _patched(openai_client, "_acomplete", _atimed(recorder, "openai", openai_client._acomplete))
+        )
+        stack.enter_context(_patched(tts.TTSEngine, "_stream", _atimed(recorder, "tts", tts.TTSEngine._stream)))
+        stack.enter_context(
+            _patched(
+                ankiconnect.AnkiConnectClient,
+                "arequest",
+                _atimed(recorder, "ankiconnect", ankiconnect.AnkiConnectClient.arequest),
+            )
+        )
+        stack.enter_context(_patched(edge_tts, "Communicate", FakeCommunicate))
+        yield
+
+
+@contextlib.contextmanager
+def _stdin(text: str) -> Iterator[None]:
+    original = sys.stdin
+    sys.stdin = io.StringIO(text)
+    try:
+        yield
+    finally:
+        sys.stdin = original
+
+
+def _invoke(command: Callable[..., Any], **kwargs: Any) -> int:
+    try:
+        command(**kwargs)
+    except typer.Exit as exc:
+        return exc.exit_code
+    except (typer.Abort, SystemExit):
+        return 1
+    return 0
+
+
+def _words(count: int, prefix: str) -> list[str]:
+    return [f"{prefix}{index:05d}" for index in range(count)]
+
+
+def run_session(anki: FakeAnkiConnectServer, recorder: StageRecorder, *, cards: int, **_: Any) -> dict[str, Any]:
+    lines = "".join(f"A sentence with {word} inside. | {word}\n" for word in _words(cards, "session"))
+    original_next_line = session._LineSource.next_line
+    last = [time.perf_counter()]
+
+    # Each line read marks the end of the previous card, so the gaps are per-card latencies.
+    def next_line(self: Any) -> str:
+        line = original_next_line(self)
+        now = time.perf_counter()
+        if not line.startswith(":quit"):
+            recorder.record("card", now - last[0])
+        last[0] = now
+        return line
+
+    with _stdin(lines + ":quit\n"), _patched(session._LineSource, "next_line", next_line):
+        last[0] = time.perf_counter()
+        exit_code = _invoke(session.session_command, yes=True, no_cache=True)
+    added = sum(1 for note in anki.notes.values() if note["fields"]["Word"]["value"].startswith("session"))
+    return {"exit_code": exit_code, "cards": added}
+
+
+def run_update(anki: FakeAnkiConnectServer, recorder: StageRecorder, *, cards: int, **_: Any) -> dict[str, Any]:
+    note_ids = anki.seed_notes(NOTE_MODEL, _words(cards, "update"))
+    failures = 0
+    for note_id in note_ids:
+        started = time.perf_counter()
+        # Non-interactive stdin answers the confirmation menu with "1" (Yes).
+        with _stdin("1\n"):
+            exit_code = _invoke(update.update_command, note_id=note_id, prompt="Shorter definition", no_cache=True)
+        recorder.record("card", time.perf_counter() - started)
+        failures += exit_code != 0
+    return {"exit_code": 1 if failures else 0, "cards": len(note_ids) - failures}
+
+
+def run_update_query(
+    anki: FakeAnkiConnectServer,
+    recorder: StageRecorder,
+    *,
+    cards: int,
+    concurrency: int,
+    **_: Any,
+) -> dict[str, Any]:
+    anki.seed_notes(NOTE_MODEL, _words(cards, "bulk"))
+    exit_code = _invoke(
+        update.update_command,
+        query=f'note:"{NOTE_MODEL}"',
+        prompt="Shorter definition",
+        concurrency=concurrency,
+        yes=True,
+        no_cache=True,
+    )
+    return {"exit_code": exit_code, "cards": anki.actions.get("updateNoteFields", 0)}
+
+
+def run_import(
+    anki: FakeAnkiConnectServer,
+    recorder: StageRecorder,
+    *,
+    cards: int,
+    concurrency: int,
+    workdir: Path,
+    **_: Any,
+) -> dict[str, Any]:
+    source = workdir / "words.txt"
+    source.write_text(
+        "".join(f"A sentence with {word} inside. | {word}\n" for word in _words(cards, "import")),
+        encoding="utf-8",
+    )
+    exit_code = _invoke(import_file.import_command, path=source, concurrency=concurrency, no_cache=True)
+    added = sum(1 for note in anki.notes.values() if note["fields"]["Word"]["value"].startswith("import"))
+    return {"exit_code": exit_code, "cards": added}
+
+
+RUNNERS = {
+    "session": run_session,
+    "update": run_update,
+    "update-query": run_update_query,
+    "import": run_import,
+}
+
+
+def run_scenario(
+    name: str,
+    *,
+    cards: int,
+    concurrency: int,
+    openai_faults: Faults,
+    anki_faults: Faults,
+    tts_faults: Faults,
+    quiet: bool = True,
+) -> dict[str, Any]:
+    recorder = StageRecorder()
+    FakeCommunicate.faults = tts_faults
+    with (
+        FakeOpenAIServer(openai_faults) as openai,
+        FakeAnkiConnectServer(anki_faults) as anki,
+        isolated_environment(openai, anki) as workdir,
+        instrument(recorder),
+    ):
+        output = io.StringIO()
+        redirect = (contextlib.redirect_stdout(output), contextlib.redirect_stderr(output)) if quiet else ()
+        with contextlib.ExitStack() as stack:
+            for context in redirect:
+                stack.enter_context(context)
+            started = time.perf_counter()
+            result = RUNNERS[name](anki, recorder, cards=cards, concurrency=concurrency, workdir=workdir)
+            wall = time.perf_counter() - started
+        ankiconnect.close_clients()
+        openai_client.close_clients()
+
+    return {
+        "requested_cards": cards,
+        "completed_cards": result["cards"],
+        "exit_code": result["exit_code"],
+        "wall_s": round(wall, 3),
+        "cards_per_min": round(result["cards"] / wall * 60, 1) if wall else 0.0,
+        "openai_outcomes": dict(openai.outcomes),
+        "stages": recorder.summary(),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark against fake OpenAI and AnkiConnect.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of scenarios.")
+    parser.add_argument("--cards", type=int, default=20, help="Cards per scenario.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Generation workers for import/update --query.")
+    parser.add_argument("--openai-latency-ms", type=float, default=300.0)
+    parser.add_argument("--openai-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="Share of 500 responses.")
+    parser.add_argument("--openai-429-rate", type=float, default=0.0, help="Share of 429 responses.")
+    parser.add_argument("--anki-latency-ms", type=float, default=5.0)
+    parser.add_argument("--anki-jitter-ms", type=float, default=2.0)
+    parser.add_argument("--anki-error-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency-ms", type=float, default=150.0)
+    parser.add_argument("--tts-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--tts-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=Path("bench-results.json"), help="Where to write JSON results.")
+    parser.add_argument("--verbose", action="store_true", help="Show command output instead of capturing it.")
+    options = parser.parse_args(argv)
+
+    scenarios = [name.strip() for name in options.scenarios.split(",") if name.strip()]
+    unknown = sorted(set(scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    settings = {
+        "cards": options.cards,
+        "concurrency": options.concurrency,
+        "openai": {
+            "latency_ms": options.openai_latency_ms,
+            "jitter_ms": options.openai_jitter_ms,
+            "error_rate": options.openai_error_rate,
+            "rate_limit_rate": options.openai_429_rate,
+        },
+        "anki": {
+            "latency_ms": options.anki_latency_ms,
+            "jitter_ms": options.anki_jitter_ms,
+            "error_rate": options.anki_error_rate,
+        },
+        "tts": {
+            "latency_ms": options.tts_latency_ms,
+            "jitter_ms": options.tts_jitter_ms,
+            "error_rate": options.tts_error_rate,
+        },
+        "seed": options.seed,
+    }
+    results: dict[str, Any] = {}
+    for name in scenarios:
+        results[name] = run_scenario(
+            name,
+            cards=options.cards,
+            concurrency=options.concurrency,
+            openai_faults=Faults(**settings["openai"], seed=options.seed),
+            anki_faults=Faults(**settings["anki"], seed=options.seed),
+            tts_faults=Faults(**settings["tts"], seed=options.seed),
+            quiet=not options.verbose,
+        )
+        _print_scenario(name, results[name])
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "settings": settings,
+        "scenarios": results,
+    }
+    options.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Wrote {options.output}")
+    return 0 if all(result["exit_code"] == 0 for result in results.values()) else 1
+
+
+def _print_scenario(name: str, result: dict[str, Any]) -> None:
+    print(
+        f"{name}: {result['completed_cards']}/{result['requested_cards']} cards in {result['wall_s']}s "
+        f"({result['cards_per_min']} cards/min, exit {result['exit_code']})"
+    )
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<12} n={stats['count']:<5} p50={stats['p50_ms']:>8}ms  p95={stats['p95_ms']:>8}ms")
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# `--help` output goes through Rich, so subcommands are measured by loading them the way the CLI does on dispatch.
+_LOAD_COMMAND = "from anki_vocab.cli import _lazy_command; _lazy_command({!r})"
+COMMANDS = {
+    "config path": ["-m", "anki_vocab", "config", "path"],
+    "session": ["-c", _LOAD_COMMAND.format("session")],
+    "update": ["-c", _LOAD_COMMAND.format("update")],
+    "import": ["-c", _LOAD_COMMAND.format("import")],
+    "add": ["-c", _LOAD_COMMAND.format("add")],
+    "--help": ["-m", "anki_vocab", "--help"],
+}
+HEAVY_MODULES = ("openai", "jinja2", "edge_tts", "aiohttp", "dotenv")
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)")
+
+
+def measure(args: list[str]) -> dict[str, object]:
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    self_us = 0
+    modules: set[str] = set()
+    for line in completed.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        self_us += int(match.group(1))
+        modules.add(match.group(2))
+    return {
+        "returncode": completed.returncode,
+        "import_ms": round(self_us / 1000, 1),
+        "modules": len(modules),
+        "wall_ms": round(wall_ms, 1),
+        "heavy_modules": sorted(name for name in HEAVY_MODULES if name in modules),
+    }
+
+
+def run(*, repeat: int) -> dict[str, dict[str, object]]:
+    results: dict[str, dict[str, object]] = {}
+    for label, args in COMMANDS.items():
+        # Keep the fastest run; the slower ones mostly measure a cold page cache.
+        runs = [measure(args) for _ in range(repeat)]
+        results[label] = min(runs, key=lambda result: float(result["import_ms"]))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report `-X importtime` totals for each anki-vocab subcommand.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per subcommand (fastest is kept).")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Fail if any subcommand imports take longer.")
+    parser.add_argument("--json", type=Path, default=None, help="Also write the results to this JSON file.")
+    options = parser.parse_args(argv)
+
+    results = run(repeat=options.repeat)
+    width = max(len(label) for label in results)
+    print(f"{'command':<{width}}  {'imports':>9}  {'modules':>7}  {'wall':>9}  heavy modules")
+    for label, result in results.items():
+        heavy = ", ".join(result["heavy_modules"]) or "-"
+        print(
+            f"{label:<{width}}  {result['import_ms']:>7}ms  {result['modules']:>7}  {result['wall_ms']:>7}ms  {heavy}"
+        )
+    if options.json is not None:
+        options.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    failed = [label for label, result in results.items() if result["returncode"] != 0]
+    if options.budget_ms is not None:
+        failed += [label for label, result in results.items() if float(result["import_ms"]) > options.budget_ms]
+    if failed:
+        print(f"Over budget or failed: {', '.join(sorted(set(failed)))}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
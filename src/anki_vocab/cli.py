@@ -1,4 +1,9 @@
+from functools import lru_cache
+from importlib import import_module
+from typing import Any
+
 import typer
+from typer.core import TyperGroup
 
 from .commands.config import (
     config_app,
@@ -7,17 +12,46 @@ from .commands.config import (
     config_show,
     config_show_path,
 )
-from .commands.session import session_command
-from .commands.update import update_command
-from .commands.utils import select_menu
 from .core.config import config_path, resolve_config, update_config_value
 
+# Command modules pull in OpenAI, TTS and Rich, so they load only when their command runs.
+_LAZY_COMMANDS = {
+    "session": (".commands.session", "session_command"),
+    "update": (".commands.update", "update_command"),
+    "import": (".commands.import_file", "import_command"),
+    "add": (".commands.add", "add_command"),
+    "serve": (".commands.serve", "serve_command"),
+    "flush": (".commands.flush", "flush_command"),
+    "media": (".commands.media", "media_app"),
+}
+
+
+@lru_cache(maxsize=None)
+def _lazy_command(name: str) -> Any:
+    module_name, attribute = _LAZY_COMMANDS[name]
+    target = getattr(import_module(module_name, __package__), attribute)
+    if isinstance(target, typer.Typer):
+        return typer.main.get_group(target)
+    command_app = typer.Typer(add_completion=False)
+    command_app.command(name)(target)
+    return typer.main.get_command(command_app)
+
+
+class _LazyGroup(TyperGroup):
+    def list_commands(self, ctx: Any) -> list[str]:
+        return [*_LAZY_COMMANDS, *super().list_commands(ctx)]
+
+    def get_command(self, ctx: Any, cmd_name: str) -> Any:
+        if cmd_name in _LAZY_COMMANDS:
+            return _lazy_command(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+
 app = typer.Typer(
+    cls=_LazyGroup,
     help="CLI for generating and maintaining Anki vocab cards.",
     invoke_without_command=True,
 )
-app.command("session")(session_command)
-app.command("update")(update_command)
 app.add_typer(config_app, name="config")
 
 
@@ -26,6 +60,8 @@ def main(ctx: typer.Context) -> None:
     if ctx.invoked_subcommand is not None:
         return
 
+    from .commands.utils import select_menu
+
     config = resolve_config()
     if not config.openai_api_key:
         typer.echo("OpenAI API key is not set.")
@@ -41,10 +77,10 @@ def main(ctx: typer.Context) -> None:
         default_index=0,
     )
     if choice == 0:
-        ctx.invoke(session_command)
+        ctx.invoke(_lazy_command("session"))
         return
     if choice == 1:
-        ctx.invoke(update_command)
+        ctx.invoke(_lazy_command("update"))
         return
     if choice == 2:
         config_choice = select_menu(
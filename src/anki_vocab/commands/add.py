@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from typing import Annotated, Any
+
+import typer
+
+from .client import DaemonUnavailable, daemon_request
+
+
+def _run(action: str, params: dict[str, Any], *, local: bool) -> Any:
+    if not local:
+        try:
+            return daemon_request(action, params)
+        except DaemonUnavailable:
+            pass
+    # Without a daemon the command pays for the full import and client setup, like any other command.
+    from .serve import run_local
+
+    return run_local(action, params)
+
+
+def add_command(
+    line: Annotated[str, typer.Argument(help="'context | word' or a bare word, as typed in a session.")],
+    allow_duplicate: Annotated[
+        bool, typer.Option("--allow-duplicate", help="Add even if the word is already in the deck.")
+    ] = False,
+    dry_run: Annotated[bool, typer.Option("--dry-run", help="Generate and print the card, no writes.")] = False,
+    local: Annotated[bool, typer.Option("--local", help="Run in-process even if a daemon is running.")] = False,
+) -> None:
+    action = "generate" if dry_run else "add"
+    params: dict[str, Any] = {"line": line}
+    if allow_duplicate:
+        params["allow_duplicate"] = True
+    try:
+        result = _run(action, params, local=local)
+    except Exception as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=4) from exc
+
+    card = result["card"]
+    if dry_run:
+        typer.echo(f"Generated: {card['word_base']} | {card['ru_meaning']}")
+    elif result["queued"]:
+        typer.echo(f"Queued: {card['word_base']}; run `anki-vocab flush` once Anki is up.", err=True)
+    elif result["note_id"] is None:
+        existing = ", ".join(str(note_id) for note_id in result["existing"])
+        word = card["word_base"] if card else result["word"]
+        typer.echo(f"Skipped duplicate: {word} (note id {existing})", err=True)
+    else:
+        typer.echo(f"Added note id: {result['note_id']} ({card['word_base']})", err=True)
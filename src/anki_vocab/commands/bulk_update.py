@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any
+
+import typer
+
+from ..core.ankimapping import card_to_fields, note_to_card_payload, word_field_name
+from ..core.audio import abuild_audio_field, upload_error
+from ..core.cache import CardCache
+from ..core.cleaning import clean_context
+from ..core.config import Config
+from ..core.journal import UpdateJournal
+from ..core.outbox import WriteOutbox
+from ..core.schema import Card, parse_card
+from ..integrations.ankiconnect import AnkiConnectBatch, get_client
+from ..integrations.openai_client import aclose_clients, agenerate_card
+from .utils import note_field_value
+
+NOTES_INFO_CHUNK = 200
+
+_DONE = object()
+
+
+@dataclass
+class _BulkItem:
+    note_id: int
+    note: dict[str, Any]
+    card: Card | None = None
+
+
+@dataclass
+class BulkStats:
+    generated: int = 0
+    resumed: int = 0
+    updated: int = 0
+    queued: int = 0
+    failed: int = 0
+
+
+def job_payload(config: Config, *, query: str, prompt: str | None, fields: list[str] | None = None) -> dict[str, Any]:
+    payload: dict[str, Any] = {
+        "query": query,
+        "prompt": prompt or "",
+        "model": config.openai_model,
+        "field_map": config.field_map,
+        "ankiconnect_url": config.ankiconnect_url,
+    }
+    # Only partial jobs carry the key, so journals of full regenerations keep their ids.
+    if fields:
+        payload["fields"] = fields
+    return payload
+
+
+async def run_bulk_update(
+    config: Config,
+    journal: UpdateJournal,
+    job: str,
+    pending: dict[int, str | None],
+    *,
+    prompt: str | None,
+    workers: int,
+    fields: list[str] | None = None,
+    batch_size: int,
+    cache: CardCache | None = None,
+    outbox: WriteOutbox | None = None,
+) -> BulkStats:
+    stats = BulkStats()
+    client = get_client(config.ankiconnect_url)
+    to_generate: asyncio.Queue[Any] = asyncio.Queue(maxsize=workers * 2)
+    to_write: asyncio.Queue[Any] = asyncio.Queue(maxsize=batch_size * 2)
+    word_field = word_field_name(config.field_map)
+    sentence_field = config.field_map.get("context_en", "Context Sentence")
+
+    def fail(note_id: int, exc: BaseException) -> None:
+        stats.failed += 1
+        journal.mark_failed(job, note_id, str(exc))
+        typer.echo(f"Note {note_id}: {exc}", err=True)
+
+    async def produce() -> None:
+        note_ids = list(pending)
+        for start in range(0, len(note_ids), NOTES_INFO_CHUNK):
+            chunk = note_ids[start : start + NOTES_INFO_CHUNK]
+            notes = await client.arequest("notesInfo", {"notes": chunk})
+            found: set[int] = set()
+            for note in notes:
+                if not note:
+                    continue
+                item = _BulkItem(note_id=int(note["noteId"]), note=note)
+                found.add(item.note_id)
+                # A card generated before an interruption is written as-is instead of paying for it again.
+                stored = pending.get(item.note_id)
+                if stored is not None:
+                    item.card = parse_card(json.loads(stored))
+                    stats.resumed += 1
+                    await to_write.put(item)
+                else:
+                    await to_generate.put(item)
+            for note_id in chunk:
+                if note_id not in found:
+                    fail(note_id, RuntimeError("note not found"))
+        for _ in range(workers):
+            await to_generate.put(_DONE)
+
+    async def generate_worker() -> None:
+        while True:
+            item = await to_generate.get()
+            if item is _DONE:
+                return
+            try:
+                word = note_field_value(item.note, word_field)
+                if not word:
+                    raise RuntimeError("note is missing the word field")
+                item.card = await agenerate_card(
+                    clean_context(note_field_value(item.note, sentence_field) or ""),
+                    word,
+                    model=config.openai_model,
+                    api_key=config.openai_api_key,
+                    base_url=config.openai_base_url,
+                    timeout=config.openai_timeout,
+                    cache=cache,
+                    current_card=note_to_card_payload(item.note, config.field_map),
+                    user_prompt=prompt,
+                    fields=fields,
+                )
+            except Exception as exc:
+                fail(item.note_id, exc)
+                continue
+            journal.record_card(job, item.note_id, json.dumps(item.card.as_dict(), ensure_ascii=False))
+            stats.generated += 1
+            await to_write.put(item)
+
+    async def generate() -> None:
+        await asyncio.gather(*(generate_worker() for _ in range(workers)))
+        await to_write.put(_DONE)
+
+    async def write_batch(items: list[_BulkItem]) -> None:
+        batch = AnkiConnectBatch(config.ankiconnect_url)
+
+        async def fields_for(item: _BulkItem) -> tuple[dict[str, str], Future[str] | None]:
+            assert item.card is not None
+            fields = card_to_fields(item.card, config.field_map)
+            stored = None
+            tts_text = item.card.tts_text or item.card.word_base
+            if config.tts_enabled and tts_text and not note_field_value(item.note, config.tts_field):
+                fields[config.tts_field], stored = await abuild_audio_field(
+                    config.ankiconnect_url,
+                    tts_text,
+                    voice=config.tts_voice,
+                    rate=config.tts_rate,
+                    batch=batch,
+                )
+            return fields, stored
+
+        prepared = await asyncio.gather(*(fields_for(item) for item in items))
+        updates = [batch.update_note_fields(item.note_id, fields) for item, (fields, _) in zip(items, prepared)]
+        if outbox is None:
+            await batch.aflush()
+        elif not await outbox.asend(batch, label=f"update of {len(items)} notes"):
+            # The outbox now owns these writes, so the job does not generate them again on resume.
+            journal.mark_done(job, [item.note_id for item in items])
+            stats.queued += len(items)
+            typer.echo(f"Queued {len(items)} note updates ({updates[0].exception()}).", err=True)
+            return
+        done: list[int] = []
+        for item, updated, (_, stored) in zip(items, updates, prepared):
+            try:
+                updated.result()
+            except Exception as exc:
+                fail(item.note_id, exc)
+                continue
+            audio_error = upload_error(stored)
+            if audio_error is not None:
+                fail(item.note_id, RuntimeError(f"updated, but its audio was not stored: {audio_error}"))
+                continue
+            done.append(item.note_id)
+        journal.mark_done(job, done)
+        stats.updated += len(done)
+        typer.echo(f"Updated {stats.updated} notes ({stats.failed} failed).", err=True)
+
+    async def write() -> None:
+        items: list[_BulkItem] = []
+        while True:
+            item = await to_write.get()
+            if item is not _DONE:
+                items.append(item)
+            if items and (item is _DONE or len(items) >= batch_size):
+                await write_batch(items)
+                items = []
+            if item is _DONE:
+                return
+
+    tasks = [asyncio.create_task(stage) for stage in (produce(), generate(), write())]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await aclose_clients()
+        await client.aclose()
+    return stats
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import json
+import os
+import socket
+from pathlib import Path
+from typing import Any
+
+from ..core.config import cache_dir
+
+CONNECT_TIMEOUT = 0.2
+REQUEST_TIMEOUT = 180.0
+
+
+class DaemonUnavailable(Exception):
+    pass
+
+
+def socket_path() -> Path:
+    override = os.environ.get("ANKI_VOCAB_SOCKET")
+    return Path(override) if override else cache_dir() / "serve.sock"
+
+
+def daemon_request(
+    action: str,
+    params: dict[str, Any] | None = None,
+    *,
+    path: Path | None = None,
+    timeout: float = REQUEST_TIMEOUT,
+) -> Any:
+    # Kept to the standard library so forwarding to a running daemon costs only interpreter startup.
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(path or socket_path()))
+    except OSError as exc:
+        sock.close()
+        raise DaemonUnavailable(str(exc)) from exc
+    request = {"id": 1, "action": action, "params": params or {}}
+    with sock:
+        sock.settimeout(timeout)
+        try:
+            sock.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+            with sock.makefile("rb") as stream:
+                line = stream.readline()
+        except ConnectionError as exc:
+            # A daemon that is shutting down resets connections it has not read from yet.
+            raise DaemonUnavailable(str(exc)) from exc
+    if not line:
+        raise DaemonUnavailable("the daemon closed the connection without a response")
+    response = json.loads(line)
+    if response.get("error") is not None:
+        raise RuntimeError(response["error"])
+    return response["result"]
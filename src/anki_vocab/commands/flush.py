@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from typing import Annotated
+
+import typer
+
+from ..core.outbox import FLUSH_MAX_ACTIONS, WriteOutbox
+
+
+def flush_command(
+    retry_failed: Annotated[
+        bool, typer.Option("--retry-failed", help="Also resend writes that AnkiConnect rejected before.")
+    ] = False,
+    batch_size: Annotated[
+        int, typer.Option("--batch-size", min=1, help="Maximum AnkiConnect actions per request.")
+    ] = FLUSH_MAX_ACTIONS,
+) -> None:
+    outbox = WriteOutbox.open_default()
+    try:
+        if not outbox.counts():
+            typer.echo("No queued writes.", err=True)
+            return
+        stats = outbox.flush(max_actions=batch_size, include_failed=retry_failed)
+        failures = outbox.failures()
+    finally:
+        outbox.close()
+    typer.echo(
+        f"Sent {stats.sent} writes in {stats.requests} requests, {stats.failed} failed, {stats.remaining} queued.",
+        err=True,
+    )
+    for label, error in failures:
+        typer.echo(f"  {label}: {error}", err=True)
+    if stats.error is not None:
+        typer.echo(f"AnkiConnect error: {stats.error}. Rerun `anki-vocab flush` once Anki is up.", err=True)
+        raise typer.Exit(code=3)
+    if failures:
+        raise typer.Exit(code=5)
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+
+from ..core.ankimapping import card_to_fields
+from ..core.audio import abuild_audio_field, upload_error
+from ..core.cache import CardCache
+from ..core.cleaning import clean_context
+from ..core.config import Config, resolve_config
+from ..core.highlights import Highlight, ImportState, KindleClippings, ReadwiseCsv
+from ..core.outbox import WriteOutbox
+from ..core.schema import Card
+from ..integrations.ankiconnect import AnkiConnectBatch, get_client
+from ..integrations.edge_tts import configure_tts_engine
+from ..integrations.openai_client import aclose_clients, agenerate_cards, connection_stats
+from .session import _parse_session_line
+
+_DONE = object()
+_FORMATS = ("lines", "kindle", "readwise")
+
+
+@dataclass
+class _ImportItem:
+    line_no: int
+    context: str
+    word: str
+    card: Card | None = None
+    fields: dict[str, str] = field(default_factory=dict)
+    batch: AnkiConnectBatch | None = None
+    has_audio: bool = False
+    stored_audio: Future[str] | None = None
+
+
+@dataclass
+class _ImportStats:
+    generated: int = 0
+    added: int = 0
+    skipped: int = 0
+    queued: int = 0
+    failed: int = 0
+
+
+def _iter_import_lines(path: Path) -> Iterator[tuple[int, str, str]]:
+    with path.open(encoding="utf-8") as handle:
+        for line_no, line in enumerate(handle, start=1):
+            try:
+                context, word = _parse_session_line(line)
+            except typer.Exit:
+                return
+            except ValueError as exc:
+                typer.echo(f"Line {line_no}: {exc}", err=True)
+                continue
+            if word:
+                yield line_no, clean_context(context), word
+
+
+def _iter_highlights(highlights: Iterable[Highlight], keys: list[str]) -> Iterator[tuple[int, str, str]]:
+    for index, highlight in enumerate(highlights, start=1):
+        keys.append(highlight.key)
+        yield index, clean_context(highlight.context), highlight.word
+
+
+async def _run_stage(
+    inbox: asyncio.Queue[Any],
+    outbox: asyncio.Queue[Any] | None,
+    *,
+    workers: int,
+    downstream_workers: int,
+    handle: Callable[[_ImportItem], Awaitable[bool]],
+    stats: _ImportStats,
+) -> None:
+    async def worker() -> None:
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                return
+            try:
+                forward = await handle(item)
+            except Exception as exc:
+                stats.failed += 1
+                typer.echo(f"Line {item.line_no} ({item.word}): {exc}", err=True)
+                continue
+            if forward and outbox is not None:
+                await outbox.put(item)
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        for _ in range(downstream_workers):
+            await outbox.put(_DONE)
+
+
+async def _take_batch(inbox: asyncio.Queue[Any], size: int) -> tuple[list[_ImportItem], bool]:
+    items: list[_ImportItem] = []
+    while len(items) < size:
+        item = await inbox.get()
+        if item is _DONE:
+            return items, True
+        items.append(item)
+    return items, False
+
+
+async def _run_batch_stage(
+    inbox: asyncio.Queue[Any],
+    outbox: asyncio.Queue[Any] | None,
+    *,
+    workers: int,
+    downstream_workers: int,
+    batch_size: int,
+    handle: Callable[[list[_ImportItem]], Awaitable[list[Exception | None]]],
+    stats: _ImportStats,
+) -> None:
+    async def worker() -> None:
+        while True:
+            items, done = await _take_batch(inbox, batch_size)
+            if items:
+                try:
+                    errors = await handle(items)
+                except Exception as exc:
+                    errors = [exc] * len(items)
+                for item, error in zip(items, errors):
+                    if error is not None:
+                        stats.failed += 1
+                        typer.echo(f"Line {item.line_no} ({item.word}): {error}", err=True)
+                    elif outbox is not None:
+                        await outbox.put(item)
+            if done:
+                return
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if outbox is not None:
+        for _ in range(downstream_workers):
+            await outbox.put(_DONE)
+
+
+async def _run_import(
+    entries: Iterable[tuple[int, str, str]],
+    config: Config,
+    *,
+    generate_workers: int,
+    tts_workers: int,
+    write_workers: int,
+    dry_run: bool,
+    cache: CardCache | None = None,
+    words_per_request: int = 1,
+    outbox: WriteOutbox | None = None,
+) -> _ImportStats:
+    stats = _ImportStats()
+    to_generate: asyncio.Queue[Any] = asyncio.Queue(maxsize=generate_workers * words_per_request * 2)
+    to_synthesize: asyncio.Queue[Any] = asyncio.Queue(maxsize=tts_workers * 2)
+    to_write: asyncio.Queue[Any] = asyncio.Queue(maxsize=write_workers * 2)
+
+    async def produce() -> None:
+        for line_no, context, word in entries:
+            await to_generate.put(_ImportItem(line_no=line_no, context=context, word=word))
+        for _ in range(generate_workers):
+            await to_generate.put(_DONE)
+
+    async def generate(items: list[_ImportItem]) -> list[Exception | None]:
+        results = await agenerate_cards(
+            [(item.context, item.word) for item in items],
+            model=config.openai_model,
+            api_key=config.openai_api_key,
+            base_url=config.openai_base_url,
+            timeout=config.openai_timeout,
+            cache=cache,
+        )
+        errors: list[Exception | None] = []
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+                continue
+            item.card = result
+            stats.generated += 1
+            if dry_run:
+                typer.echo(f"Generated: {item.card.word_base} | {item.card.ru_meaning}", err=True)
+            else:
+                item.fields = card_to_fields(item.card, config.field_map)
+                item.batch = AnkiConnectBatch(config.ankiconnect_url)
+            errors.append(None)
+        return errors
+
+    async def synthesize(item: _ImportItem) -> bool:
+        assert item.card is not None and item.batch is not None
+        tts_text = item.card.tts_text or item.card.word_base
+        if config.tts_enabled and tts_text:
+            item.fields[config.tts_field], item.stored_audio = await abuild_audio_field(
+                config.ankiconnect_url,
+                tts_text,
+                voice=config.tts_voice,
+                rate=config.tts_rate,
+                batch=item.batch,
+            )
+            item.has_audio = True
+        return True
+
+    async def write(item: _ImportItem) -> bool:
+        assert item.card is not None and item.batch is not None
+        note = {
+            "deckName": config.deck,
+            "modelName": config.note_model,
+            "fields": item.fields,
+            "options": {"allowDuplicate": False},
+            "tags": ["auto"] + (["tts"] if item.has_audio else []),
+        }
+        added = item.batch.add_note(note)
+        if outbox is None:
+            await item.batch.aflush()
+        elif not await outbox.asend(item.batch, label=item.card.word_base):
+            stats.queued += 1
+            typer.echo(f"Queued: {item.card.word_base} ({added.exception()})", err=True)
+            return False
+        try:
+            new_id = added.result()
+        except RuntimeError as exc:
+            if "duplicate" not in str(exc):
+                raise
+            stats.skipped += 1
+            typer.echo(f"Skipped duplicate: {item.card.word_base}", err=True)
+            return False
+        audio_error = upload_error(item.stored_audio)
+        if audio_error is not None:
+            raise RuntimeError(f"added note id {new_id}, but its audio was not stored: {audio_error}")
+        stats.added += 1
+        typer.echo(f"Added note id: {new_id} ({item.card.word_base})", err=True)
+        return False
+
+    stages = [
+        produce(),
+        _run_batch_stage(
+            to_generate,
+            None if dry_run else to_synthesize,
+            workers=generate_workers,
+            downstream_workers=tts_workers,
+            batch_size=words_per_request,
+            handle=generate,
+            stats=stats,
+        ),
+    ]
+    if not dry_run:
+        stages.append(
+            _run_stage(
+                to_synthesize,
+                to_write,
+                workers=tts_workers,
+                downstream_workers=write_workers,
+                handle=synthesize,
+                stats=stats,
+            )
+        )
+        stages.append(
+            _run_stage(
+                to_write,
+                None,
+                workers=write_workers,
+                downstream_workers=0,
+                handle=write,
+                stats=stats,
+            )
+        )
+
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        await aclose_clients()
+        await get_client(config.ankiconnect_url).aclose()
+    return stats
+
+
+def import_command(
+    path: Annotated[
+        Path,
+        typer.Argument(
+            help="File with one 'context | word' entry per line, or a highlight export (see --format).",
+            exists=True,
+            dir_okay=False,
+        ),
+    ],
+    source_format: Annotated[
+        str,
+        typer.Option(
+            "--format",
+            help="Input format: lines, kindle (My Clippings.txt) or readwise (CSV export).",
+        ),
+    ] = "lines",
+    from_start: Annotated[
+        bool,
+        typer.Option("--from-start", help="Reread a highlight export from the start instead of only new highlights."),
+    ] = False,
+    deck: Annotated[str | None, typer.Option("--deck", help="Target Anki deck.")] = None,
+    note_model: Annotated[str | None, typer.Option("--note-model", help="Anki note model name.")] = None,
+    openai_model: Annotated[str | None, typer.Option("--openai-model", help="OpenAI model name.")] = None,
+    voice: Annotated[str | None, typer.Option("--voice", help="Edge TTS voice.")] = None,
+    rate: Annotated[str | None, typer.Option("--rate", help="Edge TTS rate.")] = None,
+    concurrency: Annotated[int, typer.Option("--concurrency", min=1, help="Parallel OpenAI generations.")] = 4,
+    words_per_request: Annotated[
+        int,
+        typer.Option("--words-per-request", min=1, help="Words packed into one OpenAI request (1 disables batching)."),
+    ] = 10,
+    tts_workers: Annotated[
+        int | None,
+        typer.Option("--tts-workers", min=1, help="Parallel TTS syntheses (defaults to tts.concurrency)."),
+    ] = None,
+    write_workers: Annotated[int, typer.Option("--write-workers", min=1, help="Parallel AnkiConnect writes.")] = 2,
+    no_tts: Annotated[bool, typer.Option("--no-tts", help="Disable TTS.")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Bypass the generated card cache.")] = False,
+    dry_run: Annotated[bool, typer.Option("--dry-run", help="Generate only, no writes.")] = False,
+) -> None:
+    if source_format not in _FORMATS:
+        raise typer.BadParameter(f"expected one of {', '.join(_FORMATS)}", param_hint="--format")
+    config = resolve_config()
+    config = replace(
+        config,
+        deck=deck or config.deck,
+        note_model=note_model or config.note_model,
+        openai_model=openai_model or config.openai_model,
+        tts_voice=voice or config.tts_voice,
+        tts_rate=rate or config.tts_rate,
+        tts_enabled=(not no_tts) and config.tts_enabled,
+        tts_concurrency=tts_workers or config.tts_concurrency,
+    )
+    configure_tts_engine(max_concurrency=config.tts_concurrency)
+
+    source = str(path.resolve())
+    state: ImportState | None = None
+    clippings: KindleClippings | None = None
+    keys: list[str] = []
+    entries: Iterable[tuple[int, str, str]]
+    if source_format == "lines":
+        entries = _iter_import_lines(path)
+    else:
+        state = ImportState.open_default()
+        if from_start:
+            state.reset(source)
+        if source_format == "kindle":
+            clippings = KindleClippings(path, offset=state.offset(source, path))
+            highlights: Iterable[Highlight] = clippings
+        else:
+            seen = state.seen(source)
+            highlights = (highlight for highlight in ReadwiseCsv(path) if highlight.key not in seen)
+        entries = _iter_highlights(highlights, keys)
+
+    cache = None if no_cache else CardCache.open_default()
+    outbox = WriteOutbox.open_default()
+    try:
+        stats = asyncio.run(
+            _run_import(
+                entries,
+                config,
+                generate_workers=concurrency,
+                tts_workers=config.tts_concurrency,
+                write_workers=write_workers,
+                dry_run=dry_run,
+                cache=cache,
+                words_per_request=words_per_request,
+                outbox=outbox,
+            )
+        )
+        # Failed entries must come back on the next run, so the read position only moves after a clean one.
+        if state is not None and not dry_run and not stats.failed:
+            if clippings is not None:
+                state.save_offset(source, path, clippings.offset)
+            else:
+                state.mark_seen(source, keys)
+    finally:
+        outbox.close()
+        if cache is not None:
+            cache.close()
+        if state is not None:
+            state.close()
+    if state is not None:
+        typer.echo(f"New highlights: {len(keys)}.", err=True)
+    typer.echo(
+        f"Generated {stats.generated}, added {stats.added}, skipped {stats.skipped}, "
+        f"queued {stats.queued}, failed {stats.failed}.",
+        err=True,
+    )
+    if stats.queued:
+        typer.echo("AnkiConnect was unavailable; run `anki-vocab flush` to send the queued notes.", err=True)
+    typer.echo(connection_stats().summary(), err=True)
+    if stats.failed:
+        raise typer.Exit(code=5)
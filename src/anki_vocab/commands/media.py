@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import contextlib
+from typing import Annotated
+
+import typer
+
+from ..core.config import resolve_config
+from ..core.media import GC_BATCH_SIZE, collect_garbage
+from ..core.outbox import WriteOutbox
+from .client import DaemonUnavailable, daemon_request
+
+media_app = typer.Typer(name="media", help="Manage TTS clips in the Anki media folder.", no_args_is_help=True)
+
+
+def _format_size(size: int) -> str:
+    value = float(size)
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+@media_app.command("gc")
+def media_gc_command(
+    dry_run: Annotated[bool, typer.Option("--dry-run", help="Report orphaned clips without deleting them.")] = False,
+    batch_size: Annotated[
+        int, typer.Option("--batch-size", min=1, help="Maximum deletions per AnkiConnect request.")
+    ] = GC_BATCH_SIZE,
+    note_model: Annotated[str | None, typer.Option("--note-model", help="Anki note model name.")] = None,
+    verbose: Annotated[bool, typer.Option("--verbose", help="List every orphaned clip and its size.")] = False,
+) -> None:
+    config = resolve_config()
+    outbox = WriteOutbox.open_default()
+    try:
+        report = collect_garbage(
+            config.ankiconnect_url,
+            note_model or config.note_model,
+            outbox=outbox,
+            dry_run=dry_run,
+            batch_size=batch_size,
+        )
+    except Exception as exc:
+        typer.echo(f"AnkiConnect error: {exc}", err=True)
+        raise typer.Exit(code=3) from exc
+    finally:
+        outbox.close()
+
+    if verbose:
+        for name in report.orphans:
+            size = report.sizes.get(name)
+            typer.echo(f"{name}\t{'?' if size is None else size}")
+    reclaimable = _format_size(report.reclaimable)
+    if report.unsized:
+        reclaimable += f" (+{report.unsized} clips of unknown size)"
+    typer.echo(
+        f"{len(report.media)} TTS clips, {len(report.media) - len(report.orphans)} referenced, "
+        f"{len(report.orphans)} orphaned: {reclaimable} reclaimable.",
+        err=True,
+    )
+    if dry_run or not report.orphans:
+        return
+
+    # A running daemon caches which clips Anki has; without this it would keep pointing new notes at deleted ones.
+    with contextlib.suppress(DaemonUnavailable, RuntimeError):
+        daemon_request("forget_media", {"names": report.orphans})
+    typer.echo(f"Deleted {report.deleted} clips, {report.errors} failed.", err=True)
+    if report.errors:
+        raise typer.Exit(code=5)
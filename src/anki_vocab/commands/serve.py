@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Annotated, Any
+
+import typer
+
+from ..core.ankimapping import card_to_fields, note_to_card_payload
+from ..core.audio import abuild_audio_field, forget_media, upload_error
+from ..core.cache import CardCache
+from ..core.cleaning import clean_context
+from ..core.config import Config, resolve_config
+from ..core.lemma import word_key
+from ..core.mirror import DeckMirror
+from ..core.outbox import PENDING, WriteOutbox
+from ..core.schema import Card, resolve_card_fields, split_field_prompt
+from ..core.tracing import span
+from ..integrations.ankiconnect import AnkiConnectBatch, close_clients, get_client
+from ..integrations.edge_tts import configure_tts_engine
+from ..integrations.openai_client import aclose_clients, agenerate_card, get_async_client
+from .client import DaemonUnavailable, daemon_request, socket_path
+from .session import _parse_session_line
+
+MIRROR_MAX_AGE = 60.0
+SHUTDOWN_GRACE = 30.0
+OUTBOX_INTERVAL = 30.0
+
+
+class VocabService:
+    def __init__(self, config: Config, *, cache: CardCache | None, mirror: DeckMirror, outbox: WriteOutbox) -> None:
+        self.config = config
+        self.cache = cache
+        self.mirror = mirror
+        self.outbox = outbox
+        self.stopped = asyncio.Event()
+        self._synced_at: float | None = None
+        self._sync_lock = asyncio.Lock()
+        self._connections: dict[asyncio.Task[None], asyncio.StreamWriter] = {}
+        self._idle: set[asyncio.StreamWriter] = set()
+        self._handlers: dict[str, Callable[[dict[str, Any]], Awaitable[Any]]] = {
+            "ping": self.ping,
+            "generate": self.generate,
+            "add": self.add,
+            "update": self.update,
+            "forget_media": self.forget_media,
+            "shutdown": self.shutdown,
+        }
+
+    async def warm_up(self) -> None:
+        # Pay for client construction, TLS and the first deck sync before any request arrives.
+        config = self.config
+        client = get_async_client(config.openai_api_key, base_url=config.openai_base_url, timeout=config.openai_timeout)
+        try:
+            # Listing models is the cheapest authenticated call; it leaves an open connection in the shared pool.
+            await client.with_options(max_retries=0).models.list()
+        except Exception as exc:
+            typer.echo(f"OpenAI is not reachable yet: {exc}", err=True)
+        try:
+            await get_client(config.ankiconnect_url).arequest("version")
+            await self._sync_mirror()
+        except Exception as exc:
+            typer.echo(f"AnkiConnect is not reachable yet: {exc}", err=True)
+            return
+        await self.drain_outbox()
+
+    async def drain_outbox(self) -> None:
+        if not self.outbox.counts().get(PENDING):
+            return
+        stats = await asyncio.to_thread(self.outbox.flush)
+        if stats.sent or stats.failed:
+            typer.echo(f"Sent {stats.sent} queued writes, {stats.failed} failed, {stats.remaining} queued.", err=True)
+
+    async def drain_outbox_periodically(self) -> None:
+        # Writes queued while Anki was down go out once it is back, without waiting for `anki-vocab flush`.
+        while not self.stopped.is_set():
+            try:
+                await asyncio.wait_for(self.stopped.wait(), OUTBOX_INTERVAL)
+            except TimeoutError:
+                await self.drain_outbox()
+
+    async def _sync_mirror(self) -> None:
+        async with self._sync_lock:
+            if self._synced_at is not None and time.monotonic() - self._synced_at < MIRROR_MAX_AGE:
+                return
+            with span("mirror.sync"):
+                await asyncio.to_thread(self.mirror.sync)
+            self._synced_at = time.monotonic()
+
+    def _target_fields(self, params: dict[str, Any]) -> tuple[list[str], str | None]:
+        fields = params.get("fields") or []
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        targets = resolve_card_fields(fields, self.config.field_map) if fields else []
+        prompt = params.get("prompt")
+        if prompt:
+            prompt_fields, prompt = split_field_prompt(prompt, self.config.field_map)
+            targets += [key for key in prompt_fields if key not in targets]
+        return targets, prompt
+
+    async def _generate(
+        self,
+        context: str,
+        word: str,
+        *,
+        current_card: dict[str, str] | None = None,
+        prompt: str | None = None,
+        fields: list[str] | None = None,
+    ) -> Card:
+        config = self.config
+        with span("generate", regenerate=current_card is not None, fields=",".join(fields or []) or None):
+            return await agenerate_card(
+                clean_context(context),
+                word,
+                model=config.openai_model,
+                api_key=config.openai_api_key,
+                base_url=config.openai_base_url,
+                timeout=config.openai_timeout,
+                current_card=current_card,
+                user_prompt=prompt,
+                fields=fields,
+                cache=self.cache,
+            )
+
+    def _card_params(self, params: dict[str, Any]) -> tuple[str, str]:
+        if "line" in params:
+            try:
+                context, word = _parse_session_line(str(params["line"]))
+            except typer.Exit:
+                context, word = "", ""
+        else:
+            context, word = str(params.get("context") or ""), str(params.get("word") or "").strip()
+        if not word:
+            raise ValueError("Provide a word/phrase.")
+        return context, word
+
+    async def _audio_field(
+        self, card: Card, batch: AnkiConnectBatch, fields: dict[str, str]
+    ) -> tuple[bool, Future[str] | None]:
+        config = self.config
+        tts_text = card.tts_text or card.word_base
+        if not config.tts_enabled or not tts_text:
+            return False, None
+        with span("audio"):
+            fields[config.tts_field], stored = await abuild_audio_field(
+                config.ankiconnect_url,
+                tts_text,
+                voice=config.tts_voice,
+                rate=config.tts_rate,
+                batch=batch,
+            )
+        return True, stored
+
+    async def ping(self, params: dict[str, Any]) -> dict[str, Any]:
+        return {"pid": os.getpid()}
+
+    async def generate(self, params: dict[str, Any]) -> dict[str, Any]:
+        context, word = self._card_params(params)
+        card = await self._generate(context, word)
+        return {"card": card.as_dict()}
+
+    async def add(self, params: dict[str, Any]) -> dict[str, Any]:
+        config = self.config
+        context, word = self._card_params(params)
+        await self._sync_mirror_quietly()
+        if not params.get("allow_duplicate"):
+            with span("duplicate_precheck"):
+                similar = self.mirror.find_similar(word)
+            # Like `session --yes`, only an exact match is skipped before generation.
+            exact = [note_id for note_id, stored in similar.items() if word_key(stored) == word_key(word)]
+            if exact:
+                return {"card": None, "word": word, "note_id": None, "existing": exact, "queued": False}
+        card = await self._generate(context, word)
+        existing = self.mirror.find(card.word_base)
+        if existing and not params.get("allow_duplicate"):
+            return {"card": card.as_dict(), "note_id": None, "existing": existing, "queued": False}
+
+        fields = card_to_fields(card, config.field_map)
+        batch = AnkiConnectBatch(config.ankiconnect_url)
+        has_audio, stored = await self._audio_field(card, batch, fields)
+        note = {
+            "deckName": config.deck,
+            "modelName": config.note_model,
+            "fields": fields,
+            "options": {"allowDuplicate": bool(params.get("allow_duplicate"))},
+            "tags": ["auto"] + (["tts"] if has_audio else []),
+        }
+        added = batch.add_note(note)
+        with span("add_note", actions=len(batch)):
+            sent = await self.outbox.asend(batch, label=card.word_base)
+        if not sent:
+            return {"card": card.as_dict(), "note_id": None, "existing": existing, "queued": True}
+        note_id = added.result()
+        self.mirror.remember(note_id, fields)
+        audio_error = upload_error(stored)
+        if audio_error is not None:
+            raise RuntimeError(f"Added note id {note_id}, but its audio was not stored: {audio_error}")
+        return {"card": card.as_dict(), "note_id": note_id, "existing": existing, "queued": False}
+
+    async def _sync_mirror_quietly(self) -> None:
+        try:
+            await self._sync_mirror()
+        except Exception as exc:
+            typer.echo(f"Deck mirror sync failed, using the local copy: {exc}", err=True)
+
+    async def update(self, params: dict[str, Any]) -> dict[str, Any]:
+        config = self.config
+        note_id = int(params["note_id"])
+        with span("note_lookup"):
+            notes = await get_client(config.ankiconnect_url).arequest("notesInfo", {"notes": [note_id]})
+        if not notes or not notes[0]:
+            raise ValueError(f"Note id {note_id} not found.")
+        current_card = note_to_card_payload(notes[0], config.field_map)
+        if not current_card.get("word_base"):
+            raise ValueError("Selected note is missing the word field.")
+        fields, prompt = self._target_fields(params)
+        context = params.get("sentence") or current_card.get("context_en", "")
+        card = await self._generate(
+            context,
+            current_card["word_base"],
+            current_card=current_card,
+            prompt=prompt,
+            fields=fields,
+        )
+        if params.get("dry_run"):
+            return {"card": card.as_dict(), "note_id": note_id, "queued": False}
+
+        note_fields = card_to_fields(card, config.field_map)
+        batch = AnkiConnectBatch(config.ankiconnect_url)
+        stored = None
+        if not notes[0].get("fields", {}).get(config.tts_field, {}).get("value"):
+            _, stored = await self._audio_field(card, batch, note_fields)
+        updated = batch.update_note_fields(note_id, note_fields)
+        with span("update_note", actions=len(batch)):
+            sent = await self.outbox.asend(batch, label=current_card["word_base"])
+        if not sent:
+            return {"card": card.as_dict(), "note_id": note_id, "queued": True}
+        updated.result()
+        self.mirror.remember(note_id, note_fields)
+        audio_error = upload_error(stored)
+        if audio_error is not None:
+            raise RuntimeError(f"Updated note id {note_id}, but its audio was not stored: {audio_error}")
+        return {"card": card.as_dict(), "note_id": note_id, "queued": False}
+
+    async def forget_media(self, params: dict[str, Any]) -> dict[str, Any]:
+        # `media gc` deleted these clips, so the next card that needs one must upload it again.
+        names = [str(name) for name in params.get("names") or []]
+        forget_media(self.config.ankiconnect_url, names)
+        return {"forgotten": len(names)}
+
+    async def shutdown(self, params: dict[str, Any]) -> dict[str, Any]:
+        self.stopped.set()
+        return {"stopping": True}
+
+    async def aclose(self) -> None:
+        await aclose_clients()
+        await get_client(self.config.ankiconnect_url).aclose()
+
+    async def handle(self, action: str, params: dict[str, Any]) -> Any:
+        handler = self._handlers.get(action)
+        if handler is None:
+            raise ValueError(f"Unsupported action: {action}")
+        with span(f"serve.{action}"):
+            return await handler(params)
+
+    async def dispatch(self, line: bytes) -> dict[str, Any]:
+        # Responses follow the AnkiConnect shape: exactly one of `result` and `error` is set.
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            result = await self.handle(str(request.get("action")), request.get("params") or {})
+        except Exception as exc:
+            return {"id": request_id, "result": None, "error": str(exc)}
+        return {"id": request_id, "result": result, "error": None}
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        self._connections[task] = writer
+        try:
+            while not self.stopped.is_set():
+                self._idle.add(writer)
+                line = await reader.readline()
+                self._idle.discard(writer)
+                if not line:
+                    break
+                response = await self.dispatch(line)
+                writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._idle.discard(writer)
+            del self._connections[task]
+            writer.close()
+
+    async def drain_connections(self) -> None:
+        # In-flight requests finish and get their response; idle connections see EOF and end.
+        for writer in list(self._idle):
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=SHUTDOWN_GRACE)
+
+
+def _open_service(config: Config, *, no_cache: bool) -> VocabService:
+    configure_tts_engine(max_concurrency=config.tts_concurrency)
+    cache = None if no_cache else CardCache.open_default()
+    return VocabService(config, cache=cache, mirror=DeckMirror.open_default(config), outbox=WriteOutbox.open_default())
+
+
+def _close_service(service: VocabService) -> None:
+    service.mirror.close()
+    service.outbox.close()
+    if service.cache is not None:
+        service.cache.close()
+    close_clients()
+
+
+async def _serve(service: VocabService, path: Path, ready: threading.Event | None) -> None:
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, service.stopped.set)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Signal handlers can only be installed from the main thread.
+            pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    server = await asyncio.start_unix_server(service.serve_connection, path=str(path))
+    try:
+        os.chmod(path, 0o600)
+        await service.warm_up()
+        if ready is not None:
+            ready.set()
+        typer.echo(f"Listening on {path}", err=True)
+        await service.drain_outbox_periodically()
+    finally:
+        server.close()
+        await service.drain_connections()
+        await server.wait_closed()
+        path.unlink(missing_ok=True)
+        await service.aclose()
+
+
+def run_server(
+    config: Config,
+    path: Path,
+    *,
+    no_cache: bool = False,
+    ready: threading.Event | None = None,
+) -> None:
+    service = _open_service(config, no_cache=no_cache)
+    try:
+        asyncio.run(_serve(service, path, ready))
+    finally:
+        _close_service(service)
+
+
+def run_local(action: str, params: dict[str, Any], *, no_cache: bool = False) -> Any:
+    service = _open_service(resolve_config(), no_cache=no_cache)
+
+    async def run() -> Any:
+        try:
+            return await service.handle(action, params)
+        finally:
+            await service.aclose()
+
+    try:
+        return asyncio.run(run())
+    finally:
+        _close_service(service)
+
+
+def serve_command(
+    socket: Annotated[
+        Path | None,
+        typer.Option("--socket", envvar="ANKI_VOCAB_SOCKET", help="Unix socket path (defaults to the cache dir)."),
+    ] = None,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Bypass the generated card cache.")] = False,
+    stop: Annotated[bool, typer.Option("--stop", help="Stop the running daemon and exit.")] = False,
+) -> None:
+    path = socket or socket_path()
+    try:
+        daemon_request("shutdown" if stop else "ping", path=path)
+    except DaemonUnavailable:
+        if stop:
+            typer.echo("No daemon is running.", err=True)
+            raise typer.Exit(code=1) from None
+    else:
+        typer.echo("Daemon stopped." if stop else f"A daemon is already listening on {path}.", err=True)
+        raise typer.Exit(code=0 if stop else 1)
+    run_server(resolve_config(), path, no_cache=no_cache)
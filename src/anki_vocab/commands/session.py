@@ -1,25 +1,47 @@
 from __future__ import annotations
 
+import contextvars
+import select
+import sys
+import threading
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future
 from dataclasses import replace
+from functools import partial
+from pathlib import Path
 from typing import Annotated
 
 import typer
+from rich.console import Console
+from rich.text import Text
 
-from ..core.ankimapping import card_to_fields, word_field_name
-from ..core.audio import build_audio_field
+from ..core.ankimapping import card_to_fields
+from ..core.audio import audio_filename, build_audio_field, upload_error
+from ..core.cache import CardCache
 from ..core.cleaning import clean_context
 from ..core.config import Config, resolve_config
-from rich.console import Console
-
-from ..core.prompting import render_card
-from ..integrations.ankiconnect import (
-    add_note,
-    find_notes,
-    notes_info,
-    update_note_fields,
+from ..core.lemma import word_key
+from ..core.mirror import DeckMirror
+from ..core.outbox import WriteOutbox
+from ..core.prefetch import CardPrefetcher
+from ..core.prompting import CardStreamRenderer, render_card
+from ..core.schema import Card, split_field_prompt
+from ..core.tracing import profiling, span, tracing
+from ..core.writer import NoteWriter
+from ..integrations.ankiconnect import AnkiConnectBatch
+from ..integrations.edge_tts import configure_tts_engine
+from ..integrations.openai_client import close_clients, connection_stats, generate_card
+from .utils import (
+    find_existing_notes,
+    find_similar_notes,
+    mirrored_notes,
+    queued_message,
+    select_menu,
+    select_note_id,
 )
-from ..integrations.openai_client import generate_card
-from .utils import select_menu, select_note_id
+
+_PREFETCH_LOOKAHEAD = 3
 
 
 def _parse_session_line(line: str) -> tuple[str, str]:
@@ -46,17 +68,208 @@ def _parse_session_line(line: str) -> tuple[str, str]:
     return context, word
 
 
-def _pick_existing_note(config: Config, note_ids: list[int], *, allow_pick: bool) -> int | None:
+class _LineSource:
+    def __init__(self, *, piped: bool) -> None:
+        self._buffer: deque[str] = deque()
+        self._cond = threading.Condition()
+        self._eof = False
+        self._piped = piped
+        if piped:
+            threading.Thread(target=self._read_pipe, name="anki-vocab-stdin", daemon=True).start()
+
+    def _read_pipe(self) -> None:
+        for line in sys.stdin:
+            with self._cond:
+                self._buffer.append(line)
+                self._cond.notify()
+        with self._cond:
+            self._eof = True
+            self._cond.notify()
+
+    def drain_typeahead(self) -> None:
+        if self._piped or not sys.stdin.isatty():
+            return
+        # A canonical-mode tty returns one line per read, so lines typed ahead stay in the kernel buffer.
+        while select.select([sys.stdin], [], [], 0)[0]:
+            line = sys.stdin.readline()
+            if not line:
+                break
+            self._buffer.append(line)
+
+    def next_line(self) -> str:
+        if self._piped:
+            with self._cond:
+                while not self._buffer and not self._eof:
+                    self._cond.wait()
+                if not self._buffer:
+                    raise EOFError
+                return self._buffer.popleft()
+
+        self.drain_typeahead()
+        if self._buffer:
+            line = self._buffer.popleft()
+            typer.echo(f"anki-vocab> {line.rstrip()}", err=True)
+            return line
+        return input("anki-vocab> ")
+
+    def upcoming(self) -> list[str]:
+        self.drain_typeahead()
+        with self._cond:
+            return list(self._buffer)
+
+
+def _schedule_prefetch(prefetcher: CardPrefetcher, lines: list[str], mirror: DeckMirror | None = None) -> None:
+    for line in lines[:_PREFETCH_LOOKAHEAD]:
+        try:
+            context, word = _parse_session_line(line)
+        except typer.Exit:
+            return
+        except ValueError:
+            continue
+        # Words already in the deck will most likely be skipped, so they are not worth a generation up front.
+        if word and (mirror is None or not mirror.find_similar(word)):
+            prefetcher.submit(clean_context(context), word)
+
+
+def _precheck_duplicate(mirror: DeckMirror, word: str, *, yes: bool) -> str:
+    with span("duplicate_precheck") as precheck_span:
+        similar = find_similar_notes(mirror, word)
+        precheck_span.set(matches=len(similar))
+    if not similar:
+        return "g"
+    listed = ", ".join(f"{stored} ({note_id})" for note_id, stored in similar.items())
+    typer.echo(f"Already in deck: {listed}", err=True)
+    if yes:
+        # Unattended runs only skip exact matches; an inflected form may still deserve its own card.
+        exact = any(word_key(stored) == word_key(word) for stored in similar.values())
+        return "s" if exact else "g"
+    with span("prompt"):
+        selected = select_menu(
+            "Choose an action",
+            ["Skip", "Generate anyway", "Quit"],
+            hint="Use ↑/↓ and Enter.",
+            default_index=0,
+        )
+    return ["s", "g", "q"][selected]
+
+
+class _CardStream:
+    def __init__(self, console: Console, mirror: DeckMirror, *, lookup: bool) -> None:
+        self.renderer = CardStreamRenderer(console)
+        self._mirror = mirror
+        self._lookup_enabled = lookup
+        self._lookup: Future[list[int]] | None = None
+        self._lookup_word: str | None = None
+
+    def on_field(self, key: str, value: str) -> None:
+        self.renderer.field(key, value)
+        if key == "word_base" and self._lookup_enabled and self._lookup is None:
+            # Look for duplicates while the remaining fields are still streaming in.
+            self._lookup_word = value
+            self._lookup = Future()
+            # Run in a copy of the current context so the lookup's spans nest under this card.
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run,
+                args=(self._run_lookup,),
+                name="anki-vocab-lookup",
+                daemon=True,
+            ).start()
+
+    def _run_lookup(self) -> None:
+        assert self._lookup is not None and self._lookup_word is not None
+        if not self._lookup.set_running_or_notify_cancel():
+            return
+        try:
+            self._lookup.set_result(find_existing_notes(self._mirror, self._lookup_word))
+        except BaseException as exc:
+            self._lookup.set_exception(exc)
+
+    def existing_notes(self, word_base: str) -> list[int] | None:
+        if self._lookup is None or self._lookup_word != word_base:
+            return None
+        return self._lookup.result()
+
+
+def _pick_existing_note(
+    config: Config,
+    mirror: DeckMirror,
+    note_ids: list[int],
+    *,
+    allow_pick: bool,
+) -> int | None:
     if not note_ids:
         return None
     if len(note_ids) == 1 or not allow_pick:
         return note_ids[0]
-    notes = notes_info(config.ankiconnect_url, note_ids)
+    notes = mirrored_notes(mirror, config.ankiconnect_url, note_ids)
     if not notes:
         return None
     return select_note_id(notes, config.field_map)
 
 
+def _write_note(
+    config: Config,
+    mirror: DeckMirror,
+    outbox: WriteOutbox,
+    prefetcher: CardPrefetcher,
+    card: Card,
+    note_id: int | None = None,
+    *,
+    has_audio: bool = False,
+) -> str:
+    tts_text = card.tts_text or card.word_base
+    fields = card_to_fields(card, config.field_map)
+    batch = AnkiConnectBatch(config.ankiconnect_url)
+    audio_field_value: str | None = None
+    stored = None
+    if config.tts_enabled and tts_text and not has_audio:
+        prefetched_audio = prefetcher.take_audio(audio_filename(tts_text, voice=config.tts_voice, rate=config.tts_rate))
+        with span("audio", prefetched=prefetched_audio is not None):
+            audio_field_value, stored = build_audio_field(
+                config.ankiconnect_url,
+                tts_text,
+                voice=config.tts_voice,
+                rate=config.tts_rate,
+                batch=batch,
+                audio=prefetched_audio,
+            )
+        fields[config.tts_field] = audio_field_value
+
+    if note_id is None:
+        note = {
+            "deckName": config.deck,
+            "modelName": config.note_model,
+            "fields": fields,
+            "options": {"allowDuplicate": False},
+            "tags": ["auto"] + (["tts"] if audio_field_value else []),
+        }
+        written = batch.add_note(note)
+    else:
+        written = batch.update_note_fields(note_id, fields)
+    with span("add_note" if note_id is None else "update_note", actions=len(batch)):
+        sent = outbox.send(batch, label=card.word_base)
+    if not sent:
+        raise RuntimeError(queued_message(card.word_base, written.exception()))
+    result = written.result()
+    if note_id is None:
+        note_id, verb = result, "Added"
+    else:
+        verb = "Updated"
+    mirror.remember(note_id, fields)
+    audio_error = upload_error(stored)
+    if audio_error is not None:
+        raise RuntimeError(f"{verb} note id {note_id}, but its audio was not stored: {audio_error}")
+    return f"{verb} note id: {note_id} ({card.word_base})"
+
+
+def _print_write_status(console: Console, writer: NoteWriter) -> None:
+    for message, ok in writer.results():
+        console.print(Text(message, style="dim" if ok else "yellow"))
+    if writer.pending:
+        console.print(Text(f"{writer.pending} writes in progress", style="dim"))
+
+
 def session_command(
     deck: Annotated[str | None, typer.Option("--deck", help="Target Anki deck.")] = None,
     note_model: Annotated[str | None, typer.Option("--note-model", help="Anki note model name.")] = None,
@@ -65,149 +278,260 @@ def session_command(
     rate: Annotated[str | None, typer.Option("--rate", help="Edge TTS rate.")] = None,
     yes: Annotated[bool, typer.Option("--yes", help="Auto-accept default actions.")] = False,
     no_tts: Annotated[bool, typer.Option("--no-tts", help="Disable TTS.")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Bypass the generated card cache.")] = False,
     dry_run: Annotated[bool, typer.Option("--dry-run", help="Preview only, no writes.")] = False,
+    no_stream: Annotated[
+        bool,
+        typer.Option("--no-stream", help="Wait for the whole card instead of rendering fields as they arrive."),
+    ] = False,
+    trace: Annotated[
+        Path | None,
+        typer.Option(
+            "--trace", envvar="ANKI_VOCAB_TRACE_FILE", help="Append per-stage timing spans to this JSONL file."
+        ),
+    ] = None,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Profile the run and print the hottest functions.")
+    ] = False,
 ) -> None:
-    config = resolve_config()
-    config = replace(
-        config,
-        deck=deck or config.deck,
-        note_model=note_model or config.note_model,
-        openai_model=openai_model or config.openai_model,
-        tts_voice=voice or config.tts_voice,
-        tts_rate=rate or config.tts_rate,
-        tts_enabled=(not no_tts) and config.tts_enabled,
-    )
-
-    console = Console(stderr=True)
-    typer.echo("Session started. Use ':quit'.", err=True)
+    with tracing(trace), profiling(profile):
+        config = resolve_config()
+        config = replace(
+            config,
+            deck=deck or config.deck,
+            note_model=note_model or config.note_model,
+            openai_model=openai_model or config.openai_model,
+            tts_voice=voice or config.tts_voice,
+            tts_rate=rate or config.tts_rate,
+            tts_enabled=(not no_tts) and config.tts_enabled,
+        )
+        configure_tts_engine(max_concurrency=config.tts_concurrency)
+
+        console = Console(stderr=True)
+        cache = None if no_cache else CardCache.open_default()
+        mirror = DeckMirror.open_default(config)
+        outbox = WriteOutbox.open_default()
+        writer = NoteWriter()
+        typer.echo("Session started. Use ':quit'.", err=True)
+
+        def generate(context: str, word: str) -> Card:
+            return generate_card(
+                context,
+                word,
+                model=config.openai_model,
+                api_key=config.openai_api_key,
+                base_url=config.openai_base_url,
+                timeout=config.openai_timeout,
+                cache=cache,
+            )
+
+        source = _LineSource(piped=(yes or dry_run) and not sys.stdin.isatty())
+        prefetcher = CardPrefetcher(
+            generate,
+            voice=config.tts_voice if config.tts_enabled and not dry_run else None,
+            rate=config.tts_rate,
+        )
+        try:
+            _session_loop(
+                config,
+                console,
+                source,
+                prefetcher,
+                cache,
+                mirror,
+                outbox,
+                writer,
+                yes=yes,
+                dry_run=dry_run,
+                stream=not no_stream,
+            )
+        finally:
+            if writer.pending:
+                typer.echo(f"Finishing {writer.pending} pending writes...", err=True)
+            writer.close()
+            _print_write_status(console, writer)
+            prefetcher.close()
+            stats = connection_stats()
+            if stats.requests:
+                typer.echo(stats.summary(), err=True)
+            close_clients()
+            if cache is not None:
+                cache.close()
+            mirror.close()
+            outbox.close()
+
+
+def _session_loop(
+    config: Config,
+    console: Console,
+    source: _LineSource,
+    prefetcher: CardPrefetcher,
+    cache: CardCache | None,
+    mirror: DeckMirror,
+    outbox: WriteOutbox,
+    writer: NoteWriter,
+    *,
+    yes: bool,
+    dry_run: bool,
+    stream: bool,
+) -> None:
+    def generate(
+        context: str,
+        word: str,
+        *,
+        current_card: dict[str, str] | None = None,
+        user_prompt: str | None = None,
+        fields: list[str] | None = None,
+        on_field: Callable[[str, str], None] | None = None,
+    ) -> Card:
+        return generate_card(
+            context,
+            word,
+            model=config.openai_model,
+            api_key=config.openai_api_key,
+            base_url=config.openai_base_url,
+            timeout=config.openai_timeout,
+            cache=cache,
+            current_card=current_card,
+            user_prompt=user_prompt,
+            fields=fields,
+            on_field=on_field,
+        )
 
     while True:
+        _print_write_status(console, writer)
         try:
-            line = input("anki-vocab> ")
+            line = source.next_line()
         except EOFError:
             typer.echo("Cancelled.", err=True)
             return
 
-        try:
-            context, word = _parse_session_line(line)
-        except ValueError as exc:
-            typer.echo(str(exc), err=True)
-            continue
-
-        if not word:
-            continue
-
-        context_clean = clean_context(context)
-        current_card: dict[str, str] | None = None
-        user_prompt: str | None = None
-        existing_note_ids: list[int] | None = None
-
-        while True:
+        with span("session.card") as card_span:
             try:
-                card = generate_card(
-                    context_clean,
-                    word,
-                    model=config.openai_model,
-                    api_key=config.openai_api_key,
-                    current_card=current_card,
-                    user_prompt=user_prompt,
-                )
-            except Exception as exc:
-                typer.echo(f"OpenAI error: {exc}", err=True)
-                break
-
-            render_card(console, card)
-
-            if dry_run:
-                break
-
-            if existing_note_ids is None:
-                word_field = word_field_name(config.field_map)
-                query = f'note:"{config.note_model}" {word_field}:"{card.word_base}"'
-                existing_note_ids = find_notes(config.ankiconnect_url, query)
-
-            has_existing = bool(existing_note_ids)
-            default_action = "a" if not has_existing else "s"
-
-            if yes:
-                action = default_action
-            else:
-                actions = ["Add", "Update", "Skip", "Regenerate", "Quit"]
-                action_map = ["a", "u", "s", "r", "q"]
-                default_index = action_map.index(default_action)
-                selected = select_menu(
-                    "Choose an action",
-                    actions,
-                    hint="Use ↑/↓ and Enter.",
-                    default_index=default_index,
-                )
-                action = action_map[selected]
-
-            if action == "q":
-                return
-            if action == "r":
-                feedback = input("Feedback for regeneration (optional): ").strip()
-                current_card = card.as_dict()
-                user_prompt = feedback or None
+                with span("parse"):
+                    context, word = _parse_session_line(line)
+            except ValueError as exc:
+                typer.echo(str(exc), err=True)
                 continue
-            if action == "s":
-                typer.echo("Skipped.", err=True)
-                break
-            if action not in {"a", "u"}:
-                typer.echo("Unknown action.", err=True)
+
+            if not word:
                 continue
 
-            tts_text = card.tts_text or card.word_base
-            fields = card_to_fields(card, config.field_map)
-
-            if action == "a":
-                audio_field_value: str | None = None
-                if config.tts_enabled and tts_text:
-                    audio_field_value = build_audio_field(
-                        config.ankiconnect_url,
-                        tts_text,
-                        voice=config.tts_voice,
-                        rate=config.tts_rate,
-                    )
-                    fields[config.tts_field] = audio_field_value
-                note = {
-                    "deckName": config.deck,
-                    "modelName": config.note_model,
-                    "fields": fields,
-                    "options": {"allowDuplicate": False},
-                    "tags": ["auto"] + (["tts"] if audio_field_value else []),
-                }
+            card_span.set(word=word)
+            with span("clean"):
+                context_clean = clean_context(context)
+            if not dry_run:
+                precheck = _precheck_duplicate(mirror, word, yes=yes)
+                if precheck != "g":
+                    card_span.set(action=precheck)
+                    if precheck == "q":
+                        return
+                    typer.echo("Skipped.", err=True)
+                    continue
+            prefetch_mirror = None if dry_run else mirror
+            _schedule_prefetch(prefetcher, source.upcoming(), prefetch_mirror)
+            current_card: dict[str, str] | None = None
+            user_prompt: str | None = None
+            target_fields: list[str] = []
+            existing_note_ids: list[int] | None = None
+
+            while True:
+                # A partial regeneration only streams the changed keys, so the merged card is rendered at the end.
+                card_stream = (
+                    _CardStream(console, mirror, lookup=not dry_run and existing_note_ids is None)
+                    if stream and not target_fields
+                    else None
+                )
+                on_field = card_stream.on_field if card_stream is not None else None
                 try:
-                    new_id = add_note(config.ankiconnect_url, note)
+                    with span("generate", regenerate=current_card is not None, fields=",".join(target_fields) or None):
+                        if current_card is None:
+                            card = prefetcher.card(context_clean, word, inline=partial(generate, on_field=on_field))
+                        else:
+                            card = generate(
+                                context_clean,
+                                word,
+                                current_card=current_card,
+                                user_prompt=user_prompt,
+                                fields=target_fields,
+                                on_field=on_field,
+                            )
                 except Exception as exc:
-                    typer.echo(f"AnkiConnect error: {exc}", err=True)
+                    if card_stream is not None:
+                        card_stream.renderer.finish()
+                    typer.echo(f"OpenAI error: {exc}", err=True)
+                    break
+
+                if card_stream is not None and card_stream.renderer.fields:
+                    card_stream.renderer.finish()
+                else:
+                    render_card(console, card)
+                _schedule_prefetch(prefetcher, source.upcoming(), prefetch_mirror)
+
+                if dry_run:
+                    break
+
+                with span("duplicate_lookup") as lookup_span:
+                    if existing_note_ids is None and card_stream is not None:
+                        existing_note_ids = card_stream.existing_notes(card.word_base)
+                    if existing_note_ids is None:
+                        existing_note_ids = find_existing_notes(mirror, card.word_base)
+                    lookup_span.set(matches=len(existing_note_ids))
+
+                has_existing = bool(existing_note_ids)
+                default_action = "a" if not has_existing else "s"
+
+                if yes:
+                    action = default_action
+                else:
+                    actions = ["Add", "Update", "Skip", "Regenerate", "Quit"]
+                    action_map = ["a", "u", "s", "r", "q"]
+                    default_index = action_map.index(default_action)
+                    with span("prompt"):
+                        selected = select_menu(
+                            "Choose an action",
+                            actions,
+                            hint="Use ↑/↓ and Enter.",
+                            default_index=default_index,
+                        )
+                    action = action_map[selected]
+                card_span.set(action=action)
+
+                if action == "q":
+                    return
+                if action == "r":
+                    with span("prompt"):
+                        feedback = input(
+                            "Feedback for regeneration (optional; prefix fields to change only those, "
+                            "e.g. 'notes, context_ru: ...'): "
+                        ).strip()
+                    current_card = card.as_dict()
+                    target_fields, user_prompt = split_field_prompt(feedback, config.field_map)
+                    continue
+                if action == "s":
+                    typer.echo("Skipped.", err=True)
+                    break
+                if action not in {"a", "u"}:
+                    typer.echo("Unknown action.", err=True)
                     continue
-                typer.echo(f"Added note id: {new_id}", err=True)
-                break
 
-            if not existing_note_ids:
-                typer.echo("No existing note found to update.", err=True)
-                break
+                if action == "a":
+                    writer.submit(card.word_base, partial(_write_note, config, mirror, outbox, prefetcher, card))
+                    break
 
-            note_id = _pick_existing_note(config, existing_note_ids, allow_pick=True)
-            if note_id is None:
-                typer.echo("No existing note found to update.", err=True)
-                break
+                if not existing_note_ids:
+                    typer.echo("No existing note found to update.", err=True)
+                    break
+
+                note_id = _pick_existing_note(config, mirror, existing_note_ids, allow_pick=True)
+                if note_id is None:
+                    typer.echo("No existing note found to update.", err=True)
+                    break
 
-            notes = notes_info(config.ankiconnect_url, [note_id])
-            existing_audio = None
-            if notes:
-                existing_audio = notes[0]["fields"].get(config.tts_field, {}).get("value")
-
-            if config.tts_enabled and tts_text:
-                if not existing_audio:
-                    fields[config.tts_field] = build_audio_field(
-                        config.ankiconnect_url,
-                        tts_text,
-                        voice=config.tts_voice,
-                        rate=config.tts_rate,
-                    )
-
-            update_note_fields(config.ankiconnect_url, note_id, fields)
-            typer.echo(f"Updated note id: {note_id}", err=True)
-            break
+                notes = mirrored_notes(mirror, config.ankiconnect_url, [note_id])
+                has_audio = bool(notes and notes[0]["fields"].get(config.tts_field, {}).get("value"))
+                writer.submit(
+                    card.word_base,
+                    partial(_write_note, config, mirror, outbox, prefetcher, card, note_id, has_audio=has_audio),
+                )
+                break
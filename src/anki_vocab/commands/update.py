@@ -1,26 +1,46 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import replace
+from pathlib import Path
 from typing import Annotated, Any
 
 import typer
 from rich.console import Console
 
-from ..core.ankimapping import card_to_fields, note_to_card_payload, word_field_name
-from ..core.audio import build_audio_field
+from ..core.ankimapping import card_to_fields, note_to_card_payload
+from ..core.audio import build_audio_field, upload_error
+from ..core.cache import CardCache
 from ..core.cleaning import clean_context
 from ..core.config import Config, resolve_config
+from ..core.journal import UpdateJournal, job_key
+from ..core.mirror import DeckMirror
+from ..core.outbox import WriteOutbox
 from ..core.prompting import render_card
-from ..integrations.ankiconnect import (
-    find_notes,
-    notes_info,
-    update_note_fields,
+from ..core.schema import parse_card, resolve_card_fields, split_field_prompt
+from ..core.tracing import profiling, span, tracing
+from ..integrations.ankiconnect import AnkiConnectBatch, find_notes, notes_info
+from ..integrations.edge_tts import configure_tts_engine
+from ..integrations.openai_client import connection_stats, generate_card
+from .bulk_update import job_payload, run_bulk_update
+from .client import DaemonUnavailable, daemon_request
+from .utils import (
+    confirm_menu,
+    find_existing_notes,
+    mirrored_notes,
+    note_field_value,
+    queued_message,
+    select_note_id,
 )
-from ..integrations.openai_client import generate_card
-from .utils import confirm_menu, note_field_value, select_note_id
 
 
-def _resolve_note_id(config: Config, *, word: str | None, note_id: int | None) -> tuple[int, dict[str, Any]]:
+def _resolve_note_id(
+    config: Config,
+    mirror: DeckMirror,
+    *,
+    word: str | None,
+    note_id: int | None,
+) -> tuple[int, dict[str, Any]]:
     if note_id is not None:
         notes = notes_info(config.ankiconnect_url, [note_id])
         if not notes:
@@ -30,13 +50,11 @@ def _resolve_note_id(config: Config, *, word: str | None, note_id: int | None) -
     if not word:
         raise typer.BadParameter("Provide --word or --note-id.")
 
-    word_field = word_field_name(config.field_map)
-    query = f'note:"{config.note_model}" {word_field}:"{word}"'
-    note_ids = find_notes(config.ankiconnect_url, query)
+    note_ids = find_existing_notes(mirror, word)
     if not note_ids:
         raise typer.BadParameter("No matching notes found.")
 
-    notes = notes_info(config.ankiconnect_url, note_ids)
+    notes = mirrored_notes(mirror, config.ankiconnect_url, note_ids)
     if not notes:
         raise typer.BadParameter("No matching notes found.")
 
@@ -53,6 +71,37 @@ def _resolve_note_id(config: Config, *, word: str | None, note_id: int | None) -
     return selected, picked
 
 
+def _target_fields(config: Config, fields: str | None, prompt: str | None) -> tuple[list[str], str | None]:
+    try:
+        targets = resolve_card_fields(fields.split(","), config.field_map) if fields else []
+    except ValueError as exc:
+        raise typer.BadParameter(str(exc), param_hint="--fields") from exc
+    if prompt:
+        prompt_fields, prompt = split_field_prompt(prompt, config.field_map)
+        targets += [key for key in prompt_fields if key not in targets]
+    return targets, prompt
+
+
+def _forward_update(params: dict[str, Any], *, dry_run: bool) -> bool:
+    try:
+        result = daemon_request("update", params)
+    except DaemonUnavailable:
+        return False
+    except Exception as exc:
+        typer.echo(f"Error: {exc}", err=True)
+        raise typer.Exit(code=4) from exc
+
+    card = parse_card(result["card"])
+    render_card(Console(stderr=True), card)
+    if dry_run:
+        return True
+    if result["queued"]:
+        typer.echo(f"Queued: {card.word_base}; run `anki-vocab flush` once Anki is up.", err=True)
+    else:
+        typer.echo(f"Updated note id: {result['note_id']}", err=True)
+    return True
+
+
 def _prompt_note_id() -> int:
     while True:
         raw = input("Note id: ").strip()
@@ -71,27 +120,192 @@ def update_command(
         typer.Option("--sentence", help="Context sentence (defaults to note field)."),
     ] = None,
     prompt: Annotated[str | None, typer.Option("--prompt", help="Instruction for updating the note.")] = None,
+    fields: Annotated[
+        str | None,
+        typer.Option("--fields", help="Comma-separated card fields to regenerate; the rest are kept."),
+    ] = None,
+    query: Annotated[
+        str | None,
+        typer.Option("--query", help="Anki search; regenerate every matching note."),
+    ] = None,
     note_model: Annotated[str | None, typer.Option("--note-model", help="Anki note model name.")] = None,
     openai_model: Annotated[str | None, typer.Option("--openai-model", help="OpenAI model name.")] = None,
     voice: Annotated[str | None, typer.Option("--voice", help="Edge TTS voice.")] = None,
     rate: Annotated[str | None, typer.Option("--rate", help="Edge TTS rate.")] = None,
     no_tts: Annotated[bool, typer.Option("--no-tts", help="Disable TTS.")] = False,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Bypass the generated card cache.")] = False,
     dry_run: Annotated[bool, typer.Option("--dry-run", help="Preview only, no writes.")] = False,
+    concurrency: Annotated[
+        int,
+        typer.Option("--concurrency", min=1, help="Parallel OpenAI generations with --query."),
+    ] = 4,
+    batch_size: Annotated[
+        int,
+        typer.Option("--batch-size", min=1, help="Notes per AnkiConnect write with --query."),
+    ] = 50,
+    yes: Annotated[bool, typer.Option("--yes", help="Skip the confirmation.")] = False,
+    restart: Annotated[
+        bool,
+        typer.Option("--restart", help="Discard saved progress for this --query and prompt."),
+    ] = False,
+    local: Annotated[bool, typer.Option("--local", help="Run in-process even if a daemon is running.")] = False,
+    trace: Annotated[
+        Path | None,
+        typer.Option(
+            "--trace", envvar="ANKI_VOCAB_TRACE_FILE", help="Append per-stage timing spans to this JSONL file."
+        ),
+    ] = None,
+    profile: Annotated[
+        bool, typer.Option("--profile", help="Profile the run and print the hottest functions.")
+    ] = False,
+) -> None:
+    # The daemon runs with its own config, so only a non-interactive --note-id update without overrides is forwarded.
+    overrides = any([note_model, openai_model, voice, rate, no_tts, no_cache, trace, profile])
+    if note_id is not None and query is None and word is None and (yes or dry_run) and not (local or overrides):
+        params: dict[str, Any] = {"note_id": note_id, "prompt": prompt, "fields": fields, "sentence": sentence}
+        if _forward_update({**params, "dry_run": dry_run}, dry_run=dry_run):
+            return
+
+    with tracing(trace), profiling(profile):
+        config = resolve_config()
+        config = replace(
+            config,
+            note_model=note_model or config.note_model,
+            openai_model=openai_model or config.openai_model,
+            tts_voice=voice or config.tts_voice,
+            tts_rate=rate or config.tts_rate,
+            tts_enabled=(not no_tts) and config.tts_enabled,
+        )
+        configure_tts_engine(max_concurrency=config.tts_concurrency)
+        target_fields, prompt = _target_fields(config, fields, prompt)
+
+        if query is not None:
+            if word is not None or note_id is not None or sentence is not None:
+                raise typer.BadParameter("--query cannot be combined with --word, --note-id or --sentence.")
+            _update_query(
+                config,
+                query=query,
+                prompt=prompt,
+                fields=target_fields,
+                concurrency=concurrency,
+                batch_size=batch_size,
+                yes=yes,
+                restart=restart,
+                no_cache=no_cache,
+                dry_run=dry_run,
+            )
+            return
+
+        if note_id is None and word is None:
+            note_id = _prompt_note_id()
+
+        mirror = DeckMirror.open_default(config)
+        try:
+            with span("update.note", note_id=note_id, word=word):
+                _update_note(
+                    config,
+                    mirror,
+                    word=word,
+                    note_id=note_id,
+                    sentence=sentence,
+                    prompt=prompt,
+                    fields=target_fields,
+                    no_cache=no_cache,
+                    dry_run=dry_run,
+                    yes=yes,
+                )
+        finally:
+            mirror.close()
+
+
+def _update_query(
+    config: Config,
+    *,
+    query: str,
+    prompt: str | None,
+    fields: list[str],
+    concurrency: int,
+    batch_size: int,
+    yes: bool,
+    restart: bool,
+    no_cache: bool,
+    dry_run: bool,
 ) -> None:
-    config = resolve_config()
-    config = replace(
-        config,
-        note_model=note_model or config.note_model,
-        openai_model=openai_model or config.openai_model,
-        tts_voice=voice or config.tts_voice,
-        tts_rate=rate or config.tts_rate,
-        tts_enabled=(not no_tts) and config.tts_enabled,
+    note_ids = find_notes(config.ankiconnect_url, query)
+    job = job_key(job_payload(config, query=query, prompt=prompt, fields=fields))
+    journal = UpdateJournal.open_default()
+    outbox = WriteOutbox.open_default()
+    cache = None
+    try:
+        if dry_run:
+            # A preview only reads the journal, so it leaves no job behind.
+            done_ids = set() if restart else journal.done(job)
+            pending_count = sum(1 for note_id in note_ids if note_id not in done_ids)
+        else:
+            journal.start(job, query, note_ids, restart=restart)
+            pending = journal.pending(job)
+            pending_count = len(pending)
+        done = len(note_ids) - pending_count
+        typer.echo(f"{len(note_ids)} notes match, {pending_count} to update ({done} already done).", err=True)
+        if dry_run or not pending_count:
+            return
+        if not yes and not confirm_menu(f"Regenerate {pending_count} notes?", default_yes=False):
+            typer.echo("Skipped.", err=True)
+            return
+
+        cache = None if no_cache else CardCache.open_default()
+        try:
+            with span("update.query", notes=len(pending)):
+                stats = asyncio.run(
+                    run_bulk_update(
+                        config,
+                        journal,
+                        job,
+                        pending,
+                        prompt=prompt,
+                        fields=fields,
+                        workers=concurrency,
+                        batch_size=batch_size,
+                        cache=cache,
+                        outbox=outbox,
+                    )
+                )
+        except OSError as exc:
+            # Only transport failures end up here; per-note errors are recorded in the journal by run_bulk_update.
+            typer.echo(f"Connection error: {exc}. Rerun the same command to resume.", err=True)
+            raise typer.Exit(code=3) from exc
+    finally:
+        journal.close()
+        outbox.close()
+        if cache is not None:
+            cache.close()
+    typer.echo(
+        f"Generated {stats.generated}, resumed {stats.resumed}, updated {stats.updated}, "
+        f"queued {stats.queued}, failed {stats.failed}.",
+        err=True,
     )
+    if stats.queued:
+        typer.echo("AnkiConnect was unavailable; run `anki-vocab flush` to send the queued updates.", err=True)
+    typer.echo(connection_stats().summary(), err=True)
+    if stats.failed:
+        raise typer.Exit(code=5)
 
-    if note_id is None and word is None:
-        note_id = _prompt_note_id()
 
-    note_id_value, note = _resolve_note_id(config, word=word, note_id=note_id)
+def _update_note(
+    config: Config,
+    mirror: DeckMirror,
+    *,
+    word: str | None,
+    note_id: int | None,
+    sentence: str | None,
+    prompt: str | None,
+    fields: list[str],
+    no_cache: bool,
+    dry_run: bool,
+    yes: bool = False,
+) -> None:
+    with span("note_lookup"):
+        note_id_value, note = _resolve_note_id(config, mirror, word=word, note_id=note_id)
 
     word_field = config.field_map.get("word_base", "Word")
     existing_word = note_field_value(note, word_field)
@@ -103,17 +317,24 @@ def update_command(
     if not sentence:
         sentence = existing_sentence or ""
 
-    sentence_clean = clean_context(sentence)
+    with span("clean"):
+        sentence_clean = clean_context(sentence)
     current_card = note_to_card_payload(note, config.field_map)
+    cache = None if no_cache else CardCache.open_default()
     try:
-        card = generate_card(
-            sentence_clean,
-            existing_word,
-            model=config.openai_model,
-            api_key=config.openai_api_key,
-            current_card=current_card,
-            user_prompt=prompt,
-        )
+        with span("generate", regenerate=True, fields=",".join(fields) or None):
+            card = generate_card(
+                sentence_clean,
+                existing_word,
+                model=config.openai_model,
+                api_key=config.openai_api_key,
+                base_url=config.openai_base_url,
+                timeout=config.openai_timeout,
+                cache=cache,
+                current_card=current_card,
+                user_prompt=prompt,
+                fields=fields,
+            )
     except Exception as exc:
         typer.echo(f"OpenAI error: {exc}", err=True)
         raise typer.Exit(code=4) from exc
@@ -123,23 +344,47 @@ def update_command(
     if dry_run:
         return
 
-    if not confirm_menu("Update this note?", default_yes=False):
-        typer.echo("Skipped.", err=True)
-        return
+    if not yes:
+        with span("prompt"):
+            confirmed = confirm_menu("Update this note?", default_yes=False)
+        if not confirmed:
+            typer.echo("Skipped.", err=True)
+            return
 
-    fields = card_to_fields(card, config.field_map)
+    note_fields = card_to_fields(card, config.field_map)
+    batch = AnkiConnectBatch(config.ankiconnect_url)
+    stored = None
 
     if config.tts_enabled:
         existing_audio = note_field_value(note, config.tts_field)
         if not existing_audio:
             tts_text = card.tts_text or card.word_base
-            audio_field_value = build_audio_field(
-                config.ankiconnect_url,
-                tts_text,
-                voice=config.tts_voice,
-                rate=config.tts_rate,
-            )
-            fields[config.tts_field] = audio_field_value
+            with span("audio"):
+                audio_field_value, stored = build_audio_field(
+                    config.ankiconnect_url,
+                    tts_text,
+                    voice=config.tts_voice,
+                    rate=config.tts_rate,
+                    batch=batch,
+                )
+            note_fields[config.tts_field] = audio_field_value
 
-    update_note_fields(config.ankiconnect_url, note_id_value, fields)
+    updated = batch.update_note_fields(note_id_value, note_fields)
+    outbox = WriteOutbox.open_default()
+    try:
+        with span("update_note", actions=len(batch)):
+            sent = outbox.send(batch, label=existing_word)
+    finally:
+        outbox.close()
+    if not sent:
+        typer.echo(queued_message(existing_word, updated.exception()), err=True)
+        return
+    updated.result()
+    mirror.remember(note_id_value, note_fields)
+    audio_error = upload_error(stored)
+    if audio_error is not None:
+        typer.echo(
+            f"AnkiConnect error: updated note id {note_id_value}, but its audio was not stored: {audio_error}", err=True
+        )
+        raise typer.Exit(code=3)
     typer.echo(f"Updated note id: {note_id_value}", err=True)
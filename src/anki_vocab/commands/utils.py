@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-from contextlib import contextmanager
-from typing import Any
 import sys
 import termios
+import threading
 import tty
+from contextlib import contextmanager
+from typing import Any
 
 import typer
 from rich.console import Console, Group
 from rich.live import Live
 from rich.text import Text
 
+from ..core.mirror import DeckMirror
+from ..core.tracing import span
+from ..integrations.ankiconnect import notes_info
 
 _CONSOLE = Console(stderr=True)
+_SYNC_LOCK = threading.Lock()
 
 
 @contextmanager
@@ -157,3 +162,39 @@ def select_note_id(notes: list[dict[str, Any]], field_map: dict[str, str]) -> in
         if raw.isdigit():
             return int(raw)
         _CONSOLE.print("Invalid note id.", style="red")
+
+
+def _sync_once(mirror: DeckMirror) -> None:
+    # The streaming lookup thread and the main thread may both get here first; the loser waits for the one sync.
+    with _SYNC_LOCK:
+        if mirror.sync_attempted:
+            return
+        mirror.sync_attempted = True
+        try:
+            with span("mirror.sync"):
+                mirror.sync()
+        except Exception as exc:
+            _CONSOLE.print(f"Deck mirror sync failed, using the local copy: {exc}", style="yellow")
+
+
+def find_existing_notes(mirror: DeckMirror, word: str) -> list[int]:
+    _sync_once(mirror)
+    with span("mirror.find", word=word):
+        return mirror.find(word)
+
+
+def find_similar_notes(mirror: DeckMirror, word: str) -> dict[int, str]:
+    _sync_once(mirror)
+    with span("mirror.find_similar", word=word):
+        return mirror.find_similar(word)
+
+
+def mirrored_notes(mirror: DeckMirror, ankiconnect_url: str, note_ids: list[int]) -> list[dict[str, Any]]:
+    notes = mirror.notes(note_ids)
+    if len(notes) == len(note_ids):
+        return notes
+    return notes_info(ankiconnect_url, note_ids)
+
+
+def queued_message(label: str, error: BaseException | None) -> str:
+    return f"AnkiConnect error: {error}. Queued {label}; run `anki-vocab flush` once Anki is up."
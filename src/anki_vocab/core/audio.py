@@ -1,32 +1,194 @@
 import hashlib
 import os
-import tempfile
+import threading
+from concurrent.futures import Future
+from pathlib import Path
 
-from ..integrations.ankiconnect import store_media_file
-from ..integrations.edge_tts import synthesize_tts
+from ..integrations.ankiconnect import (
+    AnkiConnectBatch,
+    ankiconnect_request,
+    get_client,
+    is_local_url,
+    store_media_data,
+    store_media_path,
+)
+from ..integrations.edge_tts import asynthesize_tts, synthesize_tts
+from .config import cache_dir
+
+MEDIA_PATTERN = "tts_*.mp3"
+_ANKI_MEDIA: dict[str, set[str]] = {}
+_ANKI_MEDIA_LOCK = threading.Lock()
 
 
 def _stable_id(text: str) -> str:
     return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
 
 
+def audio_filename(text: str, *, voice: str, rate: str) -> str:
+    return f"tts_{_stable_id(f'{voice}|{rate}|{text}')}.mp3"
+
+
+def audio_cache_dir() -> Path:
+    return cache_dir() / "audio"
+
+
+def _write_cached_audio(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.part")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+
+def _cached_audio_path(text: str, *, voice: str, rate: str) -> Path:
+    return audio_cache_dir() / audio_filename(text, voice=voice, rate=rate)
+
+
+def synthesize_audio(text: str, *, voice: str, rate: str) -> bytes:
+    cached = _cached_audio_path(text, voice=voice, rate=rate)
+    if cached.exists():
+        return cached.read_bytes()
+    data = synthesize_tts(text, voice=voice, rate=rate)
+    _write_cached_audio(cached, data)
+    return data
+
+
+async def asynthesize_audio(text: str, *, voice: str, rate: str) -> bytes:
+    cached = _cached_audio_path(text, voice=voice, rate=rate)
+    if cached.exists():
+        return cached.read_bytes()
+    data = await asynthesize_tts(text, voice=voice, rate=rate)
+    _write_cached_audio(cached, data)
+    return data
+
+
+def _ensure_cached_audio(text: str, *, voice: str, rate: str, audio: bytes | None) -> Path:
+    cached = _cached_audio_path(text, voice=voice, rate=rate)
+    if not cached.exists():
+        _write_cached_audio(cached, audio if audio is not None else synthesize_tts(text, voice=voice, rate=rate))
+    return cached
+
+
+async def _aensure_cached_audio(text: str, *, voice: str, rate: str) -> Path:
+    cached = _cached_audio_path(text, voice=voice, rate=rate)
+    if not cached.exists():
+        _write_cached_audio(cached, await asynthesize_tts(text, voice=voice, rate=rate))
+    return cached
+
+
+def _load_media_names(ankiconnect_url: str, names: list[str]) -> set[str]:
+    with _ANKI_MEDIA_LOCK:
+        known = _ANKI_MEDIA.get(ankiconnect_url)
+        if known is None:
+            known = set(names)
+            _ANKI_MEDIA[ankiconnect_url] = known
+        return known
+
+
+def anki_has_media(ankiconnect_url: str, filename: str) -> bool:
+    with _ANKI_MEDIA_LOCK:
+        known = _ANKI_MEDIA.get(ankiconnect_url)
+    if known is None:
+        try:
+            names = ankiconnect_request(ankiconnect_url, "getMediaFilesNames", {"pattern": MEDIA_PATTERN})
+        except Exception:
+            # Not cached: a failed listing is retried by the next clip instead of forcing uploads for good.
+            return False
+        known = _load_media_names(ankiconnect_url, names)
+    return filename in known
+
+
+async def aanki_has_media(ankiconnect_url: str, filename: str) -> bool:
+    with _ANKI_MEDIA_LOCK:
+        known = _ANKI_MEDIA.get(ankiconnect_url)
+    if known is None:
+        try:
+            names = await get_client(ankiconnect_url).arequest("getMediaFilesNames", {"pattern": MEDIA_PATTERN})
+        except Exception:
+            return False
+        known = _load_media_names(ankiconnect_url, names)
+    return filename in known
+
+
+def remember_media(ankiconnect_url: str, filename: str) -> None:
+    with _ANKI_MEDIA_LOCK:
+        _ANKI_MEDIA.setdefault(ankiconnect_url, set()).add(filename)
+
+
+def forget_media(ankiconnect_url: str, filenames: list[str]) -> None:
+    with _ANKI_MEDIA_LOCK:
+        _ANKI_MEDIA.get(ankiconnect_url, set()).difference_update(filenames)
+
+
+def _store_audio(
+    ankiconnect_url: str,
+    filename: str,
+    source: bytes | Path,
+    batch: AnkiConnectBatch | None,
+) -> Future[str] | None:
+    if batch is None:
+        if isinstance(source, Path):
+            store_media_path(ankiconnect_url, source, filename)
+        else:
+            store_media_data(ankiconnect_url, source, filename)
+        remember_media(ankiconnect_url, filename)
+        return None
+
+    def on_stored(future: Future[str]) -> None:
+        if future.exception() is None:
+            remember_media(ankiconnect_url, filename)
+
+    if isinstance(source, Path):
+        stored = batch.store_media_path(source, filename)
+    else:
+        stored = batch.store_media_data(source, filename)
+    stored.add_done_callback(on_stored)
+    return stored
+
+
+def upload_error(stored: Future[str] | None) -> BaseException | None:
+    # `multi` runs each action on its own, so a note can land while the clip it points at was rejected.
+    return None if stored is None else stored.exception()
+
+
 def build_audio_field(
     ankiconnect_url: str,
     text: str,
     *,
     voice: str,
     rate: str,
-) -> str:
-    tts_id = _stable_id(f"{voice}|{rate}|{text}")
-    audio_filename = f"tts_{tts_id}.mp3"
-    with tempfile.NamedTemporaryFile(prefix=f"anki_tts_{tts_id}_", suffix=".mp3", delete=False) as tmp:
-        tmp_mp3 = tmp.name
-    try:
-        synthesize_tts(text, tmp_mp3, voice=voice, rate=rate)
-        store_media_file(ankiconnect_url, tmp_mp3, audio_filename)
-    finally:
-        try:
-            os.remove(tmp_mp3)
-        except FileNotFoundError:
-            pass
-    return f"[sound:{audio_filename}]"
+    batch: AnkiConnectBatch | None = None,
+    audio: bytes | None = None,
+) -> tuple[str, Future[str] | None]:
+    filename = audio_filename(text, voice=voice, rate=rate)
+    if anki_has_media(ankiconnect_url, filename):
+        return f"[sound:{filename}]", None
+
+    # A local Anki reads the cached clip straight from disk instead of a base64 payload.
+    if is_local_url(ankiconnect_url):
+        path = _ensure_cached_audio(text, voice=voice, rate=rate, audio=audio)
+        stored = _store_audio(ankiconnect_url, filename, path, batch)
+    else:
+        data = audio if audio is not None else synthesize_audio(text, voice=voice, rate=rate)
+        stored = _store_audio(ankiconnect_url, filename, data, batch)
+    return f"[sound:{filename}]", stored
+
+
+async def abuild_audio_field(
+    ankiconnect_url: str,
+    text: str,
+    *,
+    voice: str,
+    rate: str,
+    batch: AnkiConnectBatch,
+) -> tuple[str, Future[str] | None]:
+    filename = audio_filename(text, voice=voice, rate=rate)
+    if await aanki_has_media(ankiconnect_url, filename):
+        return f"[sound:{filename}]", None
+
+    if is_local_url(ankiconnect_url):
+        path = await _aensure_cached_audio(text, voice=voice, rate=rate)
+        stored = _store_audio(ankiconnect_url, filename, path, batch)
+    else:
+        data = await asynthesize_audio(text, voice=voice, rate=rate)
+        stored = _store_audio(ankiconnect_url, filename, data, batch)
+    return f"[sound:{filename}]", stored
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any
+
+from .config import cache_dir
+
+DEFAULT_MAX_ENTRIES = 20_000
+DEFAULT_MAX_AGE_DAYS = 180
+
+
+def cache_key(payload: dict[str, Any]) -> str:
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class CardCache:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cards ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS cards_accessed_at ON cards (accessed_at)")
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future[str]] = {}
+        self._ainflight: dict[str, asyncio.Future[str]] = {}
+
+    @classmethod
+    def open_default(cls) -> CardCache:
+        return cls(cache_dir() / "cards.sqlite3")
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM cards WHERE key = ? AND created_at >= ?",
+                (key, now - self.max_age),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE cards SET accessed_at = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO cards (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._db.execute("DELETE FROM cards WHERE created_at < ?", (now - self.max_age,))
+        self._db.execute(
+            "DELETE FROM cards WHERE key IN (SELECT key FROM cards ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def get_or_create(self, key: str, create: Callable[[], str]) -> str:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            value = create()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            raise
+        self.put(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    async def aget_or_create(self, key: str, create: Callable[[], Awaitable[str]]) -> str:
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._ainflight.get(key)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            return await asyncio.shield(pending)
+
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._ainflight[key] = future
+        try:
+            value = await create()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting on it.
+            future.exception()
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._ainflight.get(key) is future:
+                del self._ainflight[key]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
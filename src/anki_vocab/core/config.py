@@ -29,10 +29,13 @@ class Config:
     ankiconnect_url: str
     openai_api_key: str
     openai_model: str
+    openai_base_url: str
+    openai_timeout: float
     tts_voice: str
     tts_rate: str
     tts_field: str
     tts_enabled: bool
+    tts_concurrency: int
 
 
 DEFAULT_CONFIG = Config(
@@ -42,10 +45,13 @@ DEFAULT_CONFIG = Config(
     ankiconnect_url="http://127.0.0.1:8765",
     openai_api_key="",
     openai_model="gpt-5.2",
+    openai_base_url="",
+    openai_timeout=60.0,
     tts_voice="en-US-AvaNeural",
     tts_rate="+0%",
     tts_field="Audio",
     tts_enabled=True,
+    tts_concurrency=4,
 )
 
 DEFAULT_CONFIG_DICT = {
@@ -55,11 +61,14 @@ DEFAULT_CONFIG_DICT = {
     "ankiconnect_url": DEFAULT_CONFIG.ankiconnect_url,
     "openai_api_key": DEFAULT_CONFIG.openai_api_key,
     "openai_model": DEFAULT_CONFIG.openai_model,
+    "openai_base_url": DEFAULT_CONFIG.openai_base_url,
+    "openai_timeout": DEFAULT_CONFIG.openai_timeout,
     "tts": {
         "voice": DEFAULT_CONFIG.tts_voice,
         "rate": DEFAULT_CONFIG.tts_rate,
         "field": DEFAULT_CONFIG.tts_field,
         "enabled": DEFAULT_CONFIG.tts_enabled,
+        "concurrency": DEFAULT_CONFIG.tts_concurrency,
     },
     "session": {},
 }
@@ -70,6 +79,11 @@ def config_path() -> Path:
     return base / "anki-vocab" / "config.json"
 
 
+def cache_dir() -> Path:
+    base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base / "anki-vocab"
+
+
 def _read_file_config(path: Path) -> dict[str, Any]:
     if not path.exists():
         return {}
@@ -104,10 +118,13 @@ def resolve_config() -> Config:
         "ANKI_VOCAB_ANKICONNECT_URL": ("ankiconnect_url", str),
         "ANKI_VOCAB_OPENAI_API_KEY": ("openai_api_key", str),
         "ANKI_VOCAB_OPENAI_MODEL": ("openai_model", str),
+        "ANKI_VOCAB_OPENAI_BASE_URL": ("openai_base_url", str),
+        "ANKI_VOCAB_OPENAI_TIMEOUT": ("openai_timeout", float),
         "ANKI_VOCAB_TTS_VOICE": ("tts.voice", str),
         "ANKI_VOCAB_TTS_RATE": ("tts.rate", str),
         "ANKI_VOCAB_TTS_FIELD": ("tts.field", str),
         "ANKI_VOCAB_TTS_ENABLED": ("tts.enabled", _coerce_bool),
+        "ANKI_VOCAB_TTS_CONCURRENCY": ("tts.concurrency", int),
     }
 
     for env_name, (key, caster) in env_map.items():
@@ -136,10 +153,13 @@ def resolve_config() -> Config:
         ankiconnect_url=str(merged.get("ankiconnect_url", DEFAULT_CONFIG.ankiconnect_url)),
         openai_api_key=str(merged.get("openai_api_key", DEFAULT_CONFIG.openai_api_key)),
         openai_model=str(merged.get("openai_model", DEFAULT_CONFIG.openai_model)),
+        openai_base_url=str(merged.get("openai_base_url", DEFAULT_CONFIG.openai_base_url)),
+        openai_timeout=float(merged.get("openai_timeout", DEFAULT_CONFIG.openai_timeout)),
         tts_voice=str(tts_config.get("voice", DEFAULT_CONFIG.tts_voice)),
         tts_rate=str(tts_config.get("rate", DEFAULT_CONFIG.tts_rate)),
         tts_field=str(tts_config.get("field", DEFAULT_CONFIG.tts_field)),
         tts_enabled=bool(tts_enabled),
+        tts_concurrency=int(tts_config.get("concurrency", DEFAULT_CONFIG.tts_concurrency)),
     )
 
 
@@ -173,11 +193,14 @@ def config_as_dict(config: Config) -> dict[str, Any]:
         "ankiconnect_url": config.ankiconnect_url,
         "openai_api_key": config.openai_api_key,
         "openai_model": config.openai_model,
+        "openai_base_url": config.openai_base_url,
+        "openai_timeout": config.openai_timeout,
         "tts": {
             "voice": config.tts_voice,
             "rate": config.tts_rate,
             "field": config.tts_field,
             "enabled": config.tts_enabled,
+            "concurrency": config.tts_concurrency,
         },
         "session": {},
     }
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from .config import cache_dir
+
+MAX_WORD_TOKENS = 4
+_HEAD_BYTES = 1024
+_KINDLE_SEPARATOR = b"=========="
+_KINDLE_LOCATION = re.compile(r"\blocation (\d+)(?:-(\d+))?", re.IGNORECASE)
+_TRIM = " \t\"'“”‘’.,;:!?()[]"
+
+
+@dataclass
+class Highlight:
+    context: str
+    word: str
+    key: str
+
+
+@dataclass
+class _KindleEntry:
+    title: str
+    kind: str
+    start: int | None
+    end: int | None
+    text: str
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _as_word(text: str) -> str | None:
+    word = text.strip().strip(_TRIM)
+    if word and len(word.split()) <= MAX_WORD_TOKENS:
+        return word
+    return None
+
+
+def _pair(highlight: str, note: str, *, title: str) -> Highlight | None:
+    # A short note on a sentence names the word to learn; a short highlight is the word itself.
+    highlight = " ".join(highlight.split())
+    note_word = _as_word(note)
+    if note_word is not None and highlight:
+        return Highlight(highlight, note_word, _digest(title, highlight, note))
+    word = _as_word(highlight)
+    if word is not None:
+        return Highlight("", word, _digest(title, highlight, note))
+    return None
+
+
+def _parse_kindle_entry(lines: list[str]) -> _KindleEntry | None:
+    lines = [line.strip().lstrip("\ufeff") for line in lines]
+    while lines and not lines[0]:
+        lines = lines[1:]
+    if len(lines) < 2 or not lines[1].startswith("-"):
+        return None
+    meta = lines[1].casefold()
+    kind = "bookmark" if "bookmark" in meta else "note" if " note " in f"{meta} " else "highlight"
+    location = _KINDLE_LOCATION.search(lines[1])
+    start = int(location.group(1)) if location else None
+    end = int(location.group(2) or location.group(1)) if location else None
+    text = "\n".join(line for line in lines[2:] if line)
+    return _KindleEntry(lines[0], kind, start, end, text)
+
+
+def _note_belongs_to(note: _KindleEntry, highlight: _KindleEntry) -> bool:
+    if note.title != highlight.title:
+        return False
+    if note.start is None or highlight.start is None or highlight.end is None:
+        return True
+    return highlight.start <= note.start <= highlight.end
+
+
+class KindleClippings:
+    # `My Clippings.txt` only ever grows, so a rerun resumes from the byte offset where the last one stopped.
+    def __init__(self, path: Path, *, offset: int = 0) -> None:
+        self.path = path
+        self.offset = offset
+
+    def _entries(self) -> Iterator[tuple[_KindleEntry, int]]:
+        with self.path.open("rb") as handle:
+            handle.seek(self.offset)
+            position = self.offset
+            lines: list[str] = []
+            for raw in handle:
+                position += len(raw)
+                if raw.strip().lstrip(b"\xef\xbb\xbf") != _KINDLE_SEPARATOR:
+                    lines.append(raw.decode("utf-8", errors="replace"))
+                    continue
+                entry = _parse_kindle_entry(lines)
+                if entry is not None:
+                    yield entry, position
+                lines = []
+            # A trailing entry without its separator is still being written, so it is read again next time.
+
+    def __iter__(self) -> Iterator[Highlight]:
+        pending: tuple[_KindleEntry, int] | None = None
+        for entry, end in self._entries():
+            if pending is not None:
+                highlight, highlight_end = pending
+                pending = None
+                if entry.kind == "note" and _note_belongs_to(entry, highlight):
+                    paired = _pair(highlight.text, entry.text, title=highlight.title)
+                    self.offset = end
+                    if paired is not None:
+                        yield paired
+                    continue
+                paired = _pair(highlight.text, "", title=highlight.title)
+                self.offset = highlight_end
+                if paired is not None:
+                    yield paired
+            if entry.kind == "highlight":
+                # Kindle writes a note right after the highlight it annotates, so wait for the next entry.
+                pending = (entry, end)
+                continue
+            self.offset = end
+            if entry.kind == "note":
+                paired = _pair(entry.text, "", title=entry.title)
+                if paired is not None:
+                    yield paired
+        if pending is not None:
+            highlight, highlight_end = pending
+            paired = _pair(highlight.text, "", title=highlight.title)
+            if paired is not None:
+                self.offset = highlight_end
+                yield paired
+            # Otherwise the sentence has no word yet; keep the offset so a note added later still pairs with it.
+
+
+class ReadwiseCsv:
+    # A Readwise export is rewritten in full each time, so new rows are found by content hash instead of offset.
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def __iter__(self) -> Iterator[Highlight]:
+        with self.path.open(encoding="utf-8-sig", newline="") as handle:
+            for row in csv.DictReader(handle):
+                paired = _pair(row.get("Highlight") or "", row.get("Note") or "", title=row.get("Book Title") or "")
+                if paired is not None:
+                    yield paired
+
+
+def _file_head(path: Path, offset: int) -> str:
+    with path.open("rb") as handle:
+        return hashlib.sha1(handle.read(min(offset, _HEAD_BYTES))).hexdigest()
+
+
+class ImportState:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "source TEXT PRIMARY KEY, offset INTEGER NOT NULL, head TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen (source TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (source, key))"
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_default(cls) -> ImportState:
+        return cls(cache_dir() / "imports.sqlite3")
+
+    def offset(self, source: str, path: Path) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT offset, head FROM sources WHERE source = ?", (source,)).fetchone()
+        if row is None:
+            return 0
+        offset, head = int(row[0]), row[1]
+        # A shorter file or a different first block means the file was replaced, so it is read from the start.
+        if offset > path.stat().st_size or _file_head(path, offset) != head:
+            return 0
+        return offset
+
+    def save_offset(self, source: str, path: Path, offset: int) -> None:
+        head = _file_head(path, offset)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sources (source, offset, head, updated_at) VALUES (?, ?, ?, ?)",
+                (source, offset, head, time.time()),
+            )
+
+    def seen(self, source: str) -> set[str]:
+        with self._lock:
+            rows = self._db.execute("SELECT key FROM seen WHERE source = ?", (source,)).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_seen(self, source: str, keys: list[str]) -> None:
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT OR IGNORE INTO seen (source, key) VALUES (?, ?)", [(source, key) for key in keys]
+            )
+            self._db.execute("COMMIT")
+
+    def reset(self, source: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM sources WHERE source = ?", (source,))
+            self._db.execute("DELETE FROM seen WHERE source = ?", (source,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .cache import cache_key
+from .config import cache_dir
+
+PENDING = "pending"
+GENERATED = "generated"
+DONE = "done"
+FAILED = "failed"
+
+
+def job_key(payload: dict[str, Any]) -> str:
+    return cache_key(payload)[:16]
+
+
+class UpdateJournal:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job TEXT PRIMARY KEY, description TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            "job TEXT NOT NULL, note_id INTEGER NOT NULL, status TEXT NOT NULL, card TEXT, error TEXT, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (job, note_id))"
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_default(cls) -> UpdateJournal:
+        return cls(cache_dir() / "jobs.sqlite3")
+
+    def start(self, job: str, description: str, note_ids: list[int], *, restart: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            if restart:
+                self._db.execute("DELETE FROM items WHERE job = ?", (job,))
+            self._db.execute(
+                "INSERT OR IGNORE INTO jobs (job, description, created_at) VALUES (?, ?, ?)",
+                (job, description, now),
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO items (job, note_id, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(job, note_id, PENDING, now) for note_id in note_ids],
+            )
+            self._db.execute("COMMIT")
+
+    def pending(self, job: str) -> dict[int, str | None]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT note_id, card FROM items WHERE job = ? AND status != ? ORDER BY note_id",
+                (job, DONE),
+            ).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def done(self, job: str) -> set[int]:
+        with self._lock:
+            rows = self._db.execute("SELECT note_id FROM items WHERE job = ? AND status = ?", (job, DONE)).fetchall()
+        return {row[0] for row in rows}
+
+    def counts(self, job: str) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM items WHERE job = ? GROUP BY status", (job,))
+            return dict(rows.fetchall())
+
+    def _set(self, job: str, note_ids: list[int], status: str, *, card: str | None, error: str | None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE items SET status = ?, card = COALESCE(?, card), error = ?, updated_at = ? "
+                "WHERE job = ? AND note_id = ?",
+                [(status, card, error, now, job, note_id) for note_id in note_ids],
+            )
+
+    def record_card(self, job: str, note_id: int, card: str) -> None:
+        self._set(job, [note_id], GENERATED, card=card, error=None)
+
+    def mark_done(self, job: str, note_ids: list[int]) -> None:
+        self._set(job, note_ids, DONE, card=None, error=None)
+
+    def mark_failed(self, job: str, note_id: int, error: str) -> None:
+        self._set(job, [note_id], FAILED, card=None, error=error)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
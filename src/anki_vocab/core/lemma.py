@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import html
+import re
+
+_TAG = re.compile(r"<[^>]+>")
+_SEPARATORS = re.compile(r"[\s\-‐‑–—_/]+")
+_STRIP = re.compile(r"[^\w']+")
+_LEADING_WORDS = {"a", "an", "the", "to"}
+_VOWELS = set("aeiouy")
+
+# Common irregular forms; regular inflections are undone by the suffix rules in `_token_variants`.
+_IRREGULAR = {
+    "am": "be", "is": "be", "are": "be", "was": "be", "were": "be", "been": "be", "being": "be",
+    "has": "have", "had": "have", "does": "do", "did": "do", "done": "do", "goes": "go", "went": "go",
+    "gone": "go", "gave": "give", "given": "give", "took": "take", "taken": "take", "made": "make",
+    "came": "come", "got": "get", "gotten": "get", "ran": "run", "saw": "see", "seen": "see",
+    "brought": "bring", "thought": "think", "bought": "buy", "caught": "catch", "taught": "teach",
+    "found": "find", "left": "leave", "kept": "keep", "felt": "feel", "held": "hold", "told": "tell",
+    "said": "say", "paid": "pay", "broke": "break", "broken": "break", "spoke": "speak",
+    "spoken": "speak", "wrote": "write", "written": "write", "drove": "drive", "driven": "drive",
+    "rode": "ride", "ridden": "ride", "rose": "rise", "risen": "rise", "fell": "fall", "fallen": "fall",
+    "stood": "stand", "understood": "understand", "threw": "throw", "thrown": "throw", "grew": "grow",
+    "grown": "grow", "knew": "know", "known": "know", "flew": "fly", "flown": "fly", "drew": "draw",
+    "drawn": "draw", "began": "begin", "begun": "begin", "sang": "sing", "sung": "sing",
+    "drank": "drink", "drunk": "drink", "ate": "eat", "eaten": "eat", "chose": "choose",
+    "chosen": "choose", "forgot": "forget", "forgotten": "forget", "hid": "hide", "hidden": "hide",
+    "sent": "send", "spent": "spend", "built": "build", "lent": "lend", "meant": "mean", "met": "meet",
+    "led": "lead", "fed": "feed", "fled": "flee", "sold": "sell", "won": "win", "lost": "lose",
+    "shot": "shoot", "slept": "sleep", "swept": "sweep", "dealt": "deal", "dug": "dig",
+    "stuck": "stick", "struck": "strike", "hung": "hang", "wore": "wear", "worn": "wear",
+    "tore": "tear", "torn": "tear", "sought": "seek", "fought": "fight", "shook": "shake",
+    "shaken": "shake", "woke": "wake", "woken": "wake", "men": "man", "women": "woman",
+    "children": "child", "feet": "foot", "teeth": "tooth", "mice": "mouse", "geese": "goose",
+    "people": "person", "going": "go", "doing": "do", "dying": "die", "lying": "lie", "tying": "tie",
+}  # fmt: skip
+
+
+def _tokens(text: str) -> list[str]:
+    text = html.unescape(_TAG.sub(" ", text)).casefold().replace("’", "'")
+    tokens = [_STRIP.sub("", token).strip("'") for token in _SEPARATORS.split(text)]
+    tokens = [token for token in tokens if token]
+    while len(tokens) > 1 and tokens[0] in _LEADING_WORDS:
+        tokens = tokens[1:]
+    return tokens
+
+
+def word_key(text: str) -> str:
+    # Joining without separators makes "well-being", "well being" and "wellbeing" one key.
+    return "".join(_tokens(text))
+
+
+def _has_vowel(stem: str) -> bool:
+    return any(char in _VOWELS for char in stem)
+
+
+def _token_variants(token: str) -> set[str]:
+    variants = {token}
+    if token in _IRREGULAR:
+        variants.add(_IRREGULAR[token])
+    if token.endswith("'s"):
+        variants.add(token[:-2])
+    for suffix in ("ing", "ed"):
+        stem = token[: -len(suffix)]
+        # Short stems ("ring", "feed", "shed") are words of their own, not inflections.
+        if not token.endswith(suffix) or len(stem) < 3 or not _has_vowel(stem):
+            continue
+        variants.update({stem, stem + "e"})
+        if stem[-1] == stem[-2] and stem[-1] not in _VOWELS | {"l", "s", "z"}:
+            variants.add(stem[:-1])
+        if suffix == "ed" and stem.endswith("i"):
+            variants.add(stem[:-1] + "y")
+    if token.endswith("ies") and len(token) > 4:
+        variants.add(token[:-3] + "y")
+    if token.endswith("es") and len(token) > 3:
+        variants.add(token[:-2])
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")) and len(token) > 3:
+        variants.add(token[:-1])
+    return variants
+
+
+def word_candidates(text: str) -> set[str]:
+    # Stored words are base forms, so only the typed word is de-inflected, one token at a time:
+    # "gave up" -> "give up", "running" -> "run", "studies" -> "study".
+    tokens = _tokens(text)
+    candidates = {"".join(tokens)}
+    for index, token in enumerate(tokens):
+        for variant in _token_variants(token):
+            candidates.add("".join([*tokens[:index], variant, *tokens[index + 1 :]]))
+    candidates.discard("")
+    return candidates
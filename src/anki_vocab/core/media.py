@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..integrations.ankiconnect import AnkiConnectBatch, ankiconnect_request, is_local_url, notes_info
+from .audio import MEDIA_PATTERN, audio_cache_dir, forget_media
+from .outbox import WriteOutbox
+
+GC_BATCH_SIZE = 200
+_NOTES_INFO_CHUNK = 500
+_SOUND_REFERENCE = re.compile(r"\[sound:(tts_[^\]]+?\.mp3)\]")
+
+
+@dataclass
+class MediaReport:
+    media: list[str]
+    referenced: set[str]
+    orphans: list[str]
+    sizes: dict[str, int]
+    deleted: int = 0
+    errors: int = 0
+
+    @property
+    def reclaimable(self) -> int:
+        return sum(self.sizes.get(name, 0) for name in self.orphans)
+
+    @property
+    def unsized(self) -> int:
+        return sum(1 for name in self.orphans if name not in self.sizes)
+
+
+def referenced_media(url: str, note_model: str, outbox: WriteOutbox | None = None) -> set[str]:
+    batch = AnkiConnectBatch(url)
+    # Every field of the note model is scanned, plus notes of other models that mention a clip.
+    model_ids = batch.enqueue("findNotes", {"query": f'note:"{note_model}"'})
+    mention_ids = batch.enqueue("findNotes", {"query": MEDIA_PATTERN})
+    batch.flush()
+    note_ids = sorted({int(note_id) for note_id in [*model_ids.result(), *mention_ids.result()]})
+
+    referenced: set[str] = set()
+    for start in range(0, len(note_ids), _NOTES_INFO_CHUNK):
+        for note in notes_info(url, note_ids[start : start + _NOTES_INFO_CHUNK]):
+            for entry in (note or {}).get("fields", {}).values():
+                if isinstance(entry, dict):
+                    referenced.update(_SOUND_REFERENCE.findall(str(entry.get("value", ""))))
+    # Queued notes may point at a clip that an earlier, delivered write already stored.
+    for queued in outbox.entries() if outbox is not None else []:
+        if queued.url == url:
+            referenced.update(_SOUND_REFERENCE.findall(json.dumps(queued.actions, ensure_ascii=False)))
+    return referenced
+
+
+def media_sizes(url: str, names: list[str]) -> dict[str, int]:
+    directories = [audio_cache_dir()]
+    if is_local_url(url):
+        try:
+            directories.insert(0, Path(ankiconnect_request(url, "getMediaDirPath")))
+        except Exception:
+            pass
+    # A remote collection is sized from the local clip cache, which holds the same bytes under the same names.
+    sizes: dict[str, int] = {}
+    for name in names:
+        for directory in directories:
+            try:
+                sizes[name] = (directory / name).stat().st_size
+                break
+            except OSError:
+                continue
+    return sizes
+
+
+def delete_media(url: str, names: list[str], *, batch_size: int = GC_BATCH_SIZE) -> tuple[int, int]:
+    deleted = errors = 0
+    for start in range(0, len(names), batch_size):
+        chunk = names[start : start + batch_size]
+        with AnkiConnectBatch(url) as batch:
+            futures = [batch.enqueue("deleteMediaFile", {"filename": name}) for name in chunk]
+        forget_media(url, chunk)
+        failed = sum(1 for future in futures if future.exception() is not None)
+        deleted += len(chunk) - failed
+        errors += failed
+    return deleted, errors
+
+
+def collect_garbage(
+    url: str,
+    note_model: str,
+    *,
+    outbox: WriteOutbox | None = None,
+    dry_run: bool = False,
+    batch_size: int = GC_BATCH_SIZE,
+) -> MediaReport:
+    # Media is listed before notes are read: a clip and its note land in one `multi` request,
+    # so any clip in the listing already has its note by the time references are collected.
+    media = sorted(ankiconnect_request(url, "getMediaFilesNames", {"pattern": MEDIA_PATTERN}))
+    referenced = referenced_media(url, note_model, outbox)
+    orphans = [name for name in media if name not in referenced]
+    report = MediaReport(media, referenced, orphans, media_sizes(url, orphans))
+    if not dry_run and orphans:
+        report.deleted, report.errors = delete_media(url, orphans, batch_size=batch_size)
+    return report
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from ..integrations.ankiconnect import AnkiConnectBatch, notes_info
+from .ankimapping import word_field_name
+from .config import Config, cache_dir
+from .lemma import word_candidates, word_key
+
+_NOTES_INFO_CHUNK = 500
+
+
+def _word_key(value: str) -> str:
+    return value.strip().casefold()
+
+
+def _note_word(note: dict[str, Any], word_field: str) -> str:
+    entry = note.get("fields", {}).get(word_field)
+    if isinstance(entry, dict) and isinstance(entry.get("value"), str):
+        return entry["value"]
+    return ""
+
+
+class DeckMirror:
+    def __init__(self, path: Path, *, ankiconnect_url: str, note_model: str, word_field: str) -> None:
+        self.path = path
+        self.ankiconnect_url = ankiconnect_url
+        self.note_model = note_model
+        self.word_field = word_field
+        self.sync_attempted = False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "note_id INTEGER PRIMARY KEY, word TEXT NOT NULL, mod INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS notes_word ON notes (word)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._lock = threading.Lock()
+        self._similar: dict[str, list[int]] | None = None
+
+    @classmethod
+    def open_default(cls, config: Config) -> DeckMirror:
+        digest = hashlib.sha1(f"{config.ankiconnect_url}|{config.note_model}".encode()).hexdigest()[:12]
+        return cls(
+            cache_dir() / f"mirror-{digest}.sqlite3",
+            ankiconnect_url=config.ankiconnect_url,
+            note_model=config.note_model,
+            word_field=word_field_name(config.field_map),
+        )
+
+    def _meta(self, key: str) -> str | None:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self) -> int:
+        started = time.time()
+        base_query = f'note:"{self.note_model}"'
+        with self._lock:
+            last_sync = self._meta("last_sync")
+            local_ids = {row[0] for row in self._db.execute("SELECT note_id FROM notes")}
+
+        batch = AnkiConnectBatch(self.ankiconnect_url)
+        all_ids_future = batch.enqueue("findNotes", {"query": base_query})
+        edited_future = None
+        if last_sync is not None:
+            # `edited:N` has day granularity, so round up and add a day of slack around midnight.
+            days = math.ceil((started - float(last_sync)) / 86400) + 1
+            edited_future = batch.enqueue("findNotes", {"query": f"{base_query} edited:{days}"})
+        batch.flush()
+
+        all_ids = {int(note_id) for note_id in all_ids_future.result()}
+        changed = set(all_ids) if edited_future is None else {int(note_id) for note_id in edited_future.result()}
+        changed |= all_ids - local_ids
+
+        ordered = sorted(changed)
+        notes: list[dict[str, Any]] = []
+        for start in range(0, len(ordered), _NOTES_INFO_CHUNK):
+            notes.extend(notes_info(self.ankiconnect_url, ordered[start : start + _NOTES_INFO_CHUNK]))
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            removed = local_ids - all_ids
+            self._db.executemany("DELETE FROM notes WHERE note_id = ?", [(note_id,) for note_id in removed])
+            self._upsert(notes)
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_sync', ?)",
+                (str(started),),
+            )
+            self._db.execute("COMMIT")
+            self._similar = None
+        return len(notes) + len(removed)
+
+    def _upsert(self, notes: list[dict[str, Any]]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO notes (note_id, word, mod, payload) VALUES (?, ?, ?, ?)",
+            [
+                (
+                    int(note["noteId"]),
+                    _word_key(_note_word(note, self.word_field)),
+                    int(note.get("mod", 0)),
+                    json.dumps(note, ensure_ascii=False),
+                )
+                for note in notes
+                if note
+            ],
+        )
+
+    def find(self, word: str) -> list[int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT note_id FROM notes WHERE word = ? ORDER BY note_id",
+                (_word_key(word),),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def find_similar(self, word: str) -> dict[int, str]:
+        with self._lock:
+            if self._similar is None:
+                self._similar = {}
+                for note_id, stored in self._db.execute("SELECT note_id, word FROM notes ORDER BY note_id"):
+                    self._similar.setdefault(word_key(stored), []).append(note_id)
+            note_ids = sorted(
+                {note_id for candidate in word_candidates(word) for note_id in self._similar.get(candidate, [])}
+            )
+            if not note_ids:
+                return {}
+            rows = self._db.execute(
+                f"SELECT note_id, word FROM notes WHERE note_id IN ({','.join('?' * len(note_ids))})",
+                note_ids,
+            ).fetchall()
+        words = dict(rows)
+        return {note_id: words[note_id] for note_id in note_ids if note_id in words}
+
+    def notes(self, note_ids: list[int]) -> list[dict[str, Any]]:
+        if not note_ids:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT note_id, payload FROM notes WHERE note_id IN ({','.join('?' * len(note_ids))})",
+                note_ids,
+            ).fetchall()
+        payloads = {row[0]: json.loads(row[1]) for row in rows}
+        return [payloads[note_id] for note_id in note_ids if note_id in payloads]
+
+    def remember(self, note_id: int, fields: dict[str, str]) -> None:
+        with self._lock:
+            row = self._db.execute("SELECT payload FROM notes WHERE note_id = ?", (note_id,)).fetchone()
+            note = json.loads(row[0]) if row else {"noteId": note_id, "modelName": self.note_model, "fields": {}}
+            for order, (name, value) in enumerate(fields.items(), start=len(note["fields"])):
+                entry = note["fields"].setdefault(name, {"value": "", "order": order})
+                entry["value"] = value
+            note["mod"] = int(time.time())
+            self._upsert([note])
+            if self.word_field in fields:
+                self._similar = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import base64
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from ..integrations.ankiconnect import AnkiConnectBatch, ankiconnect_request
+from .audio import audio_cache_dir, remember_media
+from .config import cache_dir
+
+PENDING = "pending"
+FAILED = "failed"
+FLUSH_MAX_ACTIONS = 200
+CLAIM_SECONDS = 300.0
+
+
+@dataclass
+class OutboxEntry:
+    entry_id: int
+    url: str
+    label: str
+    actions: list[dict[str, Any]]
+    attempts: int
+
+
+@dataclass
+class FlushStats:
+    sent: int = 0
+    failed: int = 0
+    requests: int = 0
+    remaining: int = 0
+    error: str | None = None
+
+
+def _action_error(item: Any) -> str | None:
+    if isinstance(item, dict) and item.get("error") is not None:
+        return str(item["error"])
+    return None
+
+
+def _stored_action(action: dict[str, Any]) -> dict[str, Any]:
+    params = action.get("params") or {}
+    if action["action"] != "storeMediaFile" or "data" not in params:
+        return action
+    # The clip is already in the local cache, so the row keeps its path instead of a base64 copy of it.
+    cached = audio_cache_dir() / Path(params["filename"]).name
+    if not cached.is_file():
+        return action
+    return {**action, "params": {"filename": params["filename"], "path": str(cached)}}
+
+
+def _wire_action(action: dict[str, Any]) -> dict[str, Any]:
+    params = action.get("params") or {}
+    if action["action"] != "storeMediaFile" or "path" not in params:
+        return action
+    # A remote or sandboxed Anki cannot read our cache, so the bytes are loaded only when the entry is replayed.
+    try:
+        data = Path(params["path"]).read_bytes()
+    except OSError:
+        # Sent as is, Anki rejects the missing clip and the entry ends up failed instead of retried forever.
+        return action
+    return {**action, "params": {"filename": params["filename"], "data": base64.b64encode(data).decode("utf-8")}}
+
+
+def _chunks(entries: list[OutboxEntry], max_actions: int) -> Iterator[list[OutboxEntry]]:
+    chunk: list[OutboxEntry] = []
+    size = 0
+    for entry in entries:
+        if chunk and (entry.url != chunk[0].url or size + len(entry.actions) > max_actions):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(entry)
+        size += len(entry.actions)
+    if chunk:
+        yield chunk
+
+
+class WriteOutbox:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            "entry_id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, label TEXT NOT NULL, "
+            "actions TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL, error TEXT, "
+            "claimed_until REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open_default(cls) -> WriteOutbox:
+        return cls(cache_dir() / "outbox.sqlite3")
+
+    def put(self, url: str, actions: list[dict[str, Any]], *, label: str) -> int:
+        now = time.time()
+        payload = json.dumps([_stored_action(action) for action in actions], ensure_ascii=False)
+        # The writer that queues an entry sends it right away, so it starts out claimed.
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO writes (url, label, actions, status, attempts, claimed_until, created_at) "
+                "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                (url, label, payload, PENDING, now + CLAIM_SECONDS, now),
+            )
+            return int(cursor.lastrowid)
+
+    def ack(self, entry_ids: list[int]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM writes WHERE entry_id = ?", [(entry_id,) for entry_id in entry_ids])
+
+    def release(self, entry_ids: list[int], error: str, *, status: str | None = None) -> None:
+        with self._lock:
+            self._db.executemany(
+                "UPDATE writes SET status = COALESCE(?, status), attempts = attempts + 1, error = ?, "
+                "claimed_until = 0 WHERE entry_id = ?",
+                [(status, error, entry_id) for entry_id in entry_ids],
+            )
+
+    def claim(self, *, include_failed: bool = False) -> list[OutboxEntry]:
+        now = time.time()
+        statuses = [PENDING, FAILED] if include_failed else [PENDING]
+        with self._lock:
+            # Other processes (a daemon, a second `flush`) may drain concurrently, so claiming takes the write lock.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT entry_id, url, label, actions, attempts FROM writes "
+                    f"WHERE status IN ({','.join('?' * len(statuses))}) AND claimed_until < ? ORDER BY entry_id",
+                    (*statuses, now),
+                ).fetchall()
+                self._db.executemany(
+                    "UPDATE writes SET claimed_until = ? WHERE entry_id = ?",
+                    [(now + CLAIM_SECONDS, row[0]) for row in rows],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                # Left open, the transaction would hold the write lock and break every later BEGIN.
+                self._db.execute("ROLLBACK")
+                raise
+        return [OutboxEntry(row[0], row[1], row[2], json.loads(row[3]), row[4]) for row in rows]
+
+    def entries(self) -> list[OutboxEntry]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT entry_id, url, label, actions, attempts FROM writes ORDER BY entry_id"
+            ).fetchall()
+        return [OutboxEntry(row[0], row[1], row[2], json.loads(row[3]), row[4]) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM writes GROUP BY status")
+            return dict(rows.fetchall())
+
+    def failures(self) -> list[tuple[str, str]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT label, error FROM writes WHERE status = ? ORDER BY entry_id", (FAILED,)
+            ).fetchall()
+        return [(row[0], row[1] or "") for row in rows]
+
+    def send(self, batch: AnkiConnectBatch, *, label: str) -> bool:
+        entry_id = self.put(batch.url, batch.actions, label=label)
+        try:
+            batch.flush()
+        except Exception as exc:
+            self.release([entry_id], str(exc))
+            return False
+        # AnkiConnect answered, so per-action errors are final and surface through the batch futures.
+        self.ack([entry_id])
+        return True
+
+    async def asend(self, batch: AnkiConnectBatch, *, label: str) -> bool:
+        entry_id = self.put(batch.url, batch.actions, label=label)
+        try:
+            await batch.aflush()
+        except Exception as exc:
+            self.release([entry_id], str(exc))
+            return False
+        self.ack([entry_id])
+        return True
+
+    def flush(self, *, max_actions: int = FLUSH_MAX_ACTIONS, include_failed: bool = False) -> FlushStats:
+        stats = FlushStats()
+        chunks = list(_chunks(self.claim(include_failed=include_failed), max_actions))
+        for index, chunk in enumerate(chunks):
+            actions = [_wire_action(action) for entry in chunk for action in entry.actions]
+            try:
+                results = ankiconnect_request(chunk[0].url, "multi", {"actions": actions})
+                # Results are matched to actions by position, so a short answer cannot be settled.
+                if not isinstance(results, list) or len(results) != len(actions):
+                    raise ValueError(f"multi did not answer all {len(actions)} actions")
+            except Exception as exc:
+                stats.error = str(exc)
+                for unsent in chunks[index:]:
+                    self.release([entry.entry_id for entry in unsent], stats.error)
+                break
+            stats.requests += 1
+            self._settle(chunk, results, stats)
+        stats.remaining = sum(self.counts().values())
+        return stats
+
+    def _settle(self, chunk: list[OutboxEntry], results: list[Any], stats: FlushStats) -> None:
+        offset = 0
+        done: list[int] = []
+        for entry in chunk:
+            items = results[offset : offset + len(entry.actions)]
+            offset += len(entry.actions)
+            errors = []
+            for action, item in zip(entry.actions, items, strict=True):
+                error = _action_error(item)
+                # A retried addNote may have landed before the connection dropped; its duplicate error means done.
+                if error is not None and not (
+                    entry.attempts and action["action"] == "addNote" and "duplicate" in error
+                ):
+                    errors.append(f"{action['action']}: {error}")
+                elif action["action"] == "storeMediaFile":
+                    remember_media(entry.url, action["params"]["filename"])
+            if errors:
+                self.release([entry.entry_id], "; ".join(errors), status=FAILED)
+                stats.failed += 1
+            else:
+                done.append(entry.entry_id)
+        self.ack(done)
+        stats.sent += len(done)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+
+from .audio import audio_filename, synthesize_audio
+from .schema import Card
+from .tracing import span
+
+PrefetchKey = tuple[str, str]
+CLOSE_SECONDS = 5.0
+
+
+class CardPrefetcher:
+    def __init__(
+        self,
+        generate: Callable[[str, str], Card],
+        *,
+        voice: str | None = None,
+        rate: str = "+0%",
+        workers: int = 2,
+    ) -> None:
+        self._generate = generate
+        self._voice = voice
+        self._rate = rate
+        self._workers = workers
+        self._jobs: queue.Queue[tuple[PrefetchKey, Future[Card]] | None] = queue.Queue()
+        self._cards: dict[PrefetchKey, Future[Card]] = {}
+        self._audio: dict[str, Future[bytes]] = {}
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, context: str, word: str) -> None:
+        key = (context, word)
+        with self._lock:
+            if self._closed or key in self._cards:
+                return
+            future: Future[Card] = Future()
+            self._cards[key] = future
+            if len(self._threads) < self._workers:
+                # Daemon threads so in-flight prefetches never hold up interpreter exit.
+                thread = threading.Thread(target=self._work, name="anki-vocab-prefetch", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        self._jobs.put((key, future))
+
+    def card(self, context: str, word: str, *, inline: Callable[[str, str], Card] | None = None) -> Card:
+        with self._lock:
+            future = self._cards.pop((context, word), None)
+        if future is None:
+            return (inline or self._generate)(context, word)
+        return future.result()
+
+    def take_audio(self, filename: str) -> bytes | None:
+        with self._lock:
+            future = self._audio.pop(filename, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
+    def close(self, *, timeout: float = CLOSE_SECONDS) -> None:
+        with self._lock:
+            self._closed = True
+            pending = [*self._cards.values(), *self._audio.values()]
+            self._cards.clear()
+            self._audio.clear()
+            threads = list(self._threads)
+        for future in pending:
+            future.cancel()
+        for _ in threads:
+            self._jobs.put(None)
+        # Cancelling cannot stop a running prefetch, so wait for it before the caller closes the clients and cache.
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            key, future = job
+            if self._closed or not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with span("prefetch.generate", word=key[1]):
+                    card = self._generate(*key)
+            except BaseException as exc:
+                future.set_exception(exc)
+                continue
+            future.set_result(card)
+            self._prefetch_audio(card)
+
+    def _prefetch_audio(self, card: Card) -> None:
+        text = card.tts_text or card.word_base
+        if self._voice is None or not text:
+            return
+        filename = audio_filename(text, voice=self._voice, rate=self._rate)
+        future: Future[bytes] = Future()
+        with self._lock:
+            if self._closed or filename in self._audio:
+                return
+            self._audio[filename] = future
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with span("prefetch.audio", chars=len(text)):
+                future.set_result(synthesize_audio(text, voice=self._voice, rate=self._rate))
+        except BaseException as exc:
+            future.set_exception(exc)
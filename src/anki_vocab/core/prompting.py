@@ -17,6 +17,8 @@ CARD_DISPLAY_ORDER = (
     "tts_text",
 )
 
+_CARD_HEADER = "\nGenerated card:\n"
+
 
 def format_card_for_display(card: Card) -> Text:
     data = card.as_dict()
@@ -27,15 +29,40 @@ def format_card_for_display(card: Card) -> Text:
     gutter = max_key_len + 2
 
     output = Text()
-    output.append("\nGenerated card:\n", style="bold white")
+    output.append(_CARD_HEADER, style="bold white")
     for key in keys:
-        value = data[key].strip()
-        output.append(key, style="white")
-        output.append(" " * (gutter - len(key)))
-        output.append(value, style="dim")
-        output.append("\n")
+        _append_field(output, key, data[key], gutter)
     return output
 
 
+def _append_field(output: Text, key: str, value: str, gutter: int) -> None:
+    output.append(key, style="white")
+    output.append(" " * (gutter - len(key)))
+    output.append(value.strip(), style="dim")
+    output.append("\n")
+
+
 def render_card(console: Console, card: Card) -> None:
     console.print(format_card_for_display(card), highlight=False)
+
+
+class CardStreamRenderer:
+    def __init__(self, console: Console) -> None:
+        self.console = console
+        self.fields: dict[str, str] = {}
+        # Streamed fields print before the full key set is known, so align on every known card key.
+        self._gutter = max(len(key) for key in CARD_DISPLAY_ORDER) + 2
+
+    def field(self, key: str, value: str) -> None:
+        if key in self.fields:
+            return
+        output = Text()
+        if not self.fields:
+            output.append(_CARD_HEADER, style="bold white")
+        self.fields[key] = value
+        _append_field(output, key, value, max(self._gutter, len(key) + 2))
+        self.console.print(output, highlight=False, end="")
+
+    def finish(self) -> None:
+        if self.fields:
+            self.console.print()
@@ -73,3 +73,58 @@ def parse_card(payload: dict[str, Any]) -> Card:
         cefr=payload["cefr"].strip(),
         tts_text=tts_text.strip() if isinstance(tts_text, str) else None,
     )
+
+
+CARD_FIELDS = (*CARD_REQUIRED_FIELDS, *CARD_OPTIONAL_FIELDS)
+
+# Regenerating a field makes these stale, so they are regenerated along with it.
+FIELD_DEPENDENCIES = {
+    "word_base": ("tts_text",),
+    "context_en": ("context_ru",),
+}
+
+
+def resolve_card_fields(names: list[str], field_map: dict[str, str]) -> list[str]:
+    aliases = {key.casefold(): key for key in CARD_FIELDS}
+    aliases.update({name.casefold(): key for key, name in field_map.items() if key in CARD_FIELDS})
+    resolved: list[str] = []
+    for name in names:
+        key = aliases.get(name.strip().casefold())
+        if key is None:
+            raise ValueError(f"Unknown card field: {name.strip()!r}. Use one of: {', '.join(CARD_FIELDS)}")
+        if key not in resolved:
+            resolved.append(key)
+    return resolved
+
+
+def split_field_prompt(text: str, field_map: dict[str, str]) -> tuple[list[str], str | None]:
+    # "context_ru, notes: sound more natural" targets two fields; anything else is a plain prompt.
+    head, separator, rest = text.partition(":")
+    if separator and head.strip():
+        try:
+            fields = resolve_card_fields(head.split(","), field_map)
+        except ValueError:
+            fields = []
+        if fields:
+            return fields, rest.strip() or None
+    return [], text.strip() or None
+
+
+def expand_card_fields(fields: list[str], current_card: dict[str, str]) -> list[str]:
+    targets = set(fields)
+    for key in fields:
+        targets.update(FIELD_DEPENDENCIES.get(key, ()))
+    # Blank required fields cannot be kept, so they are filled in as well.
+    targets.update(key for key in CARD_REQUIRED_FIELDS if not current_card.get(key, "").strip())
+    return [key for key in CARD_FIELDS if key in targets]
+
+
+def merge_card_fields(current_card: dict[str, str], payload: dict[str, Any], fields: list[str]) -> Card:
+    missing = [key for key in fields if key in CARD_REQUIRED_FIELDS and key not in payload]
+    if missing:
+        raise RuntimeError(f"OpenAI returned invalid card JSON: missing {missing}")
+    merged: dict[str, Any] = {key: value for key, value in current_card.items() if key in CARD_FIELDS}
+    merged.update((key, payload[key]) for key in fields if key in payload)
+    if not merged.get("tts_text"):
+        merged.pop("tts_text", None)
+    return parse_card(merged)
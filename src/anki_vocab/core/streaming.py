@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Iterator
+from typing import Any
+
+_WHITESPACE = " \t\r\n"
+_INCOMPLETE = object()
+
+
+# Yields each top-level member of a JSON object as soon as its value is complete.
+class JsonObjectStream:
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: str | None = None
+        self._decoder = json.JSONDecoder()
+
+    def _skip_whitespace(self) -> None:
+        while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+
+    def _decode(self, *, scalar_needs_end: bool) -> Any:
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            return _INCOMPLETE
+        # A number or literal at the very end of the buffer may still be growing.
+        if scalar_needs_end and end == len(self._buffer) and self._buffer[self._pos] not in '"{[':
+            return _INCOMPLETE
+        self._pos = end
+        return value
+
+    def feed(self, chunk: str) -> Iterator[tuple[str, Any]]:
+        self._buffer += chunk
+        while True:
+            self._skip_whitespace()
+            if self._pos >= len(self._buffer):
+                return
+            char = self._buffer[self._pos]
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError(f"Expected a JSON object, got {char!r}")
+                self._pos += 1
+                self._state = "key"
+            elif self._state == "key":
+                if char == "}":
+                    self._pos += 1
+                    self._state = "end"
+                    continue
+                key = self._decode(scalar_needs_end=False)
+                if key is _INCOMPLETE:
+                    return
+                if not isinstance(key, str):
+                    raise ValueError("Expected a string key")
+                self._key = key
+                self._state = "colon"
+            elif self._state == "colon":
+                if char != ":":
+                    raise ValueError(f"Expected ':', got {char!r}")
+                self._pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                value = self._decode(scalar_needs_end=True)
+                if value is _INCOMPLETE:
+                    return
+                assert self._key is not None
+                yield self._key, value
+                self._state = "separator"
+            elif self._state == "separator":
+                self._pos += 1
+                if char == ",":
+                    self._state = "key"
+                elif char == "}":
+                    self._state = "end"
+                else:
+                    raise ValueError(f"Expected ',' or '}}', got {char!r}")
+            else:
+                return
+            # Drop consumed input so long responses do not re-scan it.
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
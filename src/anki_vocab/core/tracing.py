@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Any
+
+SERVICE_NAME = "anki-vocab"
+PROFILE_LIMIT = 25
+
+_KIND_INTERNAL = 1
+_KIND_CLIENT = 3
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+def _attribute_value(value: Any) -> dict[str, Any]:
+    # OTLP/JSON encodes 64-bit integers as strings.
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    def __init__(self, tracer: Tracer, name: str, parent: Span | None, *, client: bool) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent is not None else ""
+        self.kind = _KIND_CLIENT if client else _KIND_INTERNAL
+        self.attributes: dict[str, Any] = {}
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: str | None = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update((key, value) for key, value in attributes.items() if value is not None)
+
+    def as_otlp(self) -> dict[str, Any]:
+        span: dict[str, Any] = {
+            "traceId": self.tracer.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": _STATUS_OK} if self.error is None else {"code": _STATUS_ERROR, "message": self.error},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.trace_id = secrets.token_hex(16)
+        self._file: IO[str] = path.open("a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._resource = {
+            "attributes": [
+                {"key": "service.name", "value": _attribute_value(SERVICE_NAME)},
+                {"key": "process.pid", "value": _attribute_value(os.getpid())},
+            ]
+        }
+
+    def export(self, span: Span) -> None:
+        # One OTLP/JSON export request per line, the layout the collector's `otlpjsonfile` receiver reads.
+        record = {
+            "resourceSpans": [
+                {
+                    "resource": self._resource,
+                    "scopeSpans": [{"scope": {"name": "anki_vocab"}, "spans": [span.as_otlp()]}],
+                }
+            ]
+        }
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_TRACER: Tracer | None = None
+_CURRENT: contextvars.ContextVar[Span | None] = contextvars.ContextVar("anki_vocab_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    return _TRACER is not None
+
+
+@contextmanager
+def span(name: str, *, client: bool = False, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    tracer = _TRACER
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    current = Span(tracer, name, _CURRENT.get(), client=client)
+    current.set(**attributes)
+    token = _CURRENT.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        # `typer.Exit(0)` ends a command normally and should not mark its spans as failed.
+        if getattr(exc, "exit_code", None) != 0:
+            current.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _CURRENT.reset(token)
+        current.end_ns = time.time_ns()
+        tracer.export(current)
+
+
+@contextmanager
+def tracing(path: Path | None) -> Iterator[Tracer | None]:
+    global _TRACER
+    if path is None:
+        yield None
+        return
+    tracer = Tracer(path)
+    _TRACER = tracer
+    try:
+        yield tracer
+    finally:
+        _TRACER = None
+        tracer.close()
+
+
+@contextmanager
+def profiling(enabled: bool, *, limit: int = PROFILE_LIMIT, stream: IO[str] | None = None) -> Iterator[None]:
+    if not enabled:
+        yield
+        return
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        output = stream or sys.stderr
+        # Only the main thread is profiled; waits on worker threads show up as lock or queue time.
+        stats = pstats.Stats(profiler, stream=output).strip_dirs()
+        output.write("\nTop functions by own time:\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(limit)
+        output.write("Top functions by cumulative time:\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
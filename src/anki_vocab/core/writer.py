@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+from collections import deque
+from collections.abc import Callable
+
+DEFAULT_QUEUE_SIZE = 8
+
+WriteJob = Callable[[], str]
+
+
+class NoteWriter:
+    def __init__(self, *, maxsize: int = DEFAULT_QUEUE_SIZE) -> None:
+        self._jobs: queue.Queue[tuple[str, contextvars.Context, WriteJob] | None] = queue.Queue(maxsize)
+        self._results: deque[tuple[str, bool]] = deque()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._thread = threading.Thread(target=self._work, name="anki-vocab-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def submit(self, label: str, job: WriteJob) -> None:
+        with self._lock:
+            self._pending += 1
+        # A full queue blocks the caller, so a stalled Anki slows capture down instead of piling up cards.
+        self._jobs.put((label, contextvars.copy_context(), job))
+
+    def results(self) -> list[tuple[str, bool]]:
+        with self._lock:
+            results = list(self._results)
+            self._results.clear()
+        return results
+
+    def close(self) -> None:
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _work(self) -> None:
+        while True:
+            item = self._jobs.get()
+            if item is None:
+                return
+            label, context, job = item
+            try:
+                # Jobs run in the submitter's context so their spans nest under the card that queued them.
+                result = (context.run(job), True)
+            except Exception as exc:
+                result = (f"{label}: {exc}", False)
+            with self._lock:
+                self._pending -= 1
+                self._results.append(result)
@@ -1,29 +1,256 @@
+import asyncio
 import base64
 import json
-import urllib.request
+import ssl
+import threading
+import urllib.parse
+import weakref
+from collections.abc import Callable
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any
 
+from ..core.tracing import span
+
+
+class AnkiConnectError(RuntimeError):
+    pass
+
+
+# URLs whose Anki rejected a media path but accepted the same clip as bytes; later uploads skip the path.
+_PATH_REJECTED: set[str] = set()
 
-def ankiconnect_request(url: str, action: str, params: dict[str, Any] | None = None) -> Any:
-    payload = json.dumps({"action": action, "version": 6, "params": params or {}}).encode("utf-8")
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req) as resp:
-        data = json.loads(resp.read().decode("utf-8"))
 
+def _encode_request(action: str, params: dict[str, Any] | None) -> bytes:
+    return json.dumps({"action": action, "version": 6, "params": params or {}}).encode("utf-8")
+
+
+def _decode_response(action: str, body: bytes) -> Any:
+    data = json.loads(body.decode("utf-8"))
     if data.get("error") is not None:
-        raise RuntimeError(f"AnkiConnect error for {action}: {data['error']}")
+        raise AnkiConnectError(f"AnkiConnect error for {action}: {data['error']}")
     return data["result"]
 
 
+class _StaleConnection(Exception):
+    pass
+
+
+class _ConnectionPool:
+    def __init__(self, limit: int) -> None:
+        self.idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.slots = asyncio.Semaphore(limit)
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks: list[bytes] = []
+    while True:
+        size_line = await reader.readline()
+        if not size_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        size = int(size_line.split(b";", 1)[0].strip(), 16)
+        if size == 0:
+            while (await reader.readline()) not in {b"\r\n", b"\n", b""}:
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
+
+
+class AnkiConnectClient:
+    def __init__(self, url: str, *, timeout: float = 30.0, max_connections: int = 4) -> None:
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in {"http", "https"}:
+            raise ValueError(f"Unsupported AnkiConnect URL: {url}")
+        self.url = url
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._host = parsed.hostname or "127.0.0.1"
+        self._port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        host = f"[{self._host}]" if ":" in self._host else self._host
+        self._host_header = f"{host}:{self._port}"
+        self._path = parsed.path or "/"
+        self._ssl = ssl.create_default_context() if parsed.scheme == "https" else None
+        self._pools: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _ConnectionPool] = weakref.WeakKeyDictionary()
+        # Sync callers get one loop per thread, so prefetch, lookup and writer threads do not wait on each other.
+        self._local = threading.local()
+        self._loops: list[asyncio.AbstractEventLoop] = []
+        self._lock = threading.Lock()
+
+    def _pool(self) -> _ConnectionPool:
+        loop = asyncio.get_running_loop()
+        pool = self._pools.get(loop)
+        if pool is None:
+            pool = _ConnectionPool(self.max_connections)
+            self._pools[loop] = pool
+        return pool
+
+    async def arequest(self, action: str, params: dict[str, Any] | None = None) -> Any:
+        body = _encode_request(action, params)
+        pool = self._pool()
+        with span(f"ankiconnect.{action}", client=True) as request_span:
+            request_span.set(**{"http.request.body.size": len(body)})
+            if action == "multi":
+                request_span.set(actions=",".join(item["action"] for item in (params or {}).get("actions", [])))
+            async with pool.slots:
+                data = await asyncio.wait_for(self._send(pool, body), self.timeout)
+            return _decode_response(action, data)
+
+    async def amulti(self, actions: list[dict[str, Any]]) -> list[Any]:
+        return await self.arequest("multi", {"actions": actions})
+
+    async def _send(self, pool: _ConnectionPool, body: bytes) -> bytes:
+        while pool.idle:
+            reader, writer = pool.idle.pop()
+            try:
+                return await self._exchange(pool, reader, writer, body, reused=True)
+            except _StaleConnection:
+                continue
+        reader, writer = await asyncio.open_connection(self._host, self._port, ssl=self._ssl)
+        return await self._exchange(pool, reader, writer, body, reused=False)
+
+    async def _exchange(
+        self,
+        pool: _ConnectionPool,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        body: bytes,
+        *,
+        reused: bool,
+    ) -> bytes:
+        received = False
+        try:
+            head = (
+                f"POST {self._path} HTTP/1.1\r\n"
+                f"Host: {self._host_header}\r\n"
+                "Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: keep-alive\r\n\r\n"
+            )
+            writer.write(head.encode("ascii") + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise asyncio.IncompleteReadError(b"", None)
+            received = True
+            version, status, *_ = status_line.decode("latin-1").split(" ", 2)
+
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in {b"\r\n", b"\n", b""}:
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+            if "chunked" in headers.get("transfer-encoding", "").lower():
+                data = await _read_chunked(reader)
+            elif "content-length" in headers:
+                data = await reader.readexactly(int(headers["content-length"]))
+            else:
+                data = await reader.read()
+                keep_alive = False
+        except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError) as exc:
+            writer.close()
+            # Only a reused connection that died before answering is retried; once a response has started,
+            # AnkiConnect may already have run the action, and replaying an addNote or multi would repeat it.
+            if reused and not received:
+                raise _StaleConnection() from exc
+            raise ConnectionError(f"AnkiConnect closed the connection before a full response: {exc!r}") from exc
+        except BaseException:
+            writer.close()
+            raise
+
+        if keep_alive:
+            pool.idle.append((reader, writer))
+        else:
+            writer.close()
+
+        if not status.startswith("2"):
+            raise RuntimeError(f"AnkiConnect HTTP error: {status_line.decode('latin-1').strip()}")
+        return data
+
+    async def aclose(self) -> None:
+        pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is None:
+            return
+        while pool.idle:
+            _, writer = pool.idle.pop()
+            writer.close()
+
+    def request(self, action: str, params: dict[str, Any] | None = None) -> Any:
+        loop = getattr(self._local, "loop", None)
+        if loop is None or loop.is_closed():
+            loop = asyncio.new_event_loop()
+            self._local.loop = loop
+            with self._lock:
+                self._loops.append(loop)
+        return loop.run_until_complete(self.arequest(action, params))
+
+    def close(self) -> None:
+        with self._lock:
+            loops, self._loops = self._loops, []
+        for loop in loops:
+            if loop.is_closed() or loop.is_running():
+                continue
+            loop.run_until_complete(self.aclose())
+            loop.close()
+
+
+_CLIENTS: dict[str, AnkiConnectClient] = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def get_client(url: str) -> AnkiConnectClient:
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(url)
+        if client is None:
+            client = AnkiConnectClient(url)
+            _CLIENTS[url] = client
+        return client
+
+
+def close_clients() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
+
+
+def ankiconnect_request(url: str, action: str, params: dict[str, Any] | None = None) -> Any:
+    return get_client(url).request(action, params)
+
+
+def _media_params(data: bytes, filename_in_anki: str) -> dict[str, Any]:
+    b64 = base64.b64encode(data).decode("utf-8")
+    return {"filename": filename_in_anki, "data": b64}
+
+
 def store_media_file(url: str, local_path: str, filename_in_anki: str) -> str:
-    b64 = base64.b64encode(Path(local_path).read_bytes()).decode("utf-8")
-    return ankiconnect_request(url, "storeMediaFile", {"filename": filename_in_anki, "data": b64})
+    return store_media_data(url, Path(local_path).read_bytes(), filename_in_anki)
+
+
+def store_media_data(url: str, data: bytes, filename_in_anki: str) -> str:
+    return ankiconnect_request(url, "storeMediaFile", _media_params(data, filename_in_anki))
+
+
+def store_media_path(url: str, local_path: Path, filename_in_anki: str) -> str:
+    if url in _PATH_REJECTED:
+        return store_media_data(url, local_path.read_bytes(), filename_in_anki)
+    try:
+        return ankiconnect_request(url, "storeMediaFile", {"filename": filename_in_anki, "path": str(local_path)})
+    except AnkiConnectError:
+        stored = store_media_data(url, local_path.read_bytes(), filename_in_anki)
+        _PATH_REJECTED.add(url)
+        return stored
+
+
+def is_local_url(url: str) -> bool:
+    return urllib.parse.urlsplit(url).hostname in {"localhost", "127.0.0.1", "::1"}
 
 
 def find_notes(url: str, query: str) -> list[int]:
@@ -48,3 +275,165 @@ def update_note_fields(url: str, note_id: int, fields: dict[str, str]) -> None:
 def add_tags(url: str, note_id: int, tags: list[str]) -> None:
     if tags:
         ankiconnect_request(url, "addTags", {"notes": [note_id], "tags": " ".join(tags)})
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _to_none(value: Any) -> None:
+    return None
+
+
+class AnkiConnectBatch:
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self._actions: list[dict[str, Any]] = []
+        self._pending: list[tuple[Future[Any], Callable[[Any], Any]]] = []
+
+    def __len__(self) -> int:
+        return len(self._actions)
+
+    @property
+    def actions(self) -> list[dict[str, Any]]:
+        return list(self._actions)
+
+    def __enter__(self) -> "AnkiConnectBatch":
+        return self
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        if exc_type is None:
+            self.flush()
+
+    def enqueue(
+        self,
+        action: str,
+        params: dict[str, Any] | None = None,
+        *,
+        convert: Callable[[Any], Any] = _identity,
+    ) -> Future[Any]:
+        future: Future[Any] = Future()
+        self._actions.append({"action": action, "version": 6, "params": params or {}})
+        self._pending.append((future, convert))
+        return future
+
+    def store_media_file(self, local_path: str, filename_in_anki: str) -> Future[str]:
+        return self.store_media_data(Path(local_path).read_bytes(), filename_in_anki)
+
+    def store_media_data(self, data: bytes, filename_in_anki: str) -> Future[str]:
+        return self.enqueue("storeMediaFile", _media_params(data, filename_in_anki))
+
+    def store_media_path(self, local_path: Path, filename_in_anki: str) -> Future[str]:
+        if self.url in _PATH_REJECTED:
+            return self.store_media_data(local_path.read_bytes(), filename_in_anki)
+        return self.enqueue("storeMediaFile", {"filename": filename_in_anki, "path": str(local_path)})
+
+    def add_note(self, note: dict[str, Any]) -> Future[int]:
+        return self.enqueue("addNote", {"note": note}, convert=int)
+
+    def update_note_fields(self, note_id: int, fields: dict[str, str]) -> Future[None]:
+        return self.enqueue(
+            "updateNoteFields",
+            {"note": {"id": note_id, "fields": fields}},
+            convert=_to_none,
+        )
+
+    def add_tags(self, note_id: int, tags: list[str]) -> Future[None] | None:
+        if not tags:
+            return None
+        return self.enqueue("addTags", {"notes": [note_id], "tags": " ".join(tags)}, convert=_to_none)
+
+    def _take(self) -> tuple[list[dict[str, Any]], list[tuple[Future[Any], Callable[[Any], Any]]]]:
+        actions, pending = self._actions, self._pending
+        self._actions, self._pending = [], []
+        return actions, pending
+
+    def flush(self) -> None:
+        actions, pending = self._take()
+        if not actions:
+            return
+        try:
+            results = ankiconnect_request(self.url, "multi", {"actions": actions})
+        except Exception as exc:
+            _fail_pending(pending, exc)
+            raise
+        retries = _path_retries(actions, results)
+        if retries:
+            try:
+                retried = ankiconnect_request(self.url, "multi", {"actions": list(retries.values())})
+            except Exception:
+                retried = None
+            _merge_retries(self.url, results, retries, retried)
+        _resolve_pending(actions, pending, results)
+
+    async def aflush(self) -> None:
+        actions, pending = self._take()
+        if not actions:
+            return
+        try:
+            results = await get_client(self.url).amulti(actions)
+        except Exception as exc:
+            _fail_pending(pending, exc)
+            raise
+        retries = _path_retries(actions, results)
+        if retries:
+            try:
+                retried = await get_client(self.url).amulti(list(retries.values()))
+            except Exception:
+                retried = None
+            _merge_retries(self.url, results, retries, retried)
+        _resolve_pending(actions, pending, results)
+
+
+def _path_retries(actions: list[dict[str, Any]], results: Any) -> dict[int, dict[str, Any]]:
+    # A sandboxed (Flatpak, Snap) or containerised Anki cannot read our cache, so rejected paths are resent as bytes.
+    retries: dict[int, dict[str, Any]] = {}
+    if not isinstance(results, list) or len(results) != len(actions):
+        return retries
+    for index, (action, item) in enumerate(zip(actions, results)):
+        params = action["params"]
+        if action["action"] != "storeMediaFile" or "path" not in params:
+            continue
+        if not isinstance(item, dict) or item.get("error") is None:
+            continue
+        try:
+            data = Path(params["path"]).read_bytes()
+        except OSError:
+            continue
+        retries[index] = {**action, "params": _media_params(data, params["filename"])}
+    return retries
+
+
+def _merge_retries(url: str, results: list[Any], retries: dict[int, dict[str, Any]], retried: Any) -> None:
+    # If the retry itself failed, the original per-action errors stand.
+    if not isinstance(retried, list) or len(retried) != len(retries):
+        return
+    for index, item in zip(retries, retried):
+        results[index] = item
+        if isinstance(item, dict) and item.get("error") is None:
+            _PATH_REJECTED.add(url)
+
+
+def _fail_pending(pending: list[tuple[Future[Any], Callable[[Any], Any]]], exc: Exception) -> None:
+    for future, _ in pending:
+        future.set_exception(exc)
+
+
+def _resolve_pending(
+    actions: list[dict[str, Any]],
+    pending: list[tuple[Future[Any], Callable[[Any], Any]]],
+    results: list[Any],
+) -> None:
+    # Results are matched by position, so a short or malformed answer cannot settle any of them.
+    if not isinstance(results, list) or len(results) != len(pending):
+        count = len(results) if isinstance(results, list) else 0
+        error = AnkiConnectError(f"multi returned {count} results for {len(pending)} actions")
+        _fail_pending(pending, error)
+        raise error
+    # Actions inside `multi` run independently; each one carries its own error.
+    for action, (future, convert), item in zip(actions, pending, results, strict=True):
+        if isinstance(item, dict) and item.get("error") is not None:
+            future.set_exception(AnkiConnectError(f"AnkiConnect error for {action['action']}: {item['error']}"))
+            continue
+        value = item.get("result") if isinstance(item, dict) else item
+        future.set_result(convert(value))
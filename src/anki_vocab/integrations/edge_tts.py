@@ -1,16 +1,75 @@
-import subprocess
-
-
-def synthesize_tts(text: str, out_mp3: str, *, voice: str, rate: str) -> None:
-    cmd = [
-        "edge-tts",
-        "--voice",
-        voice,
-        "--rate",
-        rate,
-        "--text",
-        text,
-        "--write-media",
-        out_mp3,
-    ]
-    subprocess.run(cmd, check=True)
+import asyncio
+import threading
+import weakref
+
+from ..core.tracing import span
+
+DEFAULT_TTS_CONCURRENCY = 4
+
+
+class TTSEngine:
+    def __init__(self, *, max_concurrency: int = DEFAULT_TTS_CONCURRENCY) -> None:
+        self.max_concurrency = max_concurrency
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = asyncio.Semaphore(self.max_concurrency)
+            self._async_slots[loop] = slots
+        return slots
+
+    async def _stream(self, text: str, *, voice: str, rate: str) -> bytes:
+        # edge_tts pulls in aiohttp, which is slow to import and only needed once audio is requested.
+        import edge_tts
+
+        communicate = edge_tts.Communicate(text, voice, rate=rate)
+        chunks = [chunk["data"] async for chunk in communicate.stream() if chunk["type"] == "audio"]
+        return b"".join(chunks)
+
+    async def asynthesize(self, text: str, *, voice: str, rate: str) -> bytes:
+        with span("tts.synthesize", client=True, voice=voice, chars=len(text)) as tts_span:
+            # Callers wait for a free slot, which back-pressures producers once the pool is busy.
+            async with self._slots():
+                data = await self._stream(text, voice=voice, rate=rate)
+            tts_span.set(bytes=len(data))
+            return data
+
+    def synthesize(self, text: str, *, voice: str, rate: str) -> bytes:
+        with span("tts.synthesize", client=True, voice=voice, chars=len(text)) as tts_span:
+            with self._sync_slots:
+                data = asyncio.run(self._stream(text, voice=voice, rate=rate))
+            tts_span.set(bytes=len(data))
+            return data
+
+
+_ENGINE: TTSEngine | None = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_tts_engine() -> TTSEngine:
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = TTSEngine()
+        return _ENGINE
+
+
+def configure_tts_engine(*, max_concurrency: int) -> TTSEngine:
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None or _ENGINE.max_concurrency != max_concurrency:
+            _ENGINE = TTSEngine(max_concurrency=max_concurrency)
+        return _ENGINE
+
+
+def synthesize_tts(text: str, *, voice: str, rate: str) -> bytes:
+    return get_tts_engine().synthesize(text, voice=voice, rate=rate)
+
+
+async def asynthesize_tts(text: str, *, voice: str, rate: str) -> bytes:
+    return await get_tts_engine().asynthesize(text, voice=voice, rate=rate)
@@ -1,79 +1,597 @@
+from __future__ import annotations
+
+import asyncio
 import json
+import threading
+import time
+import weakref
+from collections.abc import Callable
+from dataclasses import dataclass
 from functools import lru_cache
 from importlib import resources
+from typing import TYPE_CHECKING, Any
 
-from dotenv import load_dotenv
-from jinja2 import Environment
-from openai import OpenAI
+from ..core.cache import CardCache, cache_key
+from ..core.schema import Card, expand_card_fields, merge_card_fields, parse_card
+from ..core.streaming import JsonObjectStream
+from ..core.tracing import span
+from .rate_limit import DEFAULT_COMPLETION_TOKENS, RateLimiter
 
-from ..core.schema import Card, parse_card
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
 
 _ENV_LOADED = False
 
+ClientKey = tuple[str, str]
+
+MAX_ATTEMPTS = 6
+BATCH_TOKEN_BUDGET = 6000
+BATCH_MAX_ITEMS = 20
+
+
+@dataclass
+class ConnectionStats:
+    requests: int = 0
+    new_connections: int = 0
+    rate_limited: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def reused_connections(self) -> int:
+        return max(self.requests - self.new_connections, 0)
+
+    def summary(self) -> str:
+        summary = (
+            f"OpenAI requests: {self.requests}, new connections: {self.new_connections}, "
+            f"reused: {self.reused_connections}."
+        )
+        if self.prompt_tokens:
+            share = self.cached_tokens / self.prompt_tokens
+            summary += f" Prompt tokens: {self.prompt_tokens}, cached: {self.cached_tokens} ({share:.0%})."
+        if self.rate_limited:
+            summary += f" Retried after rate limiting: {self.rate_limited}."
+        return summary
+
+
+_STATS = ConnectionStats()
+_STATS_LOCK = threading.Lock()
+_CLIENTS: dict[ClientKey, OpenAI] = {}
+_ASYNC_CLIENTS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[ClientKey, AsyncOpenAI]] = (
+    weakref.WeakKeyDictionary()
+)
+_CLIENTS_LOCK = threading.Lock()
+_LIMITERS: dict[tuple[str, str, str], RateLimiter] = {}
+
 
 @lru_cache(maxsize=1)
-def _system_prompt_template() -> str:
-    return resources.files("anki_vocab").joinpath("system_prompt.jinja").read_text(encoding="utf-8")
+def _system_prompt() -> str:
+    # One static system prompt for every request type keeps the longest possible prefix cacheable.
+    return resources.files("anki_vocab").joinpath("system_prompt.txt").read_text(encoding="utf-8").strip()
 
 
-@lru_cache(maxsize=8)
-def _system_prompt(*, has_current_card: bool, has_user_prompt: bool) -> str:
-    env = Environment(autoescape=False)
-    template = env.from_string(_system_prompt_template())
-    return template.render(
-        has_current_card=has_current_card,
-        has_user_prompt=has_user_prompt,
-    ).strip()
+@lru_cache(maxsize=1)
+def _retryable_errors() -> tuple[type[Exception], ...]:
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    return (RateLimitError, APIConnectionError, InternalServerError)
 
 
 def _ensure_env_loaded() -> None:
     global _ENV_LOADED
     if _ENV_LOADED:
         return
+    from dotenv import load_dotenv
+
     load_dotenv()
     _ENV_LOADED = True
 
 
+def _record_trace(event_name: str) -> None:
+    if event_name == "connection.connect_tcp.complete":
+        with _STATS_LOCK:
+            _STATS.new_connections += 1
+
+
+def _trace(event_name: str, info: dict[str, Any]) -> None:
+    _record_trace(event_name)
+
+
+async def _atrace(event_name: str, info: dict[str, Any]) -> None:
+    _record_trace(event_name)
+
+
+def _on_request(request: Any) -> None:
+    with _STATS_LOCK:
+        _STATS.requests += 1
+    request.extensions["trace"] = _trace
+
+
+async def _aon_request(request: Any) -> None:
+    with _STATS_LOCK:
+        _STATS.requests += 1
+    request.extensions["trace"] = _atrace
+
+
+def _timeout_options(timeout: float | None) -> dict[str, Any]:
+    # The SDK treats an explicit `timeout=None` as "never time out".
+    return {} if timeout is None else {"timeout": timeout}
+
+
+def _client_key(api_key: str | None, base_url: str | None) -> ClientKey:
+    return (api_key.strip() if api_key else "", base_url.strip() if base_url else "")
+
+
+def get_client(api_key: str | None, *, base_url: str | None = None, timeout: float | None = None) -> OpenAI:
+    _ensure_env_loaded()
+    # The SDK takes a few hundred milliseconds to import, so it loads with the first client instead of the CLI.
+    from openai import DefaultHttpxClient, OpenAI
+
+    key = _client_key(api_key, base_url)
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=key[0] or None,
+                base_url=key[1] or None,
+                **_timeout_options(timeout),
+                max_retries=0,
+                http_client=DefaultHttpxClient(event_hooks={"request": [_on_request]}),
+            )
+            _CLIENTS[key] = client
+        return client
+
+
+def get_async_client(
+    api_key: str | None,
+    *,
+    base_url: str | None = None,
+    timeout: float | None = None,
+) -> AsyncOpenAI:
+    _ensure_env_loaded()
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    key = _client_key(api_key, base_url)
+    # Async connections are bound to the event loop that opened them.
+    loop = asyncio.get_running_loop()
+    with _CLIENTS_LOCK:
+        clients = _ASYNC_CLIENTS.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=key[0] or None,
+                base_url=key[1] or None,
+                **_timeout_options(timeout),
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(event_hooks={"request": [_aon_request]}),
+            )
+            clients[key] = client
+        return client
+
+
+def get_rate_limiter(api_key: str | None, *, base_url: str | None = None, model: str) -> RateLimiter:
+    # OpenAI enforces limits per organization and model, so callers sharing both share one bucket.
+    key = (*_client_key(api_key, base_url), model)
+    with _CLIENTS_LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = RateLimiter()
+            _LIMITERS[key] = limiter
+        return limiter
+
+
+def close_clients() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_CLIENTS.values())
+        _CLIENTS.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_clients() -> None:
+    with _CLIENTS_LOCK:
+        clients = list(_ASYNC_CLIENTS.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        await client.close()
+
+
+def connection_stats() -> ConnectionStats:
+    with _STATS_LOCK:
+        return ConnectionStats(
+            requests=_STATS.requests,
+            new_connections=_STATS.new_connections,
+            rate_limited=_STATS.rate_limited,
+            prompt_tokens=_STATS.prompt_tokens,
+            cached_tokens=_STATS.cached_tokens,
+        )
+
+
+def _chat_request(
+    sentence: str,
+    word: str,
+    *,
+    model: str,
+    current_card: dict[str, str] | None,
+    user_prompt: str | None,
+    fields: list[str] | None = None,
+) -> dict[str, Any]:
+    user_content = _build_user_content(
+        sentence,
+        word,
+        current_card=current_card,
+        user_prompt=user_prompt,
+        fields=fields,
+    )
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "system",
+                "content": _system_prompt(),
+            },
+            {"role": "user", "content": user_content},
+        ],
+        "temperature": 0.2,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def _parse_content(
+    content: str | None,
+    current_card: dict[str, str] | None = None,
+    fields: list[str] | None = None,
+) -> Card:
+    if not content:
+        raise RuntimeError("OpenAI returned empty response")
+
+    payload = json.loads(content)
+    if fields:
+        assert current_card is not None
+        return merge_card_fields(current_card, payload, fields)
+    return parse_card(payload)
+
+
+def _target_fields(fields: list[str] | None, current_card: dict[str, str] | None) -> list[str] | None:
+    if not fields:
+        return None
+    if current_card is None:
+        raise ValueError("Regenerating selected fields requires the current card.")
+    return expand_card_fields(fields, current_card)
+
+
+def _dump_card(card: Card) -> str:
+    return json.dumps(card.as_dict(), ensure_ascii=False)
+
+
+def _record_usage(usage: Any | None, request_span: Any) -> None:
+    if usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    request_span.set(
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cached_tokens=getattr(details, "cached_tokens", None),
+    )
+    with _STATS_LOCK:
+        _STATS.prompt_tokens += usage.prompt_tokens or 0
+        _STATS.cached_tokens += getattr(details, "cached_tokens", None) or 0
+
+
+def _retry_delay(limiter: RateLimiter, exc: Exception, attempt: int, estimated: int) -> float:
+    if attempt + 1 >= MAX_ATTEMPTS:
+        raise exc
+    rate_limited = getattr(exc, "status_code", None) == 429
+    if rate_limited:
+        with _STATS_LOCK:
+            _STATS.rate_limited += 1
+    return limiter.backoff(
+        attempt,
+        estimated=estimated,
+        rate_limited=rate_limited,
+        headers=getattr(getattr(exc, "response", None), "headers", None),
+    )
+
+
+def _complete(
+    client: OpenAI,
+    limiter: RateLimiter,
+    request: dict[str, Any],
+    timeout: float | None,
+    on_text: Callable[[str], None] | None = None,
+) -> str | None:
+    estimated = limiter.estimate(request)
+    options = _timeout_options(timeout)
+    if on_text is not None:
+        options.update(stream=True, stream_options={"include_usage": True})
+    attempt = 0
+    with span("openai.chat", client=True, model=request["model"], stream=on_text is not None) as request_span:
+        while True:
+            limiter.acquire(estimated)
+            sent = time.perf_counter()
+            try:
+                raw = client.chat.completions.with_raw_response.create(**request, **options)
+            except _retryable_errors() as exc:
+                time.sleep(_retry_delay(limiter, exc, attempt, estimated))
+                attempt += 1
+                request_span.set(retries=attempt)
+                continue
+            if on_text is None:
+                completion = raw.parse()
+                limiter.observe(raw.headers, estimated=estimated, usage=completion.usage)
+                _record_usage(completion.usage, request_span)
+                return completion.choices[0].message.content
+
+            parts: list[str] = []
+            usage = None
+            for chunk in raw.parse():
+                usage = chunk.usage or usage
+                for choice in chunk.choices:
+                    if choice.delta.content:
+                        if not parts:
+                            request_span.set(first_token_ms=round((time.perf_counter() - sent) * 1000))
+                        parts.append(choice.delta.content)
+                        on_text(choice.delta.content)
+            limiter.observe(raw.headers, estimated=estimated, usage=usage)
+            _record_usage(usage, request_span)
+            return "".join(parts)
+
+
+async def _acomplete(
+    client: AsyncOpenAI,
+    limiter: RateLimiter,
+    request: dict[str, Any],
+    timeout: float | None,
+    *,
+    completions: int = 1,
+) -> str | None:
+    estimated = limiter.estimate(request, completions=completions)
+    attempt = 0
+    with span(
+        "openai.chat",
+        client=True,
+        model=request["model"],
+        stream=False,
+        cards=completions,
+    ) as request_span:
+        while True:
+            await limiter.aacquire(estimated)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(**request, **_timeout_options(timeout))
+            except _retryable_errors() as exc:
+                await asyncio.sleep(_retry_delay(limiter, exc, attempt, estimated))
+                attempt += 1
+                request_span.set(retries=attempt)
+                continue
+            completion = raw.parse()
+            limiter.observe(raw.headers, estimated=estimated, usage=completion.usage, completions=completions)
+            _record_usage(completion.usage, request_span)
+            return completion.choices[0].message.content
+
+
 def generate_card(
     sentence: str,
     word: str,
     *,
     model: str,
     api_key: str | None,
+    base_url: str | None = None,
+    timeout: float | None = None,
     current_card: dict[str, str] | None = None,
     user_prompt: str | None = None,
+    fields: list[str] | None = None,
+    cache: CardCache | None = None,
+    on_field: Callable[[str, str], None] | None = None,
 ) -> Card:
-    _ensure_env_loaded()
-    resolved_key = api_key.strip() if api_key else ""
-    client = OpenAI(api_key=resolved_key or None)
-
-    user_content = _build_user_content(sentence, word, current_card=current_card, user_prompt=user_prompt)
-
-    content = (
-        client.chat.completions.create(
-            model=model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": _system_prompt(
-                        has_current_card=current_card is not None,
-                        has_user_prompt=bool(user_prompt),
-                    ),
-                },
-                {"role": "user", "content": user_content},
-            ],
-            temperature=0.2,
-            response_format={"type": "json_object"},
-        )
-        .choices[0]
-        .message.content
+    client = get_client(api_key, base_url=base_url, timeout=timeout)
+    limiter = get_rate_limiter(api_key, base_url=base_url, model=model)
+    targets = _target_fields(fields, current_card)
+    request = _chat_request(
+        sentence,
+        word,
+        model=model,
+        current_card=current_card,
+        user_prompt=user_prompt,
+        fields=targets,
     )
+    streamed = False
+
+    def on_text(text: str) -> None:
+        nonlocal streamed
+        streamed = True
+        for key, value in field_stream.feed(text):
+            if isinstance(value, str) and value.strip():
+                on_field(key, value.strip())
+
+    def create() -> str:
+        content = _complete(client, limiter, request, timeout, on_text if on_field is not None else None)
+        return _dump_card(_parse_content(content, current_card, targets))
+
+    field_stream = JsonObjectStream()
+    card = _parse_content(create() if cache is None else cache.get_or_create(cache_key(request), create))
+    if on_field is not None and not streamed:
+        # Cached cards never streamed, so replay their fields for progressive renderers.
+        for key, value in card.as_dict().items():
+            on_field(key, value)
+    return card
 
+
+async def agenerate_card(
+    sentence: str,
+    word: str,
+    *,
+    model: str,
+    api_key: str | None,
+    base_url: str | None = None,
+    timeout: float | None = None,
+    current_card: dict[str, str] | None = None,
+    user_prompt: str | None = None,
+    fields: list[str] | None = None,
+    cache: CardCache | None = None,
+) -> Card:
+    client = get_async_client(api_key, base_url=base_url, timeout=timeout)
+    limiter = get_rate_limiter(api_key, base_url=base_url, model=model)
+    targets = _target_fields(fields, current_card)
+    request = _chat_request(
+        sentence,
+        word,
+        model=model,
+        current_card=current_card,
+        user_prompt=user_prompt,
+        fields=targets,
+    )
+
+    async def create() -> str:
+        content = await _acomplete(client, limiter, request, timeout)
+        return _dump_card(_parse_content(content, current_card, targets))
+
+    if cache is None:
+        return _parse_content(await create())
+    return _parse_content(await cache.aget_or_create(cache_key(request), create))
+
+
+def _batch_item(index: int, sentence: str, word: str) -> str:
+    return f'ITEM {index}:\nSENTENCE: {sentence}\nTARGET: "{word}"'
+
+
+def _batch_request(items: list[tuple[str, str]], *, model: str) -> dict[str, Any]:
+    entries = "\n\n".join(_batch_item(index, sentence, word) for index, (sentence, word) in enumerate(items, start=1))
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": _system_prompt()},
+            {"role": "user", "content": f"BATCH: {len(items)} items\n\n{entries}"},
+        ],
+        "temperature": 0.2,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def pack_batches(
+    items: list[tuple[str, str]],
+    *,
+    token_budget: int = BATCH_TOKEN_BUDGET,
+    max_items: int = BATCH_MAX_ITEMS,
+    completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+) -> list[list[int]]:
+    batches: list[list[int]] = []
+    current: list[int] = []
+    used = 0
+    for index, (sentence, word) in enumerate(items):
+        # Each item costs its own prompt lines plus one card of output.
+        cost = len(_batch_item(index + 1, sentence, word)) // 4 + completion_tokens
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_batch(content: str | None, count: int) -> list[Card | Exception]:
     if not content:
         raise RuntimeError("OpenAI returned empty response")
-
     payload = json.loads(content)
-    return parse_card(payload)
+    cards = payload.get("cards") if isinstance(payload, dict) else None
+    if not isinstance(cards, list):
+        raise ValueError("OpenAI returned invalid batch JSON: missing 'cards' array")
+    results: list[Card | Exception] = [RuntimeError("OpenAI left the item out of the batch")] * count
+    seen: set[int] = set()
+    for position, entry in enumerate(cards):
+        if not isinstance(entry, dict):
+            continue
+        # Cards carry their item number so a reordered or shortened array still lines up.
+        item = entry.get("item", position + 1)
+        if isinstance(item, bool) or not isinstance(item, (int, str)) or not str(item).strip().isdigit():
+            continue
+        index = int(item) - 1
+        if not 0 <= index < count:
+            continue
+        if index in seen:
+            # Two cards claiming one item cannot both be right, so the word is generated on its own.
+            results[index] = ValueError(f"OpenAI returned item {index + 1} more than once")
+            continue
+        seen.add(index)
+        try:
+            results[index] = parse_card(entry)
+        except RuntimeError as exc:
+            results[index] = exc
+    return results
+
+
+async def agenerate_cards(
+    items: list[tuple[str, str]],
+    *,
+    model: str,
+    api_key: str | None,
+    base_url: str | None = None,
+    timeout: float | None = None,
+    cache: CardCache | None = None,
+    token_budget: int = BATCH_TOKEN_BUDGET,
+    max_items: int = BATCH_MAX_ITEMS,
+) -> list[Card | Exception]:
+    results: list[Card | Exception | None] = [None] * len(items)
+    # Batched cards are cached under the single-word key, so either path reuses the other's results.
+    keys = [
+        cache_key(_chat_request(sentence, word, model=model, current_card=None, user_prompt=None))
+        for sentence, word in items
+    ]
+    pending: list[int] = []
+    for index, key in enumerate(keys):
+        cached = cache.get(key) if cache is not None else None
+        if cached is None:
+            pending.append(index)
+        else:
+            results[index] = _parse_content(cached)
+
+    client = get_async_client(api_key, base_url=base_url, timeout=timeout)
+    limiter = get_rate_limiter(api_key, base_url=base_url, model=model)
+
+    async def generate_one(index: int) -> None:
+        sentence, word = items[index]
+        try:
+            results[index] = await agenerate_card(
+                sentence,
+                word,
+                model=model,
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                cache=cache,
+            )
+        except Exception as exc:
+            results[index] = exc
+
+    async def generate_batch(indices: list[int]) -> None:
+        if len(indices) == 1:
+            await generate_one(indices[0])
+            return
+        request = _batch_request([items[index] for index in indices], model=model)
+        try:
+            content = await _acomplete(client, limiter, request, timeout, completions=len(indices))
+        except Exception as exc:
+            for index in indices:
+                results[index] = exc
+            return
+        try:
+            parsed = _parse_batch(content, len(indices))
+        except (RuntimeError, ValueError) as exc:
+            parsed = [exc] * len(indices)
+        retry: list[int] = []
+        for index, result in zip(indices, parsed):
+            if isinstance(result, Card):
+                results[index] = result
+                if cache is not None:
+                    cache.put(keys[index], _dump_card(result))
+            else:
+                retry.append(index)
+        # Only the items the model got wrong pay for a request of their own.
+        await asyncio.gather(*(generate_one(index) for index in retry))
+
+    batches = pack_batches([items[index] for index in pending], token_budget=token_budget, max_items=max_items)
+    await asyncio.gather(*(generate_batch([pending[index] for index in batch]) for batch in batches))
+    return [result if result is not None else RuntimeError("card was not generated") for result in results]
 
 
 def _build_user_content(
@@ -82,11 +600,14 @@ def _build_user_content(
     *,
     current_card: dict[str, str] | None,
     user_prompt: str | None,
+    fields: list[str] | None = None,
 ) -> str:
     user_content = f'SENTENCE: {sentence}\nTARGET: "{word}"'
     if current_card is not None:
         current_payload = json.dumps(current_card, ensure_ascii=False)
         user_content = f"{user_content}\nCURRENT_CARD_JSON:\n{current_payload}"
+    if fields:
+        user_content = f"{user_content}\nFIELDS: {', '.join(fields)}"
     if user_prompt:
         user_content = f"{user_content}\nUSER_PROMPT:\n{user_prompt}"
     return user_content
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any
+
+DEFAULT_COMPLETION_TOKENS = 400
+MAX_BACKOFF = 30.0
+
+_RESET_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_RESET_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_reset(value: str | None) -> float | None:
+    # OpenAI reports resets as Go-style durations such as "1s", "6m0s" or "20ms".
+    if not value:
+        return None
+    parts = _RESET_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _RESET_UNITS[unit] for amount, unit in parts)
+
+
+def _header_int(headers: Mapping[str, str], name: str) -> int | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return None
+
+
+class _Bucket:
+    def __init__(self) -> None:
+        self.limit: float | None = None
+        self.available = 0.0
+        self.rate = 0.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.limit is not None:
+            self.available = min(self.limit, self.available + self.rate * (now - self.updated))
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        if self.limit is None:
+            return 0.0
+        self._refill(now)
+        # Callers take their share up front and sleep off any deficit, so waiters queue in arrival order.
+        self.available -= min(amount, self.limit)
+        if self.available >= 0:
+            return 0.0
+        return -self.available / self.rate if self.rate > 0 else 1.0
+
+    def release(self, amount: float) -> None:
+        if self.limit is not None:
+            self.available = min(self.limit, self.available + amount)
+
+    def observe(self, limit: int, remaining: int, reset: float | None, now: float) -> None:
+        self._refill(now)
+        if reset and limit > remaining:
+            self.rate = (limit - remaining) / reset
+        else:
+            self.rate = limit / 60.0
+        # Reservations the server has not seen yet keep the local count lower; never raise it past the server's.
+        self.available = float(remaining) if self.limit is None else min(self.available, float(remaining))
+        self.limit = float(limit)
+
+
+class RateLimiter:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._requests = _Bucket()
+        self._tokens = _Bucket()
+        self._blocked_until = 0.0
+        self._completion_tokens = float(DEFAULT_COMPLETION_TOKENS)
+
+    def estimate(self, request: dict[str, Any], *, completions: int = 1) -> int:
+        # Roughly four characters per token for the prompt, plus the running average completion size.
+        prompt_chars = len(json.dumps(request.get("messages", []), ensure_ascii=False))
+        with self._lock:
+            return prompt_chars // 4 + int(self._completion_tokens * completions)
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self._requests.reserve(1, now), self._tokens.reserve(tokens, now))
+            return max(wait, self._blocked_until - now)
+
+    def acquire(self, tokens: int) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int) -> None:
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(
+        self,
+        headers: Mapping[str, str],
+        *,
+        estimated: int,
+        usage: Any | None = None,
+        completions: int = 1,
+    ) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for bucket, kind in ((self._requests, "requests"), (self._tokens, "tokens")):
+                limit = _header_int(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_int(headers, f"x-ratelimit-remaining-{kind}")
+                if limit is not None and remaining is not None:
+                    bucket.observe(limit, remaining, parse_reset(headers.get(f"x-ratelimit-reset-{kind}")), now)
+            total = getattr(usage, "total_tokens", None)
+            if total is not None:
+                self._tokens.release(estimated - total)
+            completion = getattr(usage, "completion_tokens", None)
+            if completion is not None:
+                # Batched requests return several cards; the average tracks the size of one.
+                self._completion_tokens = 0.8 * self._completion_tokens + 0.2 * completion / completions
+
+    def backoff(
+        self,
+        attempt: int,
+        *,
+        estimated: int,
+        rate_limited: bool = False,
+        headers: Mapping[str, str] | None = None,
+    ) -> float:
+        headers = headers or {}
+        retry_after = parse_reset(headers.get("retry-after-ms"))
+        retry_after = retry_after / 1000 if retry_after is not None else parse_reset(headers.get("retry-after"))
+        if retry_after is None:
+            delay = random.uniform(0, min(MAX_BACKOFF, 0.5 * 2**attempt))
+        else:
+            delay = retry_after + random.uniform(0, min(1.0, retry_after / 4))
+        with self._lock:
+            self._tokens.release(estimated)
+        if rate_limited:
+            # A 429 means the window is spent for everyone, so hold every caller back until it reopens.
+            self.observe(headers, estimated=0)
+            with self._lock:
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
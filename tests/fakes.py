@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import fnmatch
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+_TARGET = re.compile(r'^TARGET: "(.*)"$', re.MULTILINE)
+_FIELDS = re.compile(r"^FIELDS: (.*)$", re.MULTILINE)
+_FIELD_QUERY = re.compile(r'(\w+):"([^"]*)"')
+
+NOTE_MODEL = "English"
+
+
+@dataclass
+class Faults:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: int | None = None
+    _random: random.Random = field(init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.seed)
+
+    def delay(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(self.latency_ms + jitter, 0.0) / 1000
+
+    def outcome(self) -> str:
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limited"
+        if roll < self.rate_limit_rate + self.error_rate:
+            return "error"
+        return "ok"
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _read_json(self) -> Any:
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def _send(self, status: int, data: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status: int, payload: Any, headers: dict[str, str] | None = None) -> None:
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json", headers)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _FakeServer:
+    handler: type[_JsonHandler]
+
+    def __init__(self, faults: Faults | None = None) -> None:
+        self.faults = faults or Faults()
+        self._server: _Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        return self._server.server_address[1]
+
+    def start(self) -> None:
+        owner = self
+
+        class Handler(self.handler):
+            server_owner = owner
+
+        self._server = _Server(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> _FakeServer:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def fake_card(word: str) -> dict[str, str]:
+    return {
+        "word_base": word,
+        "pos": "noun",
+        "ru_meaning": "тест",
+        "definition": f"a benchmark entry for {word}",
+        "context_en": f"This sentence uses {word} in context.",
+        "context_ru": "Это предложение для теста.",
+        "notes": "Synonyms: sample, probe",
+        "rarity": "Common",
+        "cefr": "B1",
+        "tts_text": word,
+    }
+
+
+class _OpenAIHandler(_JsonHandler):
+    server_owner: FakeOpenAIServer
+
+    def do_GET(self) -> None:
+        if not self.path.rstrip("/").endswith("/models"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        self._send_json(200, {"object": "list", "data": [{"id": "bench", "object": "model", "created": 0}]})
+
+    def do_POST(self) -> None:
+        owner = self.server_owner
+        request = self._read_json()
+        time.sleep(owner.faults.delay())
+        outcome = owner.faults.outcome()
+        owner.count(outcome)
+        if outcome == "rate_limited":
+            error = {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            self._send_json(429, error, {"retry-after-ms": str(owner.retry_after_ms)})
+            return
+        if outcome == "error":
+            self._send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+
+        prompt = request["messages"][-1]["content"]
+        targets = _TARGET.findall(prompt)
+        payload: dict[str, Any] = fake_card(targets[0] if targets else "word")
+        # Partial regenerations list their keys on a FIELDS line and get only those back.
+        fields = _FIELDS.search(prompt)
+        if fields:
+            payload = {key: payload.get(key, key) for key in fields.group(1).split(", ")}
+        if prompt.startswith("BATCH:"):
+            payload = {"cards": [{**fake_card(word), "item": index} for index, word in enumerate(targets, start=1)]}
+        content = json.dumps(payload, ensure_ascii=False)
+        prompt_tokens = sum(len(message["content"]) for message in request["messages"]) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": prompt_tokens + len(content) // 4,
+            "prompt_tokens_details": {"cached_tokens": 0},
+        }
+        base = {"id": "chatcmpl-bench", "created": 0, "model": request.get("model", "bench")}
+        if not request.get("stream"):
+            choice = {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+            self._send_json(200, {**base, "object": "chat.completion", "choices": [choice], "usage": usage})
+            return
+
+        events = []
+        for start in range(0, len(content), 16):
+            delta = {"index": 0, "delta": {"content": content[start : start + 16]}, "finish_reason": None}
+            events.append({**base, "object": "chat.completion.chunk", "choices": [delta]})
+        events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+        body = "".join(f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events) + "data: [DONE]\n\n"
+        self._send(200, body.encode("utf-8"), "text/event-stream")
+
+
+class FakeOpenAIServer(_FakeServer):
+    handler = _OpenAIHandler
+
+    def __init__(self, faults: Faults | None = None, *, retry_after_ms: int = 50) -> None:
+        super().__init__(faults)
+        self.retry_after_ms = retry_after_ms
+        self.outcomes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+
+class _AnkiHandler(_JsonHandler):
+    server_owner: FakeAnkiConnectServer
+
+    def do_POST(self) -> None:
+        owner = self.server_owner
+        request = self._read_json()
+        time.sleep(owner.faults.delay())
+        if owner.faults.outcome() != "ok":
+            self._send_json(200, {"result": None, "error": "Injected failure"})
+            return
+        try:
+            result = owner.handle(request["action"], request.get("params") or {})
+        except Exception as exc:
+            self._send_json(200, {"result": None, "error": str(exc)})
+            return
+        self._send_json(200, {"result": result, "error": None})
+
+
+class FakeAnkiConnectServer(_FakeServer):
+    handler = _AnkiHandler
+
+    def __init__(self, faults: Faults | None = None, *, word_field: str = "Word", reject_paths: bool = False) -> None:
+        super().__init__(faults)
+        self.word_field = word_field
+        # Like a Flatpak or Snap Anki, which cannot read files outside its sandbox.
+        self.reject_paths = reject_paths
+        self.notes: dict[int, dict[str, Any]] = {}
+        self.media: dict[str, int] = {}
+        self.actions: dict[str, int] = {}
+        self._next_id = 1_700_000_000_000
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def seed_notes(self, model: str, words: list[str]) -> list[int]:
+        return [self._add({"modelName": model, "fields": {self.word_field: word}}) for word in words]
+
+    def _add(self, note: dict[str, Any]) -> int:
+        with self._lock:
+            self._next_id += 1
+            note_id = self._next_id
+            fields = {
+                name: {"value": value, "order": order} for order, (name, value) in enumerate(note["fields"].items())
+            }
+            self.notes[note_id] = {
+                "noteId": note_id,
+                "modelName": note.get("modelName", ""),
+                "fields": fields,
+                "tags": list(note.get("tags", [])),
+                "mod": int(time.time()),
+            }
+            return note_id
+
+    def _find(self, query: str) -> list[int]:
+        model = re.search(r'note:"([^"]*)"', query)
+        filters = [(name, value.casefold()) for name, value in _FIELD_QUERY.findall(query) if name != "note"]
+        matches = []
+        with self._lock:
+            for note_id, note in self.notes.items():
+                if model and note["modelName"] != model.group(1):
+                    continue
+                fields = note["fields"]
+                if all(fields.get(name, {}).get("value", "").casefold() == value for name, value in filters):
+                    matches.append(note_id)
+        return matches
+
+    def handle(self, action: str, params: dict[str, Any]) -> Any:
+        with self._lock:
+            self.actions[action] = self.actions.get(action, 0) + 1
+        if action == "multi":
+            results = []
+            for item in params["actions"]:
+                try:
+                    results.append({"result": self.handle(item["action"], item.get("params") or {}), "error": None})
+                except Exception as exc:
+                    results.append({"result": None, "error": str(exc)})
+            return results
+        if action == "version":
+            return 6
+        if action == "findNotes":
+            return self._find(params["query"])
+        if action == "notesInfo":
+            with self._lock:
+                return [self.notes.get(int(note_id), {}) for note_id in params["notes"]]
+        if action == "addNote":
+            note = params["note"]
+            word = note["fields"].get(self.word_field, "")
+            duplicate = self._find(f'note:"{note["modelName"]}" {self.word_field}:"{word}"')
+            if duplicate and not note.get("options", {}).get("allowDuplicate"):
+                raise RuntimeError("cannot create note because it is a duplicate")
+            return self._add(note)
+        if action == "updateNoteFields":
+            note_id = int(params["note"]["id"])
+            with self._lock:
+                if note_id not in self.notes:
+                    raise RuntimeError(f"Note was not found: {note_id}")
+                fields = self.notes[note_id]["fields"]
+                for name, value in params["note"]["fields"].items():
+                    fields.setdefault(name, {"value": "", "order": len(fields)})["value"] = value
+                self.notes[note_id]["mod"] = int(time.time())
+            return None
+        if action == "addTags":
+            return None
+        if action == "storeMediaFile":
+            if "path" in params and self.reject_paths:
+                raise RuntimeError(f"[Errno 2] No such file or directory: '{params['path']}'")
+            size = len(params.get("data", "")) if "data" in params else 0
+            with self._lock:
+                self.media[params["filename"]] = size
+            return params["filename"]
+        if action == "getMediaFilesNames":
+            with self._lock:
+                return [name for name in self.media if fnmatch.fnmatch(name, params.get("pattern", "*"))]
+        if action == "deleteMediaFile":
+            with self._lock:
+                self.media.pop(params["filename"], None)
+            return None
+        raise RuntimeError(f"unsupported action: {action}")
+
+
+class FakeCommunicate:
+    # Stands in for `edge_tts.Communicate` so TTS latency is simulated without network access.
+    faults = Faults()
+
+    def __init__(self, text: str, voice: str, *, rate: str = "+0%") -> None:
+        self.text = text
+
+    async def stream(self) -> Any:
+        await asyncio.sleep(self.faults.delay())
+        if self.faults.outcome() != "ok":
+            raise RuntimeError("Injected TTS failure")
+        yield {"type": "audio", "data": b"ID3" + self.text.encode("utf-8") * 64}
+
+
+@contextlib.contextmanager
+def isolated_environment(openai: FakeOpenAIServer, anki: FakeAnkiConnectServer) -> Iterator[Path]:
+    with tempfile.TemporaryDirectory(prefix="anki-vocab-bench-") as root:
+        overrides = {
+            "XDG_CONFIG_HOME": str(Path(root) / "config"),
+            "XDG_CACHE_HOME": str(Path(root) / "cache"),
+            "ANKI_VOCAB_ANKICONNECT_URL": anki.url,
+            "ANKI_VOCAB_OPENAI_BASE_URL": openai.base_url,
+            "ANKI_VOCAB_OPENAI_API_KEY": "sk-bench",
+            "ANKI_VOCAB_OPENAI_MODEL": "bench-model",
+            "ANKI_VOCAB_NOTE_MODEL": NOTE_MODEL,
+        }
+        previous = {name: os.environ.get(name) for name in overrides}
+        os.environ.update(overrides)
+        try:
+            yield Path(root)
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
@@ -0,0 +1,15 @@
+from anki_vocab.core.schema import Card
+
+
+def make_card(word: str) -> Card:
+    return Card(
+        word_base=word,
+        pos="noun",
+        ru_meaning="тест",
+        definition="a check",
+        context_en=f"A {word}.",
+        context_ru="Тест.",
+        notes="Synonyms: check",
+        rarity="Common",
+        cefr="B1",
+    )
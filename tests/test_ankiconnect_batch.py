@@ -0,0 +1,78 @@
+import pytest
+from fakes import FakeAnkiConnectServer
+
+from anki_vocab.integrations import ankiconnect
+
+
+def test_batch_sends_single_multi_request(monkeypatch) -> None:
+    calls: list[tuple[str, dict]] = []
+
+    def fake_request(url: str, action: str, params: dict | None = None):
+        calls.append((action, params or {}))
+        return [{"result": 42, "error": None}, {"result": None, "error": None}]
+
+    monkeypatch.setattr(ankiconnect, "ankiconnect_request", fake_request)
+
+    batch = ankiconnect.AnkiConnectBatch("http://localhost:8765")
+    added = batch.add_note({"fields": {"Word": "test"}})
+    tagged = batch.add_tags(42, ["auto"])
+    batch.flush()
+
+    assert len(calls) == 1
+    action, params = calls[0]
+    assert action == "multi"
+    assert [item["action"] for item in params["actions"]] == ["addNote", "addTags"]
+    assert added.result() == 42
+    assert tagged.result() is None
+    assert len(batch) == 0
+
+
+def test_batch_sets_per_action_errors(monkeypatch) -> None:
+    def fake_request(url: str, action: str, params: dict | None = None):
+        return [{"result": None, "error": "duplicate"}, {"result": "tts.mp3", "error": None}]
+
+    monkeypatch.setattr(ankiconnect, "ankiconnect_request", fake_request)
+
+    batch = ankiconnect.AnkiConnectBatch("http://localhost:8765")
+    added = batch.add_note({"fields": {}})
+    stored = batch.enqueue("storeMediaFile", {"filename": "tts.mp3", "data": ""})
+    batch.flush()
+
+    with pytest.raises(RuntimeError, match="addNote"):
+        added.result()
+    assert stored.result() == "tts.mp3"
+
+
+def test_batch_fails_every_action_on_a_short_multi_answer(monkeypatch) -> None:
+    monkeypatch.setattr(ankiconnect, "ankiconnect_request", lambda url, action, params=None: [{"result": 1}])
+
+    batch = ankiconnect.AnkiConnectBatch("http://localhost:8765")
+    stored = batch.store_media_data(b"ID3", "tts.mp3")
+    added = batch.add_note({"fields": {}})
+    with pytest.raises(ankiconnect.AnkiConnectError, match="multi returned 1 results for 2 actions"):
+        batch.flush()
+
+    for future in (stored, added):
+        with pytest.raises(ankiconnect.AnkiConnectError):
+            future.result(timeout=1)
+
+
+def test_rejected_media_path_is_resent_as_bytes(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(ankiconnect, "_PATH_REJECTED", set())
+    clip = tmp_path / "tts_cat.mp3"
+    clip.write_bytes(b"ID3")
+
+    with FakeAnkiConnectServer(reject_paths=True) as anki:
+        batch = ankiconnect.AnkiConnectBatch(anki.url)
+        stored = batch.store_media_path(clip, "tts_cat.mp3")
+        added = batch.add_note({"modelName": "English", "fields": {"Word": "cat"}})
+        batch.flush()
+        assert stored.result() == "tts_cat.mp3"
+        assert added.result() in anki.notes
+
+        # Once Anki has rejected a path, later clips go out as bytes straight away.
+        ankiconnect.store_media_path(anki.url, clip, "tts_dog.mp3")
+        ankiconnect.close_clients()
+
+    assert sorted(anki.media) == ["tts_cat.mp3", "tts_dog.mp3"]
+    assert (anki.actions["multi"], anki.actions["storeMediaFile"]) == (2, 3)
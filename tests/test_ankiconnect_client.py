@@ -0,0 +1,135 @@
+import asyncio
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from anki_vocab.integrations.ankiconnect import AnkiConnectClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self) -> None:
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if payload["action"] == "fail":
+            body = {"result": None, "error": "boom"}
+        else:
+            body = {"result": payload["params"].get("value"), "error": None}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url():
+    _Handler.connections = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sync_requests_reuse_connection(server_url: str) -> None:
+    client = AnkiConnectClient(server_url)
+    try:
+        assert client.request("echo", {"value": 1}) == 1
+        assert client.request("echo", {"value": 2}) == 2
+        with pytest.raises(RuntimeError, match="boom"):
+            client.request("fail")
+    finally:
+        client.close()
+    assert _Handler.connections == 1
+
+
+def test_async_requests_run_concurrently_within_pool(server_url: str) -> None:
+    client = AnkiConnectClient(server_url, max_connections=2)
+
+    async def run() -> list[int]:
+        try:
+            return await asyncio.gather(*(client.arequest("echo", {"value": i}) for i in range(6)))
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == list(range(6))
+    assert _Handler.connections <= 2
+
+
+class _ChunkedHandler(_Handler):
+    def do_POST(self) -> None:
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        data = json.dumps({"result": payload["params"]["value"], "error": None}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for start in range(0, len(data), 7):
+            chunk = data[start : start + 7]
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def test_chunked_responses_keep_the_connection(monkeypatch) -> None:
+    _Handler.connections = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChunkedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = AnkiConnectClient(f"http://127.0.0.1:{server.server_address[1]}", timeout=5)
+    try:
+        assert client.request("echo", {"value": "a longer chunked value"}) == "a longer chunked value"
+        assert client.request("echo", {"value": [1, 2, 3]}) == [1, 2, 3]
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+    assert _ChunkedHandler.connections == 1
+
+
+def test_ipv6_host_header_is_bracketed() -> None:
+    assert AnkiConnectClient("http://[::1]:8765")._host_header == "[::1]:8765"
+
+
+def test_reused_connection_is_not_replayed_after_a_partial_response() -> None:
+    listener = socket.create_server(("127.0.0.1", 0))
+    requests: list[bytes] = []
+
+    def serve() -> None:
+        connection, _ = listener.accept()
+        with connection:
+            body = json.dumps({"result": 1, "error": None}).encode()
+            for index in range(2):
+                requests.append(connection.recv(65536))
+                if index == 0:
+                    head = f"HTTP/1.1 200 OK\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                    connection.sendall(head + body)
+                else:
+                    # The action ran, but the connection drops halfway through the answer.
+                    connection.sendall(f"HTTP/1.1 200 OK\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body[:3])
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    client = AnkiConnectClient(f"http://127.0.0.1:{listener.getsockname()[1]}", timeout=5)
+    try:
+        assert client.request("addNote") == 1
+        with pytest.raises(ConnectionError):
+            client.request("addNote")
+    finally:
+        client.close()
+        thread.join(5)
+        listener.close()
+    assert len(requests) == 2
@@ -1,24 +1,89 @@
 from pathlib import Path
 
+import pytest
+
 from anki_vocab.core import audio
 
 
-def test_build_audio_field_cleans_temp_file(monkeypatch) -> None:
-    recorded: dict[str, str] = {}
+@pytest.fixture(autouse=True)
+def isolated_audio(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(audio, "_ANKI_MEDIA", {})
+    monkeypatch.setattr(audio, "ankiconnect_request", lambda url, action, params=None: [])
 
-    def fake_synthesize(text: str, out_mp3: str, *, voice: str, rate: str) -> None:
-        recorded["path"] = out_mp3
-        Path(out_mp3).write_bytes(b"dummy-audio")
 
-    def fake_store(url: str, local_path: str, filename_in_anki: str) -> str:
-        assert local_path == recorded["path"]
-        return "ok"
+def test_build_audio_field_hands_local_anki_a_file_path(monkeypatch) -> None:
+    stored: list[tuple[Path, str]] = []
 
-    monkeypatch.setattr(audio, "synthesize_tts", fake_synthesize)
-    monkeypatch.setattr(audio, "store_media_file", fake_store)
+    monkeypatch.setattr(audio, "synthesize_tts", lambda text, *, voice, rate: b"dummy-audio")
+    monkeypatch.setattr(audio, "store_media_path", lambda url, path, name: stored.append((path, name)))
 
-    result = audio.build_audio_field("http://localhost:8765", "hello", voice="voice", rate="+0%")
+    result, _ = audio.build_audio_field("http://localhost:8765", "hello", voice="voice", rate="+0%")
 
+    filename = result[len("[sound:") : -1]
     assert result.startswith("[sound:tts_")
-    assert "path" in recorded
-    assert not Path(recorded["path"]).exists()
+    assert stored == [(audio.audio_cache_dir() / filename, filename)]
+    assert stored[0][0].read_bytes() == b"dummy-audio"
+
+
+def test_build_audio_field_uploads_bytes_to_remote_anki(monkeypatch) -> None:
+    stored: list[tuple[bytes, str]] = []
+
+    monkeypatch.setattr(audio, "synthesize_tts", lambda text, *, voice, rate: b"remote-audio")
+    monkeypatch.setattr(audio, "store_media_data", lambda url, data, name: stored.append((data, name)))
+
+    result, _ = audio.build_audio_field("http://anki.lan:8765", "hello", voice="voice", rate="+0%")
+
+    assert stored == [(b"remote-audio", result[len("[sound:") : -1])]
+
+
+def test_build_audio_field_reuses_local_cache_and_anki_media(monkeypatch) -> None:
+    synthesized: list[str] = []
+    stored: list[str] = []
+    media_requests: list[str] = []
+
+    def fake_synthesize(text: str, *, voice: str, rate: str) -> bytes:
+        synthesized.append(text)
+        return b"audio"
+
+    def fake_request(url: str, action: str, params: dict | None = None) -> list[str]:
+        media_requests.append(action)
+        return [audio.audio_filename("known", voice="voice", rate="+0%")]
+
+    monkeypatch.setattr(audio, "synthesize_tts", fake_synthesize)
+    monkeypatch.setattr(audio, "store_media_data", lambda url, data, name: stored.append(name))
+    monkeypatch.setattr(audio, "ankiconnect_request", fake_request)
+    url = "http://anki.lan:8765"
+
+    audio.build_audio_field(url, "known", voice="voice", rate="+0%")
+    assert synthesized == []
+    assert stored == []
+
+    audio.build_audio_field(url, "fresh", voice="voice", rate="+0%")
+    audio.build_audio_field(url, "fresh", voice="voice", rate="+0%")
+    assert synthesized == ["fresh"]
+    assert len(stored) == 1
+    assert media_requests == ["getMediaFilesNames"]
+
+    monkeypatch.setattr(audio, "_ANKI_MEDIA", {})
+    audio.build_audio_field(url, "fresh", voice="voice", rate="+0%")
+    assert synthesized == ["fresh"]
+    assert len(stored) == 2
+
+
+def test_failed_media_listing_is_retried(monkeypatch) -> None:
+    attempts: list[str] = []
+
+    def flaky_request(url: str, action: str, params: dict | None = None) -> list[str]:
+        attempts.append(action)
+        if len(attempts) == 1:
+            raise ConnectionError("Anki is busy")
+        return ["tts_known.mp3"]
+
+    monkeypatch.setattr(audio, "ankiconnect_request", flaky_request)
+    url = "http://anki.lan:8765"
+
+    assert not audio.anki_has_media(url, "tts_known.mp3")
+    assert audio.anki_has_media(url, "tts_known.mp3")
+    assert audio.anki_has_media(url, "tts_known.mp3")
+    assert attempts == ["getMediaFilesNames", "getMediaFilesNames"]
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+from fakes import Faults
+
+from bench.run import main, percentile, run_scenario
+
+
+def test_percentile_uses_nearest_rank() -> None:
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 95) == 95.0
+    assert percentile([], 95) == 0.0
+
+
+def test_import_scenario_runs_offline() -> None:
+    result = run_scenario(
+        "import",
+        cards=3,
+        concurrency=2,
+        openai_faults=Faults(),
+        anki_faults=Faults(),
+        tts_faults=Faults(),
+    )
+
+    assert result["exit_code"] == 0
+    assert result["completed_cards"] == 3
+    # The import packs all three words into one batched request.
+    assert result["stages"]["openai"]["count"] == 1
+    assert {"ankiconnect", "tts"} <= set(result["stages"])
+
+
+def test_bench_recovers_from_rate_limits(tmp_path: Path) -> None:
+    output = tmp_path / "results.json"
+
+    code = main(
+        [
+            "--scenarios",
+            "update-query",
+            "--cards",
+            "4",
+            "--openai-latency-ms",
+            "0",
+            "--openai-jitter-ms",
+            "0",
+            "--openai-429-rate",
+            "0.3",
+            "--anki-latency-ms",
+            "0",
+            "--anki-jitter-ms",
+            "0",
+            "--tts-latency-ms",
+            "0",
+            "--tts-jitter-ms",
+            "0",
+            "--output",
+            str(output),
+        ]
+    )
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    scenario = report["scenarios"]["update-query"]
+    assert code == 0
+    assert scenario["completed_cards"] == 4
+    assert scenario["openai_outcomes"]["ok"] == 4
+    assert report["settings"]["openai"]["rate_limit_rate"] == 0.3
@@ -0,0 +1,122 @@
+import asyncio
+import json
+from dataclasses import replace
+
+from helpers import make_card
+
+from anki_vocab.commands import bulk_update, update
+from anki_vocab.core.config import DEFAULT_CONFIG
+from anki_vocab.core.journal import DONE, FAILED, GENERATED, UpdateJournal
+from anki_vocab.core.schema import Card
+from anki_vocab.integrations.ankiconnect import AnkiConnectBatch
+
+
+class _FakeClient:
+    def __init__(self, notes: dict[int, dict]) -> None:
+        self.notes = notes
+        self.chunks: list[list[int]] = []
+
+    async def arequest(self, action: str, params: dict) -> list[dict]:
+        assert action == "notesInfo"
+        self.chunks.append(params["notes"])
+        return [self.notes.get(note_id, {}) for note_id in params["notes"]]
+
+    async def aclose(self) -> None:
+        return None
+
+
+def _setup(monkeypatch, note_ids: range, failing: set[str]) -> tuple[list[str], list[int]]:
+    notes = {
+        note_id: {"noteId": note_id, "fields": {"Word": {"value": f"word{note_id}", "order": 0}}}
+        for note_id in note_ids
+    }
+    generated: list[str] = []
+    written: list[int] = []
+
+    async def fake_generate(sentence: str, word: str, **kwargs) -> Card:
+        await asyncio.sleep(0)
+        if word in failing:
+            raise RuntimeError("boom")
+        generated.append(word)
+        return make_card(word)
+
+    async def fake_aflush(self: AnkiConnectBatch) -> None:
+        for action, (future, convert) in zip(self._actions, self._pending):
+            written.append(action["params"]["note"]["id"])
+            future.set_result(convert(None))
+        self._take()
+
+    monkeypatch.setattr(bulk_update, "get_client", lambda url: _FakeClient(notes))
+    monkeypatch.setattr(bulk_update, "agenerate_card", fake_generate)
+    monkeypatch.setattr(AnkiConnectBatch, "aflush", fake_aflush)
+    return generated, written
+
+
+def _run(journal: UpdateJournal, job: str, pending: dict[int, str | None]) -> bulk_update.BulkStats:
+    config = replace(DEFAULT_CONFIG, tts_enabled=False)
+    return asyncio.run(
+        bulk_update.run_bulk_update(config, journal, job, pending, prompt="Simplify", workers=3, batch_size=4)
+    )
+
+
+def test_bulk_update_resumes_only_unfinished_notes(monkeypatch, tmp_path) -> None:
+    journal = UpdateJournal(tmp_path / "jobs.sqlite3")
+    journal.start("job", "deck:Test", list(range(1, 11)))
+    generated, written = _setup(monkeypatch, range(1, 11), failing={"word3"})
+
+    stats = _run(journal, "job", journal.pending("job"))
+
+    assert stats.updated == 9
+    assert stats.failed == 1
+    assert sorted(written) == [note_id for note_id in range(1, 11) if note_id != 3]
+    assert journal.counts("job") == {DONE: 9, FAILED: 1}
+
+    generated, written = _setup(monkeypatch, range(1, 11), failing=set())
+    stats = _run(journal, "job", journal.pending("job"))
+
+    assert generated == ["word3"]
+    assert written == [3]
+    assert stats.updated == 1
+    assert journal.pending("job") == {}
+    journal.close()
+
+
+def test_bulk_update_reuses_journaled_cards(monkeypatch, tmp_path) -> None:
+    journal = UpdateJournal(tmp_path / "jobs.sqlite3")
+    journal.start("job", "deck:Test", [1, 2])
+    journal.record_card("job", 1, json.dumps(make_card("stored").as_dict()))
+    assert journal.counts("job") == {GENERATED: 1, "pending": 1}
+    generated, written = _setup(monkeypatch, range(1, 3), failing=set())
+
+    stats = _run(journal, "job", journal.pending("job"))
+
+    assert generated == ["word2"]
+    assert sorted(written) == [1, 2]
+    assert stats.resumed == 1
+    assert stats.generated == 1
+    journal.close()
+
+
+def test_journal_restart_discards_progress(tmp_path) -> None:
+    journal = UpdateJournal(tmp_path / "jobs.sqlite3")
+    journal.start("job", "deck:Test", [1, 2])
+    journal.mark_done("job", [1, 2])
+    journal.start("job", "deck:Test", [1, 2, 3])
+    assert list(journal.pending("job")) == [3]
+
+    journal.start("job", "deck:Test", [1, 2, 3], restart=True)
+    assert list(journal.pending("job")) == [1, 2, 3]
+    journal.close()
+
+
+def test_query_dry_run_leaves_no_job(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    monkeypatch.setattr(update, "find_notes", lambda url, query: [1, 2, 3])
+    options = dict(query="deck:Test", prompt="Simplify", fields=[], concurrency=2, batch_size=4, yes=True)
+
+    update._update_query(DEFAULT_CONFIG, **options, restart=False, no_cache=True, dry_run=True)
+
+    journal = UpdateJournal.open_default()
+    job = update.job_key(update.job_payload(DEFAULT_CONFIG, query="deck:Test", prompt="Simplify", fields=[]))
+    assert journal.counts(job) == {}
+    journal.close()
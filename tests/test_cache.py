@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+from anki_vocab.core.cache import CardCache, cache_key
+
+
+def test_cache_key_is_order_independent() -> None:
+    assert cache_key({"model": "m", "temperature": 0.2}) == cache_key({"temperature": 0.2, "model": "m"})
+    assert cache_key({"model": "m", "temperature": 0.2}) != cache_key({"model": "m", "temperature": 0.3})
+
+
+def test_cache_evicts_least_recently_used(tmp_path) -> None:
+    cache = CardCache(tmp_path / "cards.sqlite3", max_entries=2)
+    cache.put("a", "1")
+    time.sleep(0.01)
+    cache.put("b", "2")
+    time.sleep(0.01)
+    assert cache.get("a") == "1"
+    time.sleep(0.01)
+    cache.put("c", "3")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.get("c") == "3"
+    cache.close()
+
+
+def test_cache_ignores_expired_entries(tmp_path) -> None:
+    cache = CardCache(tmp_path / "cards.sqlite3", max_age_days=0)
+    cache.put("a", "1")
+    assert cache.get("a") is None
+    cache.close()
+
+
+def test_get_or_create_deduplicates_concurrent_calls(tmp_path) -> None:
+    cache = CardCache(tmp_path / "cards.sqlite3")
+    calls: list[int] = []
+    gate = threading.Event()
+
+    def create() -> str:
+        calls.append(1)
+        gate.wait(timeout=5)
+        return "value"
+
+    results: list[str] = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_create("k", create))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 3
+    assert len(calls) == 1
+    cache.close()
+
+
+def test_aget_or_create_deduplicates_concurrent_calls(tmp_path) -> None:
+    cache = CardCache(tmp_path / "cards.sqlite3")
+    calls: list[int] = []
+
+    async def create() -> str:
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def run() -> list[str]:
+        return await asyncio.gather(*(cache.aget_or_create("k", create) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["value"] * 3
+    assert len(calls) == 1
+    cache.close()
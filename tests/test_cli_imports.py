@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ("openai", "jinja2", "edge_tts", "aiohttp", "dotenv")
+
+
+def _loaded_heavy_modules(code: str) -> list[str]:
+    probe = f"{code}\nimport sys\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    return [name for name in completed.stdout.strip().split(",") if name]
+
+
+def test_cli_import_skips_heavy_dependencies() -> None:
+    assert _loaded_heavy_modules("import anki_vocab.cli") == []
+
+
+def test_loading_a_command_skips_heavy_dependencies() -> None:
+    code = (
+        "from anki_vocab.cli import _lazy_command\n"
+        "for name in ('session', 'update', 'import', 'add', 'serve', 'flush', 'media'):\n"
+        "    _lazy_command(name)"
+    )
+    assert _loaded_heavy_modules(code) == []
@@ -0,0 +1,37 @@
+import asyncio
+
+import edge_tts
+
+from anki_vocab.integrations import edge_tts as tts
+
+
+class _FakeCommunicate:
+    active = 0
+    peak = 0
+
+    def __init__(self, text: str, voice: str, *, rate: str) -> None:
+        self.text = text
+
+    async def stream(self):
+        cls = type(self)
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        await asyncio.sleep(0.01)
+        yield {"type": "WordBoundary", "offset": 0}
+        yield {"type": "audio", "data": self.text.encode("utf-8")}
+        yield {"type": "audio", "data": b"!"}
+        cls.active -= 1
+
+
+def test_engine_limits_concurrency_and_joins_audio(monkeypatch) -> None:
+    monkeypatch.setattr(edge_tts, "Communicate", _FakeCommunicate)
+    engine = tts.TTSEngine(max_concurrency=2)
+
+    async def run() -> list[bytes]:
+        return await asyncio.gather(*(engine.asynthesize(f"clip{i}", voice="v", rate="+0%") for i in range(6)))
+
+    results = asyncio.run(run())
+
+    assert results == [f"clip{i}!".encode() for i in range(6)]
+    assert _FakeCommunicate.peak == 2
+    assert engine.synthesize("sync", voice="v", rate="+0%") == b"sync!"
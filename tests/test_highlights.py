@@ -0,0 +1,87 @@
+import edge_tts
+from fakes import FakeAnkiConnectServer, FakeCommunicate, FakeOpenAIServer, isolated_environment
+
+from anki_vocab.commands import import_file
+from anki_vocab.core.highlights import ImportState, KindleClippings, ReadwiseCsv
+
+
+def _clipping(title: str, meta: str, text: str) -> str:
+    return f"{title}\r\n- Your {meta} | Added on Monday, 3 March 2025 10:00:00\r\n\r\n{text}\r\n==========\r\n"
+
+
+def _pairs(clippings) -> list[tuple[str, str]]:
+    return [(highlight.context, highlight.word) for highlight in clippings]
+
+
+def test_kindle_pairs_notes_with_their_highlight_and_resumes(tmp_path) -> None:
+    path = tmp_path / "My Clippings.txt"
+    sentence = "He finally gave up after years of trying to quit."
+    path.write_text(
+        "\ufeff"
+        + _clipping("Book (Author)", "Highlight on page 3 | location 40-41", sentence)
+        + _clipping("Book (Author)", "Note on page 3 | location 41", "gave up")
+        + _clipping("Book (Author)", "Bookmark on page 4 | location 50", "")
+        + _clipping("Book (Author)", "Highlight on page 5 | location 60-60", "ubiquitous,")
+        + _clipping("Book (Author)", "Highlight on page 6 | location 70-71", "A long sentence without any note on it."),
+        encoding="utf-8",
+    )
+
+    clippings = KindleClippings(path)
+    assert _pairs(clippings) == [(sentence, "gave up"), ("", "ubiquitous")]
+    # The last highlight may still get its note, so the offset stops right before it.
+    assert path.read_bytes()[clippings.offset :].startswith(b"Book (Author)\r\n- Your Highlight on page 6")
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(_clipping("Book (Author)", "Note on page 6 | location 71", "note on it"))
+        handle.write("Book (Author)\r\n- Your Highlight on page 7 | location 80")
+
+    resumed = KindleClippings(path, offset=clippings.offset)
+    assert _pairs(resumed) == [("A long sentence without any note on it.", "note on it")]
+    assert path.read_bytes()[resumed.offset :].startswith(b"Book (Author)\r\n- Your Highlight on page 7")
+
+
+def test_readwise_csv_uses_short_notes_as_words(tmp_path) -> None:
+    path = tmp_path / "readwise.csv"
+    path.write_text(
+        "Highlight,Book Title,Book Author,Note,Location\n"
+        '"The rain was incessant, drumming on the roof.",Book,Author,incessant,12\n'
+        "serendipity,Book,Author,,13\n"
+        '"A long highlight with a long comment attached to it.",Book,Author,"I liked this line a lot, really",14\n',
+        encoding="utf-8-sig",
+    )
+
+    assert _pairs(ReadwiseCsv(path)) == [
+        ("The rain was incessant, drumming on the roof.", "incessant"),
+        ("", "serendipity"),
+    ]
+
+
+def test_import_state_resets_when_the_file_is_replaced(tmp_path) -> None:
+    path = tmp_path / "My Clippings.txt"
+    path.write_text(_clipping("Book", "Highlight on location 1", "word"), encoding="utf-8")
+    state = ImportState(tmp_path / "imports.sqlite3")
+
+    state.save_offset("clippings", path, path.stat().st_size)
+    assert state.offset("clippings", path) == path.stat().st_size
+    path.write_text(_clipping("Other", "Highlight on location 1", "word") * 2, encoding="utf-8")
+    assert state.offset("clippings", path) == 0
+    state.close()
+
+
+def test_import_only_processes_new_highlights(monkeypatch, tmp_path, capsys) -> None:
+    monkeypatch.setattr(edge_tts, "Communicate", FakeCommunicate)
+    path = tmp_path / "My Clippings.txt"
+    path.write_text(
+        _clipping("Book", "Highlight on location 1", "ledger") + _clipping("Book", "Highlight on location 2", "quill"),
+        encoding="utf-8",
+    )
+
+    with FakeOpenAIServer() as openai, FakeAnkiConnectServer() as anki, isolated_environment(openai, anki):
+        import_file.import_command(path, source_format="kindle", no_cache=True)
+        with path.open("a", encoding="utf-8") as handle:
+            handle.write(_clipping("Book", "Highlight on location 3", "parchment"))
+        import_file.import_command(path, source_format="kindle", no_cache=True)
+
+    assert "New highlights: 1." in capsys.readouterr().err
+    words = [note["fields"]["Word"]["value"] for note in anki.notes.values()]
+    assert sorted(words) == ["ledger", "parchment", "quill"]
@@ -0,0 +1,86 @@
+import asyncio
+from dataclasses import replace
+
+import edge_tts
+import pytest
+import typer
+from fakes import FakeAnkiConnectServer, FakeCommunicate, FakeOpenAIServer, isolated_environment
+from helpers import make_card
+
+from anki_vocab.commands import import_file
+from anki_vocab.core.config import DEFAULT_CONFIG
+from anki_vocab.core.schema import Card
+from anki_vocab.integrations.ankiconnect import AnkiConnectBatch
+
+
+def test_iter_import_lines_skips_blank_and_invalid(tmp_path) -> None:
+    source = tmp_path / "words.txt"
+    source.write_text("Some  context , here | word\n\n| broken\nplain\n:quit\nafter\n", encoding="utf-8")
+
+    items = list(import_file._iter_import_lines(source))
+
+    assert items == [(1, "Some context, here", "word"), (4, "", "plain")]
+
+
+def test_run_import_adds_every_card(monkeypatch, tmp_path) -> None:
+    source = tmp_path / "words.txt"
+    source.write_text("".join(f"ctx {i} | word{i}\n" for i in range(10)), encoding="utf-8")
+    written: list[str] = []
+
+    batches: list[int] = []
+
+    async def fake_generate(items: list[tuple[str, str]], **kwargs) -> list[Card | Exception]:
+        await asyncio.sleep(0)
+        batches.append(len(items))
+        return [RuntimeError("bad card") if word == "word7" else make_card(word) for _, word in items]
+
+    async def fake_aflush(self: AnkiConnectBatch) -> None:
+        for action, (future, convert) in zip(self._actions, self._pending):
+            word = action["params"]["note"]["fields"]["Word"]
+            written.append(word)
+            future.set_result(convert(len(written)))
+        self._take()
+
+    monkeypatch.setattr(import_file, "agenerate_cards", fake_generate)
+    monkeypatch.setattr(AnkiConnectBatch, "aflush", fake_aflush)
+    config = replace(DEFAULT_CONFIG, tts_enabled=False)
+
+    stats = asyncio.run(
+        import_file._run_import(
+            import_file._iter_import_lines(source),
+            config,
+            generate_workers=3,
+            tts_workers=2,
+            write_workers=2,
+            dry_run=False,
+            words_per_request=4,
+        )
+    )
+
+    assert stats.generated == 9
+    assert stats.added == 9
+    assert stats.failed == 1
+    assert sum(batches) == 10 and max(batches) <= 4
+    assert sorted(written) == sorted(f"word{i}" for i in range(10) if i != 7)
+
+
+def test_import_reports_a_note_whose_audio_was_rejected(monkeypatch, tmp_path, capsys) -> None:
+    monkeypatch.setattr(edge_tts, "Communicate", FakeCommunicate)
+    source = tmp_path / "words.txt"
+    source.write_text("A ledger entry. | ledger\n", encoding="utf-8")
+
+    with FakeOpenAIServer() as openai, FakeAnkiConnectServer() as anki, isolated_environment(openai, anki):
+        handle = anki.handle
+
+        def reject_media(action: str, params: dict):
+            if action == "storeMediaFile":
+                raise RuntimeError("media folder is read-only")
+            return handle(action, params)
+
+        monkeypatch.setattr(anki, "handle", reject_media)
+        with pytest.raises(typer.Exit):
+            import_file.import_command(source, no_cache=True)
+
+    err = capsys.readouterr().err
+    assert "but its audio was not stored" in err
+    assert "added 0" in err and "failed 1" in err
@@ -0,0 +1,33 @@
+import pytest
+
+from anki_vocab.core.lemma import word_candidates, word_key
+
+
+def test_word_key_ignores_case_markup_and_separators() -> None:
+    assert word_key("Well-being") == word_key("well being") == word_key("<b>wellbeing</b>") == "wellbeing"
+    assert word_key("to give up") == word_key("Give Up") == "giveup"
+    assert word_key("the") == "the"
+
+
+@pytest.mark.parametrize(
+    ("typed", "stored"),
+    [
+        ("running", "run"),
+        ("making", "make"),
+        ("studies", "study"),
+        ("carried", "carry"),
+        ("boxes", "box"),
+        ("children", "child"),
+        ("gave up", "give up"),
+        ("looked after", "look after"),
+        ("Turns out", "turn out"),
+    ],
+)
+def test_word_candidates_undo_inflections(typed: str, stored: str) -> None:
+    assert word_key(stored) in word_candidates(typed)
+
+
+@pytest.mark.parametrize("word", ["ring", "feed", "bus", "analysis", "news"])
+def test_word_candidates_keep_base_forms(word: str) -> None:
+    assert word in word_candidates(word)
+    assert all(len(candidate) >= len(word) - 1 for candidate in word_candidates(word))
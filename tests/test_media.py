@@ -0,0 +1,52 @@
+from collections.abc import Iterator
+
+import pytest
+from fakes import NOTE_MODEL, FakeAnkiConnectServer, FakeOpenAIServer, isolated_environment
+
+from anki_vocab.commands.media import media_gc_command
+from anki_vocab.core import audio
+from anki_vocab.core.audio import audio_cache_dir
+from anki_vocab.core.media import collect_garbage
+from anki_vocab.core.outbox import WriteOutbox
+from anki_vocab.integrations.ankiconnect import ankiconnect_request
+
+
+@pytest.fixture
+def anki(monkeypatch, tmp_path) -> Iterator[FakeAnkiConnectServer]:
+    monkeypatch.setenv("ANKI_VOCAB_SOCKET", str(tmp_path / "serve.sock"))
+    monkeypatch.setattr(audio, "_ANKI_MEDIA", {})
+    with FakeOpenAIServer() as openai, FakeAnkiConnectServer() as anki, isolated_environment(openai, anki):
+        for word, clip in [("cat", "tts_cat.mp3"), ("dog", "tts_dog.mp3")]:
+            note = {"modelName": NOTE_MODEL, "fields": {"Word": word, "Audio": f"[sound:{clip}]"}}
+            ankiconnect_request(anki.url, "addNote", {"note": note})
+        for name in ["tts_cat.mp3", "tts_dog.mp3", "tts_old.mp3", "tts_queued.mp3", "tts_stale.mp3", "photo.jpg"]:
+            ankiconnect_request(anki.url, "storeMediaFile", {"filename": name, "data": "SUQz"})
+        yield anki
+
+
+def test_gc_reports_orphans_and_keeps_queued_references(anki: FakeAnkiConnectServer) -> None:
+    outbox = WriteOutbox.open_default()
+    note = {"modelName": NOTE_MODEL, "fields": {"Word": "fox", "Audio": "[sound:tts_queued.mp3]"}}
+    outbox.put(anki.url, [{"action": "addNote", "version": 6, "params": {"note": note}}], label="fox")
+    audio_cache_dir().mkdir(parents=True)
+    (audio_cache_dir() / "tts_old.mp3").write_bytes(b"x" * 2048)
+
+    report = collect_garbage(anki.url, NOTE_MODEL, outbox=outbox, dry_run=True)
+    outbox.close()
+
+    assert report.media == ["tts_cat.mp3", "tts_dog.mp3", "tts_old.mp3", "tts_queued.mp3", "tts_stale.mp3"]
+    assert report.orphans == ["tts_old.mp3", "tts_stale.mp3"]
+    assert (report.reclaimable, report.unsized) == (2048, 1)
+    assert "tts_old.mp3" in anki.media
+
+
+def test_gc_deletes_orphans_in_batches(anki: FakeAnkiConnectServer, capsys) -> None:
+    audio.remember_media(anki.url, "tts_old.mp3")
+
+    media_gc_command(dry_run=False, batch_size=1, note_model=None, verbose=False)
+
+    assert sorted(anki.media) == ["photo.jpg", "tts_cat.mp3", "tts_dog.mp3"]
+    assert anki.actions["deleteMediaFile"] == 3
+    assert anki.actions["multi"] >= 4
+    assert not audio.anki_has_media(anki.url, "tts_old.mp3")
+    assert "3 orphaned" in capsys.readouterr().err
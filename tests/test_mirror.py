@@ -0,0 +1,126 @@
+import threading
+import time
+
+from anki_vocab.commands.utils import find_existing_notes
+from anki_vocab.core import mirror as mirror_module
+from anki_vocab.core.mirror import DeckMirror
+from anki_vocab.integrations import ankiconnect
+
+
+def _note(note_id: int, word: str, mod: int = 1) -> dict:
+    return {"noteId": note_id, "mod": mod, "fields": {"Word": {"value": word, "order": 0}}}
+
+
+class _FakeAnki:
+    def __init__(self, notes: dict[int, dict]) -> None:
+        self.notes = notes
+        self.edited: list[int] = []
+        self.queries: list[str] = []
+        self.info_calls: list[list[int]] = []
+
+    def request(self, url: str, action: str, params: dict | None = None):
+        assert action == "multi"
+        results = []
+        for item in params["actions"]:
+            query = item["params"]["query"]
+            self.queries.append(query)
+            ids = self.edited if "edited:" in query else list(self.notes)
+            results.append({"result": ids, "error": None})
+        return results
+
+    def notes_info(self, url: str, note_ids: list[int]) -> list[dict]:
+        self.info_calls.append(list(note_ids))
+        return [self.notes[note_id] for note_id in note_ids if note_id in self.notes]
+
+
+def _mirror(tmp_path, monkeypatch, anki: _FakeAnki) -> DeckMirror:
+    monkeypatch.setattr(ankiconnect, "ankiconnect_request", anki.request)
+    monkeypatch.setattr(mirror_module, "notes_info", anki.notes_info)
+    return DeckMirror(
+        tmp_path / "mirror.sqlite3",
+        ankiconnect_url="http://localhost:8765",
+        note_model="Vocab",
+        word_field="Word",
+    )
+
+
+def test_initial_sync_fetches_every_note(tmp_path, monkeypatch) -> None:
+    anki = _FakeAnki({1: _note(1, "Apple"), 2: _note(2, "pear")})
+    mirror = _mirror(tmp_path, monkeypatch, anki)
+
+    assert mirror.sync() == 2
+    assert anki.queries == ['note:"Vocab"']
+    assert mirror.find("apple") == [1]
+    assert mirror.find(" PEAR ") == [2]
+    assert mirror.notes([2, 1]) == [anki.notes[2], anki.notes[1]]
+    mirror.close()
+
+
+def test_incremental_sync_only_fetches_edited_and_drops_deleted(tmp_path, monkeypatch) -> None:
+    anki = _FakeAnki({1: _note(1, "apple"), 2: _note(2, "pear")})
+    mirror = _mirror(tmp_path, monkeypatch, anki)
+    mirror.sync()
+
+    anki.notes = {1: _note(1, "apples", mod=2), 3: _note(3, "plum")}
+    anki.edited = [1]
+    anki.info_calls.clear()
+    mirror.sync()
+
+    assert anki.queries[-1] == 'note:"Vocab" edited:2'
+    assert anki.info_calls == [[1, 3]]
+    assert mirror.find("apple") == []
+    assert mirror.find("apples") == [1]
+    assert mirror.find("pear") == []
+    assert mirror.find("plum") == [3]
+    mirror.close()
+
+
+def test_remember_records_local_writes(tmp_path, monkeypatch) -> None:
+    mirror = _mirror(tmp_path, monkeypatch, _FakeAnki({}))
+
+    mirror.remember(7, {"Word": "Fig", "Audio": "[sound:tts.mp3]"})
+    assert mirror.find("fig") == [7]
+    assert mirror.notes([7])[0]["fields"]["Audio"]["value"] == "[sound:tts.mp3]"
+
+    mirror.remember(7, {"Word": "figs"})
+    assert mirror.find("fig") == []
+    assert mirror.find("figs") == [7]
+    mirror.close()
+
+
+def test_find_similar_matches_inflections_and_tracks_new_notes(tmp_path, monkeypatch) -> None:
+    anki = _FakeAnki({1: _note(1, "give up"), 2: _note(2, "Well-being"), 3: _note(3, "run")})
+    mirror = _mirror(tmp_path, monkeypatch, anki)
+    mirror.sync()
+
+    assert mirror.find_similar("Gave up") == {1: "give up"}
+    assert mirror.find_similar("well being") == {2: "well-being"}
+    assert mirror.find_similar("running") == {3: "run"}
+    assert mirror.find_similar("runner") == {}
+
+    mirror.remember(4, {"Word": "runner"})
+    assert mirror.find_similar("runners") == {4: "runner"}
+    mirror.close()
+
+
+def test_concurrent_lookups_sync_the_mirror_once(tmp_path, monkeypatch) -> None:
+    mirror = _mirror(tmp_path, monkeypatch, _FakeAnki({1: _note(1, "apple")}))
+    syncs: list[int] = []
+    original_sync = mirror.sync
+
+    def slow_sync() -> int:
+        syncs.append(1)
+        time.sleep(0.05)
+        return original_sync()
+
+    monkeypatch.setattr(mirror, "sync", slow_sync)
+    results: list[list[int]] = []
+    threads = [threading.Thread(target=lambda: results.append(find_existing_notes(mirror, "apple"))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert syncs == [1]
+    assert results == [[1]] * 4
+    mirror.close()
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from anki_vocab.core.cache import CardCache
+from anki_vocab.integrations import openai_client
+
+CARD = {
+    "word_base": "test",
+    "pos": "noun",
+    "ru_meaning": "тест",
+    "definition": "a simple check",
+    "context_en": "This is a test.",
+    "context_ru": "Это тест.",
+    "notes": "Synonyms: check, trial",
+    "rarity": "Common",
+    "cefr": "B1",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if request.get("stream"):
+            self._stream()
+            return
+        prompt = request["messages"][-1]["content"]
+        # Partial regenerations answer with only the requested keys.
+        targets = re.search(r"^FIELDS: (.*)$", prompt, re.MULTILINE)
+        payload = CARD if targets is None else {key: f"new {key}" for key in targets.group(1).split(", ")}
+        if prompt.startswith("BATCH:"):
+            # Batches come back in reverse order, and a "broken" target loses a required field.
+            words = re.findall(r'^TARGET: "(.*)"$', prompt, re.MULTILINE)
+            cards = [{**CARD, "word_base": word, "item": index} for index, word in enumerate(words, start=1)]
+            payload = {
+                "cards": [
+                    {key: value for key, value in card.items() if card["word_base"] != "broken" or key != "pos"}
+                    for card in reversed(cards)
+                ]
+            }
+        elif targets is None:
+            word = re.search(r'^TARGET: "(.*)"$', prompt, re.MULTILINE)
+            payload = {**CARD, "word_base": word.group(1) if word else CARD["word_base"]}
+        body = {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "test-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": json.dumps(payload)},
+                }
+            ],
+            "usage": {
+                "prompt_tokens": 1200,
+                "completion_tokens": 150,
+                "total_tokens": 1350,
+                "prompt_tokens_details": {"cached_tokens": 1024},
+            },
+        }
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self) -> None:
+        content = json.dumps(CARD, ensure_ascii=False)
+        events = [content[start : start + 7] for start in range(0, len(content), 7)]
+        data = "".join(
+            "data: "
+            + json.dumps(
+                {
+                    "id": "chatcmpl-test",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": "test-model",
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                }
+            )
+            + "\n\n"
+            for piece in events
+        )
+        data += "data: [DONE]\n\n"
+        encoded = data.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        openai_client.close_clients()
+        server.shutdown()
+        server.server_close()
+
+
+def test_generate_card_reuses_client_and_connection(base_url: str) -> None:
+    before = openai_client.connection_stats()
+
+    for _ in range(3):
+        card = openai_client.generate_card("This is a test.", "test", model="m", api_key="sk-test", base_url=base_url)
+        assert card.word_base == "test"
+
+    after = openai_client.connection_stats()
+    assert openai_client.get_client("sk-test", base_url=base_url) is openai_client.get_client(
+        " sk-test ", base_url=base_url
+    )
+    assert after.requests - before.requests == 3
+    assert after.new_connections - before.new_connections == 1
+    assert after.prompt_tokens - before.prompt_tokens == 3600
+    assert after.cached_tokens - before.cached_tokens == 3072
+
+
+def test_requests_share_a_static_prefix() -> None:
+    plain = openai_client._chat_request("A test.", "test", model="m", current_card=None, user_prompt=None)
+    update = openai_client._chat_request("A test.", "test", model="m", current_card=CARD, user_prompt="Shorter")
+
+    assert plain["messages"][0] == update["messages"][0]
+    assert "{%" not in plain["messages"][0]["content"]
+    assert "CURRENT_CARD_JSON" in update["messages"][-1]["content"]
+
+
+def test_summary_reports_cached_share() -> None:
+    stats = openai_client.ConnectionStats(requests=2, new_connections=1, prompt_tokens=2000, cached_tokens=1500)
+    assert "Prompt tokens: 2000, cached: 1500 (75%)." in stats.summary()
+
+
+class _RateLimitedHandler(_Handler):
+    rejections = 2
+
+    def do_POST(self) -> None:
+        if _RateLimitedHandler.rejections:
+            _RateLimitedHandler.rejections -= 1
+            self.rfile.read(int(self.headers["Content-Length"]))
+            data = json.dumps({"error": {"message": "Rate limit reached", "type": "requests"}}).encode("utf-8")
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("retry-after-ms", "10")
+            self.send_header("x-ratelimit-limit-requests", "100")
+            self.send_header("x-ratelimit-remaining-requests", "0")
+            self.send_header("x-ratelimit-reset-requests", "20ms")
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        super().do_POST()
+
+
+def test_generate_card_retries_rate_limited_requests() -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _RateLimitedHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        before = openai_client.connection_stats()
+        card = openai_client.generate_card("This is a test.", "test", model="m", api_key="sk-test", base_url=base_url)
+        after = openai_client.connection_stats()
+    finally:
+        openai_client.close_clients()
+        server.shutdown()
+        server.server_close()
+
+    assert card.word_base == "test"
+    assert after.requests - before.requests == 3
+    assert after.rate_limited - before.rate_limited == 2
+
+
+def test_generate_card_streams_fields(base_url: str, tmp_path) -> None:
+    cache = CardCache(tmp_path / "cards.sqlite3")
+    fields: list[str] = []
+    card = openai_client.generate_card(
+        "This is a test.",
+        "test",
+        model="m",
+        api_key="sk-test",
+        base_url=base_url,
+        cache=cache,
+        on_field=lambda key, value: fields.append(key),
+    )
+    assert card.word_base == "test"
+    assert fields == list(CARD)
+
+    replayed: list[str] = []
+    openai_client.generate_card(
+        "This is a test.",
+        "test",
+        model="m",
+        api_key="sk-test",
+        base_url=base_url,
+        cache=cache,
+        on_field=lambda key, value: replayed.append(key),
+    )
+    assert replayed == list(CARD)
+    cache.close()
+
+
+def test_generate_card_merges_partial_fields(base_url: str) -> None:
+    current = {**CARD, "tts_text": "a test"}
+
+    card = openai_client.generate_card(
+        "This is a test.",
+        "test",
+        model="m",
+        api_key="sk-test",
+        base_url=base_url,
+        current_card=current,
+        user_prompt="More natural Russian.",
+        fields=["context_en", "notes"],
+    )
+
+    assert card.context_en == "new context_en"
+    assert card.context_ru == "new context_ru"
+    assert card.notes == "new notes"
+    assert card.definition == CARD["definition"]
+    assert card.tts_text == "a test"
+
+
+def test_partial_request_lists_fields() -> None:
+    request = openai_client._chat_request(
+        "A test.",
+        "test",
+        model="m",
+        current_card=CARD,
+        user_prompt="Shorter",
+        fields=["notes"],
+    )
+
+    assert "\nFIELDS: notes\nUSER_PROMPT:" in request["messages"][1]["content"]
+    with pytest.raises(ValueError):
+        openai_client.generate_card("A test.", "test", model="m", api_key="sk-test", fields=["notes"])
+
+
+def test_pack_batches_respects_budget_and_item_cap() -> None:
+    items = [("A short sentence.", f"word{index}") for index in range(7)]
+
+    assert openai_client.pack_batches(items, token_budget=1000, max_items=3, completion_tokens=400) == [
+        [0, 1],
+        [2, 3],
+        [4, 5],
+        [6],
+    ]
+    assert openai_client.pack_batches(items, token_budget=10_000, max_items=3) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_agenerate_cards_batches_and_retries_failed_items(base_url: str, tmp_path) -> None:
+    cache = CardCache(tmp_path / "cards.sqlite3")
+    words = ["alpha", "broken", "gamma", "delta"]
+    before = openai_client.connection_stats()
+
+    async def run() -> list:
+        try:
+            return await openai_client.agenerate_cards(
+                [(f"Use {word}.", word) for word in words],
+                model="m",
+                api_key="sk-test",
+                base_url=base_url,
+                cache=cache,
+            )
+        finally:
+            await openai_client.aclose_clients()
+
+    results = asyncio.run(run())
+    after = openai_client.connection_stats()
+
+    assert [card.word_base for card in results] == words
+    # One batched request, then a single-word retry for the card that failed validation.
+    assert after.requests - before.requests == 2
+
+    cached = asyncio.run(run())
+    assert [card.word_base for card in cached] == words
+    assert openai_client.connection_stats().requests == after.requests
+    cache.close()
+
+
+def test_parse_batch_rejects_bad_shapes_and_item_numbers() -> None:
+    with pytest.raises(ValueError):
+        openai_client._parse_batch(json.dumps([CARD]), 2)
+
+    cards = [{**CARD, "item": 1}, {**CARD, "item": 1}, {**CARD, "item": 5}, {**CARD, "item": "x"}]
+    results = openai_client._parse_batch(json.dumps({"cards": cards}), 3)
+
+    assert [type(result) for result in results] == [ValueError, RuntimeError, RuntimeError]
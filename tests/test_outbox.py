@@ -0,0 +1,166 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from anki_vocab.core import outbox as outbox_module
+from anki_vocab.core.audio import audio_cache_dir
+from anki_vocab.core.outbox import FAILED, PENDING, WriteOutbox
+from anki_vocab.integrations.ankiconnect import AnkiConnectBatch
+
+URL = "http://127.0.0.1:8765"
+
+
+def _note(word: str) -> dict:
+    return {"deckName": "English", "modelName": "English", "fields": {"Word": word}}
+
+
+def _queue(outbox: WriteOutbox, monkeypatch, words: list[str]) -> None:
+    def unavailable(self: AnkiConnectBatch) -> None:
+        error = ConnectionRefusedError("Anki is not running")
+        for future, _ in self._take()[1]:
+            future.set_exception(error)
+        raise error
+
+    monkeypatch.setattr(AnkiConnectBatch, "flush", unavailable)
+    for word in words:
+        batch = AnkiConnectBatch(URL)
+        batch.store_media_data(b"ID3", f"tts_{word}.mp3")
+        added = batch.add_note(_note(word))
+        assert outbox.send(batch, label=word) is False
+        with pytest.raises(ConnectionRefusedError):
+            added.result()
+
+
+@pytest.fixture
+def outbox(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    outbox = WriteOutbox(tmp_path / "outbox.sqlite3")
+    yield outbox
+    outbox.close()
+
+
+def test_send_keeps_nothing_when_anki_answers(outbox: WriteOutbox, monkeypatch) -> None:
+    def flush(self: AnkiConnectBatch) -> None:
+        for future, convert in self._take()[1]:
+            future.set_result(convert(42))
+
+    monkeypatch.setattr(AnkiConnectBatch, "flush", flush)
+    batch = AnkiConnectBatch(URL)
+    added = batch.add_note(_note("cat"))
+
+    assert outbox.send(batch, label="cat") is True
+    assert added.result() == 42
+    assert outbox.counts() == {}
+
+
+def test_flush_coalesces_queued_writes(outbox: WriteOutbox, monkeypatch) -> None:
+    _queue(outbox, monkeypatch, ["cat", "dog", "fox"])
+    requests: list[list[str]] = []
+
+    def request(url: str, action: str, params: dict) -> list[dict]:
+        assert (url, action) == (URL, "multi")
+        requests.append([item["action"] for item in params["actions"]])
+        return [{"result": 1, "error": None} for _ in params["actions"]]
+
+    monkeypatch.setattr(outbox_module, "ankiconnect_request", request)
+
+    stats = outbox.flush(max_actions=4)
+
+    assert requests == [["storeMediaFile", "addNote", "storeMediaFile", "addNote"], ["storeMediaFile", "addNote"]]
+    assert (stats.sent, stats.failed, stats.requests, stats.remaining) == (3, 0, 2, 0)
+
+
+def test_flush_treats_replayed_add_as_done_and_keeps_rejections(outbox: WriteOutbox, monkeypatch) -> None:
+    _queue(outbox, monkeypatch, ["cat"])
+    outbox.put(URL, [{"action": "addNote", "version": 6, "params": {"note": _note("dog")}}], label="dog")
+    outbox.release([2], "interrupted")
+    outbox.put(URL, [{"action": "addNote", "version": 6, "params": {"note": _note("fox")}}], label="fox")
+    outbox.release([3], "interrupted")
+    outbox._db.execute("UPDATE writes SET attempts = 0 WHERE entry_id = 3")
+
+    def request(url: str, action: str, params: dict) -> list[dict]:
+        duplicate = {"result": None, "error": "cannot create note because it is a duplicate"}
+        return [{"result": 1, "error": None}, {"result": 2, "error": None}, duplicate, duplicate]
+
+    monkeypatch.setattr(outbox_module, "ankiconnect_request", request)
+
+    stats = outbox.flush()
+
+    assert (stats.sent, stats.failed, stats.remaining) == (2, 1, 1)
+    assert outbox.counts() == {FAILED: 1}
+    assert outbox.failures() == [("fox", "addNote: cannot create note because it is a duplicate")]
+    assert outbox.flush().requests == 0
+    assert [entry.label for entry in outbox.claim(include_failed=True)] == ["fox"]
+
+
+def test_flush_stops_on_connection_errors(outbox: WriteOutbox, monkeypatch) -> None:
+    _queue(outbox, monkeypatch, ["cat", "dog"])
+
+    def request(url: str, action: str, params: dict) -> list[dict]:
+        raise ConnectionRefusedError("still down")
+
+    monkeypatch.setattr(outbox_module, "ankiconnect_request", request)
+
+    stats = outbox.flush(max_actions=2)
+
+    assert stats.error == "still down"
+    assert (stats.sent, stats.requests, stats.remaining) == (0, 0, 2)
+    assert outbox.counts() == {PENDING: 2}
+    assert [entry.attempts for entry in outbox.claim()] == [2, 2]
+
+
+def test_claimed_entries_are_not_sent_twice(outbox: WriteOutbox, monkeypatch) -> None:
+    _queue(outbox, monkeypatch, ["cat"])
+
+    assert len(outbox.claim()) == 1
+    assert outbox.claim() == []
+
+
+def test_flush_releases_chunks_on_a_short_multi_answer(outbox: WriteOutbox, monkeypatch) -> None:
+    _queue(outbox, monkeypatch, ["cat", "dog"])
+    monkeypatch.setattr(outbox_module, "ankiconnect_request", lambda url, action, params: [{"result": 1}])
+
+    stats = outbox.flush(max_actions=2)
+
+    assert stats.error == "multi did not answer all 2 actions"
+    assert (stats.sent, stats.failed, stats.remaining) == (0, 0, 2)
+    assert outbox.counts() == {PENDING: 2}
+
+
+def test_failed_claim_rolls_back_its_transaction(outbox: WriteOutbox, monkeypatch) -> None:
+    _queue(outbox, monkeypatch, ["cat"])
+    outbox._db.execute("ALTER TABLE writes RENAME TO writes_moved")
+
+    with pytest.raises(sqlite3.OperationalError):
+        outbox.claim()
+
+    assert not outbox._db.in_transaction
+    outbox._db.execute("ALTER TABLE writes_moved RENAME TO writes")
+    outbox.release([1], "interrupted")
+    assert [entry.label for entry in outbox.claim()] == ["cat"]
+
+
+def test_queued_clips_keep_their_cache_path_and_are_read_on_replay(outbox: WriteOutbox, monkeypatch) -> None:
+    audio_cache_dir().mkdir(parents=True)
+    (audio_cache_dir() / "tts_cat.mp3").write_bytes(b"ID3")
+    remote = "http://anki.lan:8765"
+    for url in (URL, remote):
+        batch = AnkiConnectBatch(url)
+        batch.store_media_data(b"ID3", "tts_cat.mp3")
+        batch.store_media_data(b"ID3", "tts_uncached.mp3")
+        outbox.put(url, batch.actions, label="cat")
+    outbox.release([1, 2], "interrupted")
+    sent: dict[str, list[dict]] = {}
+
+    def request(url: str, action: str, params: dict) -> list[dict]:
+        sent[url] = [item["params"] for item in params["actions"]]
+        return [{"result": 1, "error": None} for _ in params["actions"]]
+
+    monkeypatch.setattr(outbox_module, "ankiconnect_request", request)
+
+    cached = str(audio_cache_dir() / "tts_cat.mp3")
+    assert outbox.entries()[1].actions[0]["params"] == {"filename": "tts_cat.mp3", "path": cached}
+    assert outbox.flush().sent == 2
+    expected = [{"filename": "tts_cat.mp3", "data": "SUQz"}, {"filename": "tts_uncached.mp3", "data": "SUQz"}]
+    assert sent == {URL: expected, remote: expected}
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from helpers import make_card
+
+from anki_vocab.core.prefetch import CardPrefetcher
+from anki_vocab.core.schema import Card
+
+
+def test_prefetched_card_is_generated_once() -> None:
+    calls: list[tuple[str, str]] = []
+
+    def generate(context: str, word: str) -> Card:
+        calls.append((context, word))
+        return make_card(word)
+
+    prefetcher = CardPrefetcher(generate)
+    prefetcher.submit("ctx", "word")
+    prefetcher.submit("ctx", "word")
+
+    assert prefetcher.card("ctx", "word").word_base == "word"
+    assert prefetcher.card("other", "fresh").word_base == "fresh"
+    assert calls == [("ctx", "word"), ("other", "fresh")]
+    prefetcher.close()
+
+
+def test_close_discards_queued_work() -> None:
+    release = threading.Event()
+    started: list[str] = []
+
+    def generate(context: str, word: str) -> Card:
+        started.append(word)
+        release.wait(timeout=5)
+        return make_card(word)
+
+    prefetcher = CardPrefetcher(generate, workers=1)
+    prefetcher.submit("", "first")
+    prefetcher.submit("", "second")
+    threading.Timer(0.05, release.set).start()
+    prefetcher.close()
+
+    prefetcher.submit("", "third")
+    assert prefetcher.card("", "second").word_base == "second"
+    assert "third" not in started
+
+
+def test_close_waits_for_running_prefetches() -> None:
+    started = threading.Event()
+    finished: list[str] = []
+
+    def generate(context: str, word: str) -> Card:
+        started.set()
+        time.sleep(0.1)
+        finished.append(word)
+        return make_card(word)
+
+    prefetcher = CardPrefetcher(generate, workers=1)
+    prefetcher.submit("", "first")
+    prefetcher.submit("", "second")
+    assert started.wait(timeout=5)
+    prefetcher.close()
+
+    # Nothing touches the shared clients or cache once close() returns.
+    assert finished == ["first"]
+    time.sleep(0.2)
+    assert finished == ["first"]
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from anki_vocab.integrations.rate_limit import RateLimiter, parse_reset
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("2", 2.0), ("", None), ("soon", None)],
+)
+def test_parse_reset(value: str, expected: float | None) -> None:
+    assert parse_reset(value) == expected
+
+
+def test_limiter_is_open_until_headers_are_seen() -> None:
+    limiter = RateLimiter()
+    start = time.monotonic()
+    for _ in range(50):
+        limiter.acquire(10_000)
+    assert time.monotonic() - start < 0.1
+
+
+def test_limiter_waits_for_token_budget() -> None:
+    limiter = RateLimiter()
+    headers = {
+        "x-ratelimit-limit-tokens": "1000",
+        "x-ratelimit-remaining-tokens": "100",
+        "x-ratelimit-reset-tokens": "1s",
+    }
+    limiter.observe(headers, estimated=0)
+
+    assert limiter._reserve(100) == 0
+    # 900 tokens refill over one second, so another 90 take about 0.1s.
+    assert limiter._reserve(90) == pytest.approx(0.1, abs=0.02)
+
+
+def test_limiter_corrects_estimate_with_usage() -> None:
+    class Usage:
+        total_tokens = 50
+        completion_tokens = 30
+
+    limiter = RateLimiter()
+    headers = {"x-ratelimit-limit-tokens": "6000", "x-ratelimit-remaining-tokens": "1000"}
+    limiter.observe(headers, estimated=0)
+    limiter._reserve(1000)
+    limiter.observe({}, estimated=1000, usage=Usage())
+
+    assert limiter._reserve(900) == 0
+    assert limiter.estimate({"messages": [{"role": "user", "content": "x" * 400}]}) < 500
+
+
+def test_backoff_blocks_other_callers_after_rate_limit() -> None:
+    limiter = RateLimiter()
+    delay = limiter.backoff(0, estimated=10, rate_limited=True, headers={"retry-after": "1"})
+
+    assert 1.0 <= delay <= 1.25
+    assert limiter._reserve(1) > 0.9
+    assert RateLimiter().backoff(3, estimated=10) <= 4.0
@@ -1,6 +1,12 @@
 import pytest
 
-from anki_vocab.core.schema import parse_card
+from anki_vocab.core.schema import (
+    expand_card_fields,
+    merge_card_fields,
+    parse_card,
+    resolve_card_fields,
+    split_field_prompt,
+)
 
 
 def test_parse_card_requires_fields() -> None:
@@ -24,3 +30,47 @@ def test_parse_card_accepts_valid_payload() -> None:
     card = parse_card(payload)
     assert card.word_base == "test"
     assert card.tts_text == "test"
+
+
+def test_split_field_prompt_reads_field_prefix() -> None:
+    field_map = {"context_ru": "Sentence Translation", "notes": "Notes"}
+
+    assert split_field_prompt("notes, sentence translation: more natural", field_map) == (
+        ["notes", "context_ru"],
+        "more natural",
+    )
+    assert split_field_prompt("context_ru:", field_map) == (["context_ru"], None)
+    assert split_field_prompt("Note: keep it short", field_map) == ([], "Note: keep it short")
+    assert split_field_prompt("", field_map) == ([], None)
+    with pytest.raises(ValueError):
+        resolve_card_fields(["meaning"], field_map)
+
+
+def test_partial_fields_expand_and_merge() -> None:
+    current = {
+        "word_base": "test",
+        "pos": "noun",
+        "ru_meaning": "тест",
+        "definition": "",
+        "context_en": "This is a test.",
+        "context_ru": "Это тест.",
+        "notes": "Synonyms: check",
+        "rarity": "Common",
+        "cefr": "B1",
+        "tts_text": "",
+    }
+
+    fields = expand_card_fields(["context_en"], current)
+    card = merge_card_fields(
+        current,
+        {"context_en": "A quick test.", "context_ru": "Быстрый тест.", "definition": "a check", "pos": "verb"},
+        fields,
+    )
+
+    assert fields == ["definition", "context_en", "context_ru"]
+    assert card.context_en == "A quick test."
+    assert card.definition == "a check"
+    assert card.pos == "noun"
+    assert card.tts_text is None
+    with pytest.raises(RuntimeError):
+        merge_card_fields(current, {"context_en": "A quick test."}, fields)
@@ -0,0 +1,154 @@
+import contextlib
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+import edge_tts
+import pytest
+from fakes import NOTE_MODEL, FakeAnkiConnectServer, FakeCommunicate, FakeOpenAIServer, isolated_environment
+
+from anki_vocab.commands import add, serve, update
+from anki_vocab.commands.client import DaemonUnavailable, daemon_request
+from anki_vocab.core.config import resolve_config
+from anki_vocab.core.outbox import PENDING, WriteOutbox
+
+
+@pytest.fixture
+def anki(monkeypatch) -> Iterator[FakeAnkiConnectServer]:
+    monkeypatch.setattr(edge_tts, "Communicate", FakeCommunicate)
+    with FakeOpenAIServer() as openai, FakeAnkiConnectServer() as anki, isolated_environment(openai, anki):
+        yield anki
+
+
+@contextlib.contextmanager
+def _running_daemon(path: Path) -> Iterator[Path]:
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=serve.run_server,
+        args=(resolve_config(), path),
+        kwargs={"no_cache": True, "ready": ready},
+        daemon=True,
+    )
+    thread.start()
+    assert ready.wait(10)
+    yield path
+    with contextlib.suppress(DaemonUnavailable):
+        daemon_request("shutdown", path=path)
+    thread.join(10)
+    assert not thread.is_alive()
+
+
+@pytest.fixture
+def daemon(anki: FakeAnkiConnectServer, monkeypatch, tmp_path: Path) -> Iterator[Path]:
+    path = tmp_path / "serve.sock"
+    monkeypatch.setenv("ANKI_VOCAB_SOCKET", str(path))
+    with _running_daemon(path):
+        yield path
+
+
+def _words(anki: FakeAnkiConnectServer) -> list[str]:
+    return [note["fields"]["Word"]["value"] for note in anki.notes.values()]
+
+
+def test_daemon_adds_and_skips_duplicates(anki: FakeAnkiConnectServer, daemon: Path) -> None:
+    assert daemon_request("ping", path=daemon)["pid"] > 0
+
+    first = daemon_request("add", {"line": "The cat sat. | cat"}, path=daemon)
+    second = daemon_request("add", {"line": "Another cat. | cat"}, path=daemon)
+
+    assert first["card"]["word_base"] == "cat"
+    assert first["existing"] == []
+    assert second["card"] is None
+    assert second["note_id"] is None
+    assert second["existing"] == [first["note_id"]]
+    assert _words(anki) == ["cat"]
+    assert anki.notes[first["note_id"]]["fields"]["Audio"]["value"].startswith("[sound:")
+
+
+def test_daemon_skips_spelling_variants_before_generating(anki: FakeAnkiConnectServer, tmp_path: Path) -> None:
+    [note_id] = anki.seed_notes(NOTE_MODEL, ["Well-being"])
+
+    with _running_daemon(tmp_path / "serve.sock") as path:
+        result = daemon_request("add", {"line": "well being"}, path=path)
+
+    assert result == {"card": None, "word": "well being", "note_id": None, "existing": [note_id], "queued": False}
+
+
+def test_daemon_updates_only_requested_fields(anki: FakeAnkiConnectServer, daemon: Path) -> None:
+    [note_id] = anki.seed_notes(NOTE_MODEL, ["ledger"])
+
+    result = daemon_request("update", {"note_id": note_id, "prompt": "notes: shorter"}, path=daemon)
+
+    assert result["note_id"] == note_id
+    assert anki.notes[note_id]["fields"]["Notes"]["value"] == result["card"]["notes"]
+
+
+def test_daemon_reports_errors_and_stops(daemon: Path) -> None:
+    with pytest.raises(RuntimeError, match="Unsupported action"):
+        daemon_request("delete", path=daemon)
+
+    assert daemon_request("shutdown", path=daemon) == {"stopping": True}
+    with pytest.raises(DaemonUnavailable):
+        for _ in range(100):
+            daemon_request("ping", path=daemon)
+
+
+def test_add_command_runs_locally_without_daemon(anki: FakeAnkiConnectServer, monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("ANKI_VOCAB_SOCKET", str(tmp_path / "missing.sock"))
+
+    add.add_command("A ledger entry. | ledger")
+
+    assert _words(anki) == ["ledger"]
+
+
+def test_add_command_forwards_to_daemon(anki: FakeAnkiConnectServer, daemon: Path, monkeypatch) -> None:
+    def fail(*args, **kwargs):
+        raise AssertionError("ran locally")
+
+    monkeypatch.setattr(serve, "run_local", fail)
+
+    add.add_command("A ledger entry. | ledger")
+
+    assert _words(anki) == ["ledger"]
+
+
+def test_daemon_queues_adds_while_anki_is_down(anki: FakeAnkiConnectServer, monkeypatch, tmp_path: Path) -> None:
+    with FakeAnkiConnectServer() as stopped:
+        url = stopped.url
+    monkeypatch.setenv("ANKI_VOCAB_ANKICONNECT_URL", url)
+
+    with _running_daemon(tmp_path / "serve.sock") as path:
+        result = daemon_request("add", {"line": "The cat sat. | cat"}, path=path)
+
+    assert result["queued"] is True
+    outbox = WriteOutbox.open_default()
+    try:
+        assert outbox.counts() == {PENDING: 1}
+    finally:
+        outbox.close()
+
+
+def test_update_command_forwards_to_daemon(anki: FakeAnkiConnectServer, daemon: Path, monkeypatch, capsys) -> None:
+    [note_id] = anki.seed_notes(NOTE_MODEL, ["ledger"])
+    before = dict(anki.notes[note_id]["fields"])
+
+    def fail(*args, **kwargs):
+        raise AssertionError("ran locally")
+
+    monkeypatch.setattr(update, "_update_note", fail)
+
+    update.update_command(note_id=note_id, prompt="notes: shorter", dry_run=True)
+    assert anki.notes[note_id]["fields"] == before
+
+    update.update_command(note_id=note_id, prompt="notes: shorter", yes=True)
+    assert f"Updated note id: {note_id}" in capsys.readouterr().err
+    assert anki.notes[note_id]["fields"]["Notes"]["value"] == "Synonyms: sample, probe"
+
+
+def test_update_command_runs_locally_without_daemon(anki: FakeAnkiConnectServer, monkeypatch, tmp_path: Path) -> None:
+    monkeypatch.setenv("ANKI_VOCAB_SOCKET", str(tmp_path / "missing.sock"))
+    [note_id] = anki.seed_notes(NOTE_MODEL, ["ledger"])
+
+    update.update_command(note_id=note_id, prompt="notes: shorter", yes=True)
+
+    assert anki.notes[note_id]["fields"]["Notes"]["value"] == "Synonyms: sample, probe"
@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from anki_vocab.core.streaming import JsonObjectStream
+
+
+def test_stream_yields_fields_as_they_complete() -> None:
+    payload = {"word_base": "give up", "pos": "phrasal_verb", "ru_meaning": 'сдаваться "совсем"', "n": 3}
+    text = json.dumps(payload, ensure_ascii=False, indent=2)
+    stream = JsonObjectStream()
+    seen: list[tuple[int, str]] = []
+
+    for index, char in enumerate(text):
+        seen.extend((index, key) for key, _ in stream.feed(char))
+
+    assert [key for _, key in seen] == list(payload)
+    # The first field is available long before the object closes.
+    assert seen[0][0] < text.index('"pos"')
+
+
+def test_stream_waits_for_numbers_to_finish() -> None:
+    stream = JsonObjectStream()
+    assert list(stream.feed('{"a": 12')) == []
+    assert list(stream.feed("3, ")) == [("a", 123)]
+    assert list(stream.feed('"b": {"c": [1, 2]}}')) == [("b", {"c": [1, 2]})]
+
+
+def test_stream_rejects_non_objects() -> None:
+    with pytest.raises(ValueError):
+        list(JsonObjectStream().feed("[1, 2]"))
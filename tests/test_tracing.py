@@ -0,0 +1,110 @@
+import asyncio
+import io
+import json
+from pathlib import Path
+
+import edge_tts
+import pytest
+import typer
+from fakes import FakeAnkiConnectServer, FakeCommunicate, FakeOpenAIServer, isolated_environment
+
+from anki_vocab.commands.session import session_command
+from anki_vocab.core import tracing
+from anki_vocab.core.tracing import profiling, span, tracing_enabled
+from anki_vocab.integrations import ankiconnect, openai_client
+
+
+def _spans(path: Path) -> list[dict]:
+    spans = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        record = json.loads(line)
+        for resource in record["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+
+def _attributes(span_record: dict) -> dict:
+    return {item["key"]: next(iter(item["value"].values())) for item in span_record["attributes"]}
+
+
+def test_span_is_noop_without_tracer() -> None:
+    assert not tracing_enabled()
+    with span("idle", word="x") as current:
+        current.set(extra=1)
+
+
+def test_spans_nest_and_export_otlp_json(tmp_path: Path) -> None:
+    path = tmp_path / "trace.jsonl"
+
+    async def child() -> None:
+        with span("async.child", client=True, size=3):
+            await asyncio.sleep(0)
+
+    with tracing.tracing(path):
+        with span("parent", word="run", ratio=0.5, streamed=True):
+            asyncio.run(child())
+        with pytest.raises(ValueError), span("broken"):
+            raise ValueError("bad input")
+
+    spans = {item["name"]: item for item in _spans(path)}
+    parent, child_span, broken = spans["parent"], spans["async.child"], spans["broken"]
+    assert child_span["parentSpanId"] == parent["spanId"]
+    assert "parentSpanId" not in parent
+    assert {item["traceId"] for item in spans.values()} == {parent["traceId"]}
+    assert child_span["kind"] == 3
+    assert int(parent["endTimeUnixNano"]) >= int(child_span["endTimeUnixNano"])
+    assert parent["attributes"] == [
+        {"key": "word", "value": {"stringValue": "run"}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "streamed", "value": {"boolValue": True}},
+    ]
+    assert _attributes(child_span) == {"size": "3"}
+    assert parent["status"] == {"code": 1}
+    assert broken["status"] == {"code": 2, "message": "ValueError: bad input"}
+    assert not tracing_enabled()
+
+
+def test_profiling_prints_hot_spots() -> None:
+    output = io.StringIO()
+
+    with profiling(True, limit=5, stream=output):
+        sorted(range(10_000), key=lambda value: -value)
+
+    assert "Top functions by own time" in output.getvalue()
+    assert "Top functions by cumulative time" in output.getvalue()
+
+
+def test_session_trace_covers_each_stage(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(edge_tts, "Communicate", FakeCommunicate)
+    trace_path = tmp_path / "session.jsonl"
+    with FakeOpenAIServer() as openai, FakeAnkiConnectServer() as anki, isolated_environment(openai, anki):
+        monkeypatch.setattr("sys.stdin", io.StringIO("A quiet harbor. | harbor\n:quit\n"))
+        try:
+            with pytest.raises(typer.Exit):
+                session_command(yes=True, no_cache=True, trace=trace_path)
+        finally:
+            ankiconnect.close_clients()
+            openai_client.close_clients()
+
+    spans = _spans(trace_path)
+    by_id = {item["spanId"]: item for item in spans}
+    card = next(item for item in spans if item["name"] == "session.card")
+    children = {item["name"] for item in spans if item.get("parentSpanId") == card["spanId"]}
+    assert {"parse", "clean", "generate", "duplicate_lookup", "audio", "add_note"} <= children
+    assert _attributes(card)["action"] == "a"
+
+    def ancestors(item: dict) -> list[str]:
+        names = []
+        while item.get("parentSpanId") in by_id:
+            item = by_id[item["parentSpanId"]]
+            names.append(item["name"])
+        return names
+
+    chat = next(item for item in spans if item["name"] == "openai.chat")
+    assert ancestors(chat)[:2] == ["generate", "session.card"]
+    assert _attributes(chat)["prompt_tokens"]
+    synth = next(item for item in spans if item["name"] == "tts.synthesize")
+    assert "audio" in ancestors(synth)
+    write = next(item for item in spans if item["name"] == "ankiconnect.multi" and "add_note" in ancestors(item))
+    assert _attributes(write)["actions"] == "storeMediaFile,addNote"
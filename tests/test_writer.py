@@ -0,0 +1,71 @@
+import json
+import threading
+
+from anki_vocab.core.tracing import span, tracing
+from anki_vocab.core.writer import NoteWriter
+
+
+def test_writer_runs_jobs_in_order_and_reports_results() -> None:
+    writer = NoteWriter()
+    done: list[str] = []
+
+    def job(word: str) -> str:
+        done.append(word)
+        return f"Added {word}"
+
+    def broken() -> str:
+        raise RuntimeError("AnkiConnect error for addNote: duplicate")
+
+    writer.submit("cat", lambda: job("cat"))
+    writer.submit("dog", broken)
+    writer.submit("fox", lambda: job("fox"))
+    writer.close()
+
+    assert done == ["cat", "fox"]
+    assert writer.pending == 0
+    assert writer.results() == [
+        ("Added cat", True),
+        ("dog: AnkiConnect error for addNote: duplicate", False),
+        ("Added fox", True),
+    ]
+    assert writer.results() == []
+
+
+def test_writer_queue_is_bounded() -> None:
+    writer = NoteWriter(maxsize=1)
+    release = threading.Event()
+    writer.submit("first", lambda: str(release.wait(5)))
+    writer.submit("second", lambda: "second")
+
+    third = threading.Thread(target=writer.submit, args=("third", lambda: "third"))
+    third.start()
+    third.join(0.2)
+    # The worker holds the first job and the queue holds the second, so the third submit waits.
+    assert third.is_alive()
+    assert writer.pending == 3
+
+    release.set()
+    third.join(5)
+    writer.close()
+    assert [message for message, _ in writer.results()] == ["True", "second", "third"]
+
+
+def test_writer_jobs_keep_the_submitting_span(tmp_path) -> None:
+    trace = tmp_path / "trace.jsonl"
+    with tracing(trace):
+        writer = NoteWriter()
+        with span("session.card"):
+
+            def job() -> str:
+                with span("add_note"):
+                    return "ok"
+
+            writer.submit("cat", job)
+        writer.close()
+
+    spans = {}
+    for line in trace.read_text(encoding="utf-8").splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for item in resource["scopeSpans"][0]["spans"]:
+                spans[item["name"]] = item
+    assert spans["add_note"]["parentSpanId"] == spans["session.card"]["spanId"]